@@ -0,0 +1,129 @@
+''' Offline benchmark of the full expansion run against mock_llm_server.py
+
+Runs data_expand.main() over the seeds (ingested shards, merged_dataset.json,
+or --seeds FILE) with the API pointed at an in-process mock server, writing
+into a temporary directory, and reports throughput, retries and parse
+failures. Same --seed and fault rates -> comparable numbers between changes.
+
+Usage:
+    python bench_expansion.py --latency-median-ms 300 --rate-429 0.05 --rate-malformed 0.03
+    python bench_expansion.py --pack        # same run with short seeds packed
+'''
+import os
+import json
+import time
+import argparse
+import tempfile
+from collections import Counter
+
+import data_expand
+from mock_llm_server import start_in_background, add_config_args, config_from_args
+
+PARSE_ERRORS = ("pass failed", "parse failed")
+
+# USD per 1M tokens, deepseek-chat list prices; update when they change
+PRICE_CACHE_HIT = 0.028
+PRICE_CACHE_MISS = 0.28
+PRICE_OUTPUT = 0.42
+
+
+def default_seed_file():
+    here = os.path.dirname(os.path.abspath(__file__))
+    if os.path.exists(os.path.join(data_expand.INGEST_DIR, "manifest.json")):
+        return None
+    merged = os.path.join(here, data_expand.INPUT_FILE)
+    if os.path.exists(merged):
+        return merged
+    print("No ingested shards or merged_dataset.json; using test_merged_dataset.json")
+    return os.path.join(here, "test_merged_dataset.json")
+
+
+def estimate_cost(stats):
+    return (
+        stats["prompt_cache_hit_tokens"] * PRICE_CACHE_HIT
+        + stats["prompt_cache_miss_tokens"] * PRICE_CACHE_MISS
+        + stats["completion_tokens"] * PRICE_OUTPUT
+    ) / 1e6
+
+
+def classify(error):
+    if any(p in error for p in PARSE_ERRORS):
+        return "parse"
+    if error == "Unknown family":
+        return "routing"
+    return "transport"
+
+
+def run(config, seed_file=None, limit=None, request_delay=0.0, pack=False):
+    server = start_in_background(config)
+    workdir = tempfile.mkdtemp(prefix="bench_expansion_")
+
+    seeds, _ = data_expand.load_seeds(seed_file)
+    seeds = list(seeds)[:limit] if limit else list(seeds)
+    seed_path = os.path.join(workdir, "seeds.json")
+    with open(seed_path, "w", encoding="utf-8") as f:
+        json.dump(seeds, f, ensure_ascii=False)
+
+    data_expand.API_URL = server.url
+    data_expand.API_KEY = "mock"
+    data_expand.REQUEST_DELAY = request_delay
+    data_expand.PACK_SHORT_SEEDS = pack
+    data_expand.OUTPUT_FILE = os.path.join(workdir, "expanded.jsonl")
+    data_expand.FAILED_FILE = os.path.join(workdir, "failed.json")
+
+    start = time.perf_counter()
+    try:
+        failed = data_expand.main(seed_path)
+    finally:
+        server.shutdown()
+    elapsed = time.perf_counter() - start
+
+    stats = data_expand.STATS
+    kinds = Counter(classify(f["error"]) for f in failed)
+    n = len(seeds)
+    answered = stats["requests"] - stats["retries"]
+
+    report = {
+        "seeds": n,
+        "elapsed_s": round(elapsed, 2),
+        "seeds_per_min": round(n / elapsed * 60, 1) if elapsed else None,
+        "requests": stats["requests"],
+        "requests_per_seed": round(stats["requests"] / n, 2) if n else None,
+        "prompt_tokens": stats["prompt_tokens"],
+        "prompt_tokens_per_seed": round(stats["prompt_tokens"] / n) if n else None,
+        "completion_tokens": stats["completion_tokens"],
+        "prompt_cache_hit_tokens": stats["prompt_cache_hit_tokens"],
+        "prompt_cache_hit_rate": round(stats["prompt_cache_hit_tokens"] / stats["prompt_tokens"], 4) if stats["prompt_tokens"] else None,
+        "mean_request_ms": round(stats["model_ms"] / answered) if answered else None,
+        "estimated_cost_usd": round(estimate_cost(stats), 4),
+        "packed_requests": stats["packed_requests"],
+        "packed_items": stats["packed_items"],
+        "pack_requeued": stats["pack_requeued"],
+        "retries": stats["retries"],
+        "retried_status": {k: v for k, v in stats.items() if k.startswith("http_")},
+        "succeeded": stats["succeeded"],
+        "failed": dict(kinds),
+        "parse_failure_rate": round(kinds["parse"] / n, 4) if n else None,
+        "server_injected": {k: v for k, v in server.stats.items() if k != "requests" and not k.startswith("prompt_")},
+        "output_dir": workdir,
+    }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--seeds", help="seed JSON array (default: ingested / merged_dataset.json)")
+    parser.add_argument("--limit", type=int, help="only the first N seeds")
+    parser.add_argument("--request-delay", type=float, default=0.0)
+    parser.add_argument("--pack", action="store_true", help="pack short same-subject seeds (PACK_SHORT_SEEDS)")
+    add_config_args(parser)
+    args = parser.parse_args()
+
+    report = run(
+        config_from_args(args),
+        seed_file=args.seeds or default_seed_file(),
+        limit=args.limit,
+        request_delay=args.request_delay,
+        pack=args.pack
+    )
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,76 @@
+''' Micro-benchmark: per-tag re.search vs single-pass scan_tags
+
+Rebuilds tagged <RESULT> responses from the rows already in the expanded
+datasets (same layout the prompts ask for) and times parsing all of them with
+the old extract_tag loop and with tag_parser.scan_tags.
+
+Usage:
+    python bench_tag_parser.py [rounds]
+'''
+import re
+import sys
+import timeit
+
+from tag_parser import TAGGED_FIELDS, scan_tags, split_keywords
+from mock_llm_server import render_response, load_rows
+
+# ---------------- FIXTURES ----------------
+
+def load_responses():
+    return [render_response(row) for row in load_rows()]
+
+# ---------------- CANDIDATES ----------------
+
+def legacy_parse(text):
+    # the pre-tag_parser implementation: one fresh pattern + search per tag
+    def extract_tag(tag):
+        m = re.search(fr"<{tag}>(.*?)</{tag}>", text, re.S)
+        return m.group(1).strip() if m else None
+
+    keywords_raw = extract_tag("KEYWORDS")
+    return {
+        "exam_mode_answer": extract_tag("EXAM_MODE"),
+        "exam_f_question": extract_tag("EXAM_FOLLOWUP"),
+        "guided_mode_answer": extract_tag("GUIDED_MODE"),
+        "guided_f_question": extract_tag("GUIDED_FOLLOWUP"),
+        "keywords": [k.strip() for k in keywords_raw.split(",")] if keywords_raw else []
+    }
+
+
+def single_pass_parse(text):
+    tags, _ = scan_tags(text, TAGGED_FIELDS)
+    return {
+        "exam_mode_answer": tags["EXAM_MODE"],
+        "exam_f_question": tags["EXAM_FOLLOWUP"],
+        "guided_mode_answer": tags["GUIDED_MODE"],
+        "guided_f_question": tags["GUIDED_FOLLOWUP"],
+        "keywords": split_keywords(tags["KEYWORDS"])
+    }
+
+# ---------------- MAIN ----------------
+
+def main(rounds=20):
+    responses = load_responses()
+    if not responses:
+        print("No expanded rows found.")
+        return
+
+    # both parsers must agree before their timings mean anything
+    for text in responses:
+        assert legacy_parse(text) == single_pass_parse(text)
+
+    total_kb = sum(len(t) for t in responses) / 1024
+    print(f"Responses: {len(responses)} ({total_kb:.0f} KB), rounds: {rounds}")
+
+    results = {}
+    for name, fn in [("legacy re.search x5", legacy_parse), ("scan_tags", single_pass_parse)]:
+        best = min(timeit.repeat(lambda: [fn(t) for t in responses], number=1, repeat=rounds))
+        results[name] = best
+        print(f"{name:<22} {best * 1000:8.2f} ms  ({best / len(responses) * 1e6:7.1f} us/response)")
+
+    speedup = results["legacy re.search x5"] / results["scan_tags"]
+    print(f"speedup: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
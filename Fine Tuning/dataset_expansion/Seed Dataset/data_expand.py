@@ -1,283 +1,124 @@
 # export DEEPSEEK_API_KEY="sk-..." before running
+# (or point DEEPSEEK_API_URL at mock_llm_server.py to run offline)
 
 import os
 import json
 import time
-import re
+import hashlib
 import requests
+from collections import Counter
+from itertools import islice
 from tqdm import tqdm
 
+from ingest_seeds import INGEST_DIR, iter_seeds, count_seeds
+from dedup_seeds import build_index, fan_out, member_seeds, write_report
+from prompt_templates import (
+    MATH_EXAM, MATH_GUIDED, PROGRAMMING, DESIGN,
+    PACKED_MATH_EXAM, PACKED_PROGRAMMING, PACKED_DESIGN,
+    format_packed_items, structure_marks
+)
+from tag_parser import (
+    TAGGED_FIELDS, MATH_GUIDED_FIELDS, scan_tags, extract_tag, split_keywords,
+    split_item_blocks
+)
+
 # ---------------- CONFIG ----------------
 
 MODEL_NAME = "deepseek-chat" # currently using DeepSeek v3.2 chat model (non-thinking), not using reasoning as its note required. Also explicitly using deepseek as its trained on STEM datasets and its cheap
-API_URL = "https://api.deepseek.com/chat/completions"
+API_URL = os.environ.get("DEEPSEEK_API_URL", "https://api.deepseek.com/chat/completions")
 
-INPUT_FILE = "merged_dataset.json"
+INPUT_FILE = "merged_dataset.json"  # legacy fallback when ingest_seeds.py hasn't been run
 OUTPUT_FILE = "expanded_dataset.jsonl"
 FAILED_FILE = "failed_seeds.json"
-CHECKPOINT_FILE = "checkpoint.txt"
 
 MAX_TOKENS_EXAM = 1200
 MAX_TOKENS_GUIDED = 1000
 TEMPERATURE = 0.2
 REQUEST_DELAY = 1.5
 
-API_KEY = os.environ.get("DEEPSEEK_API_KEY")
-if not API_KEY:
-    raise RuntimeError("DEEPSEEK_API_KEY not found in environment")
-
-# ---------------- PROMPT PLACEHOLDERS ----------------
-
-def get_prompt_math_phys_exam(item):
-    effective_marks = max(item["mark"], 4)
-
-    return f"""
-You are answering a Kathmandu University engineering exam question.
-
-SUBJECT: {item['subject']}
-SEMESTER: {item['semester']}
-MARKS: {item['mark']}
-
-QUESTION:
-{item['question']}
-
-INSTRUCTIONS:
-- Write ONLY the exam answer.
-- Do NOT include headings, tags, metadata, or explanations.
-- Do NOT mention assumptions unless required for marks.
-- Optimize strictly for {item['mark']} marks.
-- Typical length: ~{effective_marks * 35} words (±20%).
-- Use derivation-style flow where applicable:
-  Here, its given that,
-  We know,
-  Now, by the definition of,
-  Substituting,
-  Similarly / Then,
-  We get,
-  Hence,
-
-IMPORTANT:
-- Output ONLY the answer text.
-- Do NOT add anything before or after.
-"""
-
-def get_prompt_math_phys_guided(item, exam_answer):
-    return f"""
-You are generating guided study material based on an exam answer.
-
-SUBJECT: {item['subject']}
-SEMESTER: {item['semester']}
-QUESTION:
-{item['question']}
-
-EXAM ANSWER (for reference):
-{exam_answer}
+MAX_RETRIES = 3
+RETRY_BACKOFF = 2.0  # seconds, doubled per attempt unless the server sends Retry-After
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
-CRITICAL:
-- Every tag below MUST appear exactly once.
-- Do NOT output anything outside the tags.
-- If something is not applicable, write "N/A".
+DEDUP_SEEDS = False  # expand one representative per near-duplicate cluster, copy its answer to the rest
 
-TASKS:
-1. Explain the concept at Beginner → Intermediate level.
-2. Generate ONE exam follow-up question.
-3. Generate THREE guided follow-up questions.
-4. Extract 4–6 syllabus-level technical keywords.
+# one request for several short seeds of the same family and subject, each
+# answered in its own <ITEM_RESULT id="n"> block; items whose block is missing
+# or fails validation are re-run alone with the normal prompt
+PACK_SHORT_SEEDS = False
+PACK_MAX_MARK = 3       # seeds worth at most this many marks are packable
+PACK_SIZE = 4           # seeds per packed request
+PACK_WINDOW = 32        # seeds read ahead to find packing partners
+MAX_TOKENS_PACKED = 8000
 
-----------OUTPUT FORMAT----------
-<RESULT>
-
-<EXAM_FOLLOWUP>
-...
-</EXAM_FOLLOWUP>
+API_KEY = os.environ.get("DEEPSEEK_API_KEY")
 
-<GUIDED_MODE>
-...
-</GUIDED_MODE>
+# per-run counters, read by bench_expansion.py
+STATS = Counter()
 
-<GUIDED_FOLLOWUP>
-1. ...
-2. ...
-3. ...
-</GUIDED_FOLLOWUP>
+# ---------------- PROMPTS ----------------
+# static instructions live in prompt_templates.py as a per-family system
+# prefix; these only fill in the seed's fields, which always come last
 
-<KEYWORDS>
-term1, term2, term3, term4
-</KEYWORDS>
+def get_prompt_math_phys_exam(item):
+    return MATH_EXAM.render(
+        subject=item["subject"],
+        semester=item["semester"],
+        mark=item["mark"],
+        words=structure_marks(item, 4) * 35,
+        question=item["question"]
+    )
 
-</RESULT>
-"""
+def get_prompt_math_phys_guided(item, exam_answer):
+    return MATH_GUIDED.render(
+        subject=item["subject"],
+        semester=item["semester"],
+        question=item["question"],
+        exam_answer=exam_answer
+    )
 
 def get_prompt_programming(item):
-    effective_marks = max(item["mark"], 4)
-
-    return f"""
-You are generating study material for Kathmandu University programming students.
-
-SUBJECT: {item['subject']}
-SEMESTER: {item['semester']}
-MARKS: {item['mark']} (treat as {effective_marks} for structure)
-
-QUESTION:
-{item['question']}
-
-CRITICAL:
-- Every tag listed below MUST appear exactly once.
-- If something is not applicable, write "N/A".
-- Do NOT output anything outside the tags.
-- Do NOT use JSON.
-
-SPECIAL RULE — COMPARISON QUESTIONS:
-- If the question asks to compare, differentiate, distinguish, or find differences,
-  THEN the EXAM_MODE answer MUST be in a TABLE.
-- The table must have clear column headers.
-- Use plain text table format (rows and columns using | or tabs).
-- Do NOT write comparison answers in paragraph form.
-
-----------EXAM MODE----------
-Write the answer exactly as a KU student would write in exams.
-
-Rules:
-- Optimize strictly for {item['mark']} marks.
-- Correctness > verbosity.
-- Use C / C++ syntax where applicable/asked, else other languages like python is allowed
-- Include code ONLY if marks justify it.
-- If comparison-type question → TABLE FORMAT MANDATORY.
-
-----------GUIDED MODE----------
-Explain the same concept at Beginner → Intermediate level.
-
-Rules:
-- Explain the idea first, then syntax.
-- Break logic into clear steps.
-- Assume the student is learning this for the first time.
-
-----------FOLLOW-UP QUESTIONS----------
-Exam follow-up:
-- ONE question only.
-- More complex OR next syllabus topic.
-
-Guided follow-up:
-- THREE questions:
-  1. What problem does this concept solve?
-  2. What are the main components / flow?
-  3. How does it work in an actual program?
-
-----------OUTPUT FORMAT (STRICT TAGS)----------
-<RESULT>
-
-<EXAM_MODE>
-... exam-style answer (TABLE if comparison) ...
-</EXAM_MODE>
-
-<EXAM_FOLLOWUP>
-...
-</EXAM_FOLLOWUP>
-
-<GUIDED_MODE>
-...
-</GUIDED_MODE>
-
-<GUIDED_FOLLOWUP>
-1. ...
-2. ...
-3. ...
-</GUIDED_FOLLOWUP>
-
-<KEYWORDS>
-Exactly 4–6 syllabus-level technical terms, comma-separated.
-</KEYWORDS>
-
-</RESULT>
-"""
+    return PROGRAMMING.render(
+        subject=item["subject"],
+        semester=item["semester"],
+        mark=item["mark"],
+        structure=structure_marks(item, 4),
+        question=item["question"]
+    )
 
 def get_prompt_design(item):
-    effective_marks = max(item["mark"], 6)
-
-    return f"""
-You are generating study material for Kathmandu University engineering drawing / design students.
+    return DESIGN.render(
+        subject=item["subject"],
+        semester=item["semester"],
+        mark=item["mark"],
+        structure=structure_marks(item, 6),
+        paper_type=item.get("paper_type", "N/A"),
+        section=item.get("section", "N/A"),
+        question=item["question"]
+    )
 
-SUBJECT: {item['subject']}
-SEMESTER: {item['semester']}
-MARKS: {item['mark']} (treat as {effective_marks} for structure)
-PAPER TYPE: {item.get('paper_type', 'N/A')}
-SECTION: {item.get('section', 'N/A')}
+# ---------------- PACKED PROMPTS (SHORT SEEDS) ----------------
 
-QUESTION:
-{item['question']}
+def get_prompt_packed_math_phys_exam(items):
+    return PACKED_MATH_EXAM.render(items=format_packed_items(items, 4))
 
-CRITICAL:
-- Every tag listed below MUST appear exactly once.
-- If something is not applicable, write "N/A".
-- Do NOT output anything outside the tags.
-- Do NOT draw diagrams.
+def get_prompt_packed_programming(items):
+    return PACKED_PROGRAMMING.render(items=format_packed_items(items, 4))
 
-SPECIAL RULE — COMPARISON QUESTIONS:
-- If the question asks to compare, differentiate, distinguish, or find differences,
-  THEN the EXAM_MODE answer MUST be written in TABULAR FORM.
-- Use clear column headings.
-- Do NOT explain comparisons in paragraph form in exam mode.
+def get_prompt_packed_design(items):
+    return PACKED_DESIGN.render(items=format_packed_items(items, 6))
 
-----------EXAM MODE----------
-Write exactly as a KU student would write in exams.
-
-Rules:
-- Optimize strictly for {item['mark']} marks.
-- Structured, step-by-step or tabular format.
-- Use proper engineering terminology.
-- If comparison-type question → TABLE FORMAT MANDATORY.
-
-----------GUIDED MODE----------
-Explain the same task at Beginner → Intermediate level.
-
-Rules:
-- Explain the purpose first.
-- Then explain steps, rules, or conventions.
-- Guided mode may be longer than exam mode.
-
-----------FOLLOW-UP QUESTIONS----------
-Exam follow-up:
-- ONE question only.
-- More complex OR next syllabus task.
-
-Guided follow-up:
-- THREE questions:
-  1. Why is this concept / rule important?
-  2. What are the main conventions or standards?
-  3. How is it applied in exams or practice?
-
-----------OUTPUT FORMAT (STRICT TAGS)----------
-<RESULT>
-
-<EXAM_MODE>
-... exam-style steps OR TABLE if comparison ...
-</EXAM_MODE>
-
-<EXAM_FOLLOWUP>
-...
-</EXAM_FOLLOWUP>
-
-<GUIDED_MODE>
-...
-</GUIDED_MODE>
-
-<GUIDED_FOLLOWUP>
-1. ...
-2. ...
-3. ...
-</GUIDED_FOLLOWUP>
-
-<KEYWORDS>
-Exactly 4–6 syllabus-level technical terms, comma-separated.
-</KEYWORDS>
-
-</RESULT>
-"""
+# family -> (packed prompt builder, output token budget per item)
+PACKED_PROMPTS = {
+    "math_phys": (get_prompt_packed_math_phys_exam, MAX_TOKENS_EXAM // 2),
+    "programming": (get_prompt_packed_programming, MAX_TOKENS_GUIDED),
+    "design": (get_prompt_packed_design, MAX_TOKENS_GUIDED),
+}
 
 
 # ---------------- MODEL CALL ----------------
 
-def call_model(prompt, max_tokens):
+def call_model(messages, max_tokens):
     headers = {
         "Authorization": f"Bearer {API_KEY}",
         "Content-Type": "application/json"
@@ -285,22 +126,51 @@ def call_model(prompt, max_tokens):
 
     payload = {
         "model": MODEL_NAME,
-        "messages": [{"role": "user", "content": prompt}],
+        "messages": messages,
         "temperature": TEMPERATURE,
         "max_tokens": max_tokens
     }
 
-    resp = requests.post(API_URL, headers=headers, json=payload, timeout=120)
-    if resp.status_code != 200:
-        raise RuntimeError(resp.text)
-
-    return resp.json()["choices"][0]["message"]["content"]
-
-# ---------------- TAG UTIL ----------------
-
-def extract_tag(text, tag):
-    m = re.search(fr"<{tag}>(.*?)</{tag}>", text, re.S)
-    return m.group(1).strip() if m else None
+    for attempt in range(MAX_RETRIES + 1):
+        STATS["requests"] += 1
+        try:
+            sent = time.perf_counter()
+            resp = requests.post(API_URL, headers=headers, json=payload, timeout=120)
+        except requests.RequestException:
+            if attempt == MAX_RETRIES:
+                raise
+            STATS["retries"] += 1
+            time.sleep(RETRY_BACKOFF * 2 ** attempt)
+            continue
+
+        if resp.status_code in RETRY_STATUS and attempt < MAX_RETRIES:
+            STATS["retries"] += 1
+            STATS[f"http_{resp.status_code}"] += 1
+            time.sleep(retry_delay(resp, attempt))
+            continue
+
+        if resp.status_code != 200:
+            raise RuntimeError(resp.text)
+
+        body = resp.json()
+        usage = body.get("usage") or {}
+        STATS["prompt_tokens"] += usage.get("prompt_tokens", 0)
+        STATS["completion_tokens"] += usage.get("completion_tokens", 0)
+        # DeepSeek reports the cached prefix directly; OpenAI-style APIs
+        # report it under prompt_tokens_details
+        hit = usage.get("prompt_cache_hit_tokens")
+        if hit is None:
+            hit = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+        STATS["prompt_cache_hit_tokens"] += hit
+        STATS["prompt_cache_miss_tokens"] += usage.get("prompt_cache_miss_tokens", usage.get("prompt_tokens", 0) - hit)
+        STATS["model_ms"] += round((time.perf_counter() - sent) * 1000)
+        return body["choices"][0]["message"]["content"]
+
+def retry_delay(resp, attempt):
+    try:
+        return float(resp.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return RETRY_BACKOFF * 2 ** attempt
 
 # ---------------- MATH PARSERS ----------------
 
@@ -313,41 +183,38 @@ def parse_math_exam(text):
     return fallback if len(fallback) > 50 else None
 
 def parse_math_guided(text):
-    keywords_raw = extract_tag(text, "KEYWORDS")
+    tags, problems = scan_tags(text, MATH_GUIDED_FIELDS)
 
     return {
-        "guided_mode_answer": extract_tag(text, "GUIDED_MODE"),
-        "guided_f_question": extract_tag(text, "GUIDED_FOLLOWUP"),
-        "exam_f_question": extract_tag(text, "EXAM_FOLLOWUP"),
-        "keywords": (
-            [k.strip() for k in keywords_raw.split(",")]
-            if keywords_raw else []
-        )
+        "guided_mode_answer": tags["GUIDED_MODE"],
+        "guided_f_question": tags["GUIDED_FOLLOWUP"],
+        "exam_f_question": tags["EXAM_FOLLOWUP"],
+        "keywords": split_keywords(tags["KEYWORDS"]),
+        "problems": problems
     }
 
 def is_valid_math_exam(exam):
-    return exam and len(exam.strip()) > 30
+    return exam and len(exam) > 30
 
 def is_valid_math_guided(parsed, mark):
+    # tag values come back stripped from scan_tags
     required = ["guided_mode_answer", "guided_f_question"]
     if mark >= 4:
         required.append("exam_f_question")
-    return all(parsed.get(k) and parsed[k].strip() for k in required)
+    return all(parsed.get(k) for k in required)
 
 # ---------------- GENERIC TAG PARSER (PROGRAMMING / DESIGN) ----------------
 
 def parse_tagged_result(text):
-    keywords_raw = extract_tag(text, "KEYWORDS")
+    tags, problems = scan_tags(text, TAGGED_FIELDS)
 
     return {
-        "exam_mode_answer": extract_tag(text, "EXAM_MODE"),
-        "exam_f_question": extract_tag(text, "EXAM_FOLLOWUP"),
-        "guided_mode_answer": extract_tag(text, "GUIDED_MODE"),
-        "guided_f_question": extract_tag(text, "GUIDED_FOLLOWUP"),
-        "keywords": (
-            [k.strip() for k in keywords_raw.split(",")]
-            if keywords_raw else []
-        )
+        "exam_mode_answer": tags["EXAM_MODE"],
+        "exam_f_question": tags["EXAM_FOLLOWUP"],
+        "guided_mode_answer": tags["GUIDED_MODE"],
+        "guided_f_question": tags["GUIDED_FOLLOWUP"],
+        "keywords": split_keywords(tags["KEYWORDS"]),
+        "problems": problems
     }
 
 def is_valid_tagged(parsed):
@@ -356,7 +223,11 @@ def is_valid_tagged(parsed):
         "guided_mode_answer",
         "guided_f_question"
     ]
-    return all(parsed.get(k) and parsed[k].strip() for k in required)
+    return all(parsed.get(k) for k in required)
+
+def describe_failure(message, parsed):
+    problems = parsed.get("problems")
+    return f"{message}: {'; '.join(problems)}" if problems else message
 
 # ---------------- PROMPT ROUTING ----------------
 
@@ -368,103 +239,305 @@ def route_other_prompt(item):
         return get_prompt_design(item)
     return None
 
-# ---------------- MAIN ----------------
-
-def main():
-    seeds = json.load(open(INPUT_FILE))
-    failed = []
-
-    start_idx = int(open(CHECKPOINT_FILE).read()) if os.path.exists(CHECKPOINT_FILE) else 0
-
-    print(f"Starting dataset generation using {MODEL_NAME}")
-    print(f"Resuming from index: {start_idx}")
+# ---------------- SEED SOURCE ----------------
+
+def load_seeds(input_file=None):
+    """
+    Returns (lazy seed iterator, total). Prefers the ingested JSONL shards
+    unless a specific seed file is given.
+    """
+    if not input_file and os.path.exists(os.path.join(INGEST_DIR, "manifest.json")):
+        return iter_seeds(), count_seeds()
+
+    seeds = json.load(open(input_file or INPUT_FILE))
+    return iter(seeds), len(seeds)
+
+def seed_base_id(subject, question, mark):
+    key = json.dumps([subject, question, mark], ensure_ascii=False)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+def keyed_seeds(seeds):
+    """
+    Yields (seed_id, seed). The id hashes subject, question and mark and
+    counts identical seeds seen before it, since the same question recurs
+    across years' papers.
+    """
+    seen = Counter()
+    for item in seeds:
+        base = seed_base_id(item.get("subject"), item.get("question"), item.get("mark"))
+        seen[base] += 1
+        yield f"{base}-{seen[base]}", item
+
+def done_seed_ids(path=None):
+    """
+    Seed ids that already have a row in the output file. Rows written
+    before rows carried a seed_id get theirs from their own subject,
+    question and marks, which build_row copies from the seed verbatim, so
+    a run started by the old positional checkpoint resumes without
+    re-expanding them.
+    """
+    path = path or OUTPUT_FILE
+    done = set()
+    legacy = Counter()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue   # a row cut off by a crash
+            seed_id = row.get("seed_id")
+            if not seed_id:
+                base = seed_base_id(row.get("subject"), row.get("question"), row.get("marks"))
+                legacy[base] += 1
+                seed_id = f"{base}-{legacy[base]}"
+            if seed_id:
+                done.add(seed_id)
+    return done
+
+# ---------------- EXPANSION ----------------
+
+def build_row(item, exam_answer, parsed):
+    return {
+        "seed_id": item.get("seed_id"),
+        "subject": item["subject"],
+        "question": item["question"],
+        "marks": item["mark"],
+        "exam_mode_answer": exam_answer,
+        "exam_f_question": parsed.get("exam_f_question"),
+        "guided_mode_answer": parsed["guided_mode_answer"],
+        "guided_f_question": parsed["guided_f_question"],
+        "keywords": parsed["keywords"]
+    }
 
-    for i in tqdm(range(start_idx, len(seeds))):
-        item = seeds[i]
+def expand_item(item, exam_answer=None):
+    """
+    Runs one seed through its family's passes and returns the output row;
+    raises ValueError when the model output can't be used. A math exam
+    answer already produced by a packed request skips the exam pass.
+    """
+    family = item.get("family")
 
+    # ========== TWO-PASS MATH ==========
+    if family == "math_phys":
+        if exam_answer is None:
+            exam_prompt = get_prompt_math_phys_exam(item)
+            exam_raw = call_model(exam_prompt, MAX_TOKENS_EXAM)
+            exam_answer = parse_math_exam(exam_raw)
+
+            if not is_valid_math_exam(exam_answer):
+                raise ValueError("Math exam pass failed")
+
+        guided_prompt = get_prompt_math_phys_guided(item, exam_answer)
+        guided_raw = call_model(guided_prompt, MAX_TOKENS_GUIDED)
+        guided = parse_math_guided(guided_raw)
+
+        guided["keywords"] = guided.get("keywords") or []
+
+        # Retry ONCE if guided fails
+        if not is_valid_math_guided(guided, item["mark"]):
+            guided_raw = call_model(guided_prompt, MAX_TOKENS_GUIDED)
+            guided = parse_math_guided(guided_raw)
+            guided["keywords"] = guided.get("keywords") or []
+
+        if not is_valid_math_guided(guided, item["mark"]):
+            raise ValueError(describe_failure("Math guided pass failed", guided))
+
+        return build_row(item, exam_answer, guided)
+
+    # ========== PROGRAMMING / DESIGN ==========
+    prompt = route_other_prompt(item)
+    if not prompt:
+        raise ValueError("Unknown family")
+
+    raw = call_model(prompt, MAX_TOKENS_GUIDED)
+    parsed = parse_tagged_result(raw)
+
+    parsed["keywords"] = parsed.get("keywords") or []
+
+    if not is_valid_tagged(parsed):
+        raise ValueError(describe_failure("Tagged output parse failed", parsed))
+
+    return build_row(item, parsed["exam_mode_answer"], parsed)
+
+def is_packable(item):
+    return (
+        PACK_SHORT_SEEDS
+        and item.get("family") in PACKED_PROMPTS
+        and item.get("mark", PACK_MAX_MARK + 1) <= PACK_MAX_MARK
+    )
+
+def plan_packs(window):
+    """
+    Splits a window of (index, seed) pairs into packs of up to PACK_SIZE
+    short seeds sharing family and subject, plus the seeds that go alone.
+    """
+    groups = {}
+    singles = []
+    for i, item in window:
+        if is_packable(item):
+            groups.setdefault((item["family"], item["subject"]), []).append((i, item))
+        else:
+            singles.append((i, item))
+
+    packs = []
+    for members in groups.values():
+        for k in range(0, len(members), PACK_SIZE):
+            chunk = members[k:k + PACK_SIZE]
+            if len(chunk) > 1:
+                packs.append(chunk)
+            else:
+                singles.extend(chunk)
+    return packs, singles
+
+def expand_pack(items):
+    """
+    One request for a pack of short same-family seeds. Returns a list
+    aligned with items holding, per item, the output row (programming /
+    design), the validated exam answer (math, whose guided pass still runs
+    per seed), or None when that item's block was missing or invalid.
+    """
+    family = items[0]["family"]
+    build_prompt, tokens_per_item = PACKED_PROMPTS[family]
+    raw = call_model(build_prompt(items), min(MAX_TOKENS_PACKED, tokens_per_item * len(items)))
+    blocks = split_item_blocks(raw)
+
+    results = []
+    for n, item in enumerate(items, start=1):
+        block = blocks.get(n)
+        if block is None:
+            results.append(None)
+        elif family == "math_phys":
+            exam_answer = parse_math_exam(block)
+            results.append(exam_answer if is_valid_math_exam(exam_answer) else None)
+        else:
+            parsed = parse_tagged_result(block)
+            parsed["keywords"] = parsed.get("keywords") or []
+            results.append(build_row(item, parsed["exam_mode_answer"], parsed) if is_valid_tagged(parsed) else None)
+    return results
+
+def write_row(final, dedup, i):
+    with open(OUTPUT_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(final, ensure_ascii=False) + "\n")
+        if dedup:
+            for row in fan_out(final, dedup, i):
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+def expand_window(window, dedup, failed):
+    packs, singles = plan_packs(window)
+    exam_answers = {}
+
+    for pack in packs:
         try:
-            family = item.get("family")
-
-            # ========== TWO-PASS MATH ==========
-            if family == "math_phys":
-                exam_prompt = get_prompt_math_phys_exam(item)
-                exam_raw = call_model(exam_prompt, MAX_TOKENS_EXAM)
-                exam_answer = parse_math_exam(exam_raw)
-
-                if not is_valid_math_exam(exam_answer):
-                    raise ValueError("Math exam pass failed")
-
-                guided_prompt = get_prompt_math_phys_guided(item, exam_answer)
-                guided_raw = call_model(guided_prompt, MAX_TOKENS_GUIDED)
-                guided = parse_math_guided(guided_raw)
-
-                guided["keywords"] = guided.get("keywords") or []
-
-                # Retry ONCE if guided fails
-                if not is_valid_math_guided(guided, item["mark"]):
-                    guided_raw = call_model(guided_prompt, MAX_TOKENS_GUIDED)
-                    guided = parse_math_guided(guided_raw)
-                    guided["keywords"] = guided.get("keywords") or []
-
-                if not is_valid_math_guided(guided, item["mark"]):
-                    raise ValueError("Math guided pass failed")
-
-                final = {
-                    "subject": item["subject"],
-                    "question": item["question"],
-                    "marks": item["mark"],
-                    "exam_mode_answer": exam_answer,
-                    "exam_f_question": guided.get("exam_f_question"),
-                    "guided_mode_answer": guided["guided_mode_answer"],
-                    "guided_f_question": guided["guided_f_question"],
-                    "keywords": guided["keywords"]
-                }
-
-            # ========== PROGRAMMING / DESIGN ==========
+            results = expand_pack([item for _, item in pack])
+        except Exception:
+            # the whole request failed; every item gets its own attempt
+            results = [None] * len(pack)
+        STATS["packed_requests"] += 1
+
+        for (i, item), result in zip(pack, results):
+            if result is None:
+                STATS["pack_requeued"] += 1
+                singles.append((i, item))
+            elif isinstance(result, dict):
+                STATS["packed_items"] += 1
+                write_row(result, dedup, i)
+                STATS["succeeded"] += 1
             else:
-                prompt = route_other_prompt(item)
-                if not prompt:
-                    raise ValueError("Unknown family")
-
-                raw = call_model(prompt, MAX_TOKENS_GUIDED)
-                parsed = parse_tagged_result(raw)
-
-                parsed["keywords"] = parsed.get("keywords") or []
-
-                if not is_valid_tagged(parsed):
-                    raise ValueError("Tagged output parse failed")
-
-                final = {
-                    "subject": item["subject"],
-                    "question": item["question"],
-                    "marks": item["mark"],
-                    "exam_mode_answer": parsed["exam_mode_answer"],
-                    "exam_f_question": parsed["exam_f_question"],
-                    "guided_mode_answer": parsed["guided_mode_answer"],
-                    "guided_f_question": parsed["guided_f_question"],
-                    "keywords": parsed["keywords"]
-                }
-
-            # ---- WRITE OUTPUT ----
-            with open(OUTPUT_FILE, "a", encoding="utf-8") as f:
-                f.write(json.dumps(final, ensure_ascii=False) + "\n")
+                STATS["packed_items"] += 1
+                exam_answers[i] = result
+                singles.append((i, item))
+        time.sleep(REQUEST_DELAY)
 
-            with open(CHECKPOINT_FILE, "w") as ck:
-                ck.write(str(i + 1))
+    for i, item in sorted(singles, key=lambda pair: pair[0]):
+        try:
+            write_row(expand_item(item, exam_answers.get(i)), dedup, i)
+            STATS["succeeded"] += 1
 
         except Exception as e:
+            STATS["failed"] += 1
             failed.append({
                 "index": i,
                 "seed": item,
                 "error": str(e)
             })
+            # its duplicates were waiting on this answer; record them too so
+            # they can be retried rather than silently missing from the output
+            for j, dup in (member_seeds(dedup, i, item) if dedup else []):
+                STATS["failed"] += 1
+                failed.append({
+                    "index": j,
+                    "seed": dup,
+                    "error": f"duplicate of seed {i}, which failed: {e}"
+                })
 
         time.sleep(REQUEST_DELAY)
 
+# ---------------- MAIN ----------------
+
+def report_usage(stats=STATS):
+    """
+    Token usage for the run, including how much of the prompt the provider
+    served from its prefix cache (the point of the static system prefixes
+    in prompt_templates.py).
+    """
+    prompt = stats["prompt_tokens"]
+    hit = stats["prompt_cache_hit_tokens"]
+    print(f"Requests: {stats['requests']} ({stats['retries']} retries), "
+          f"succeeded: {stats['succeeded']}, failed: {stats['failed']}")
+    print(f"Prompt tokens: {prompt} (cached: {hit}, hit rate: {hit / prompt:.1%})" if prompt
+          else "Prompt tokens: 0")
+    print(f"Completion tokens: {stats['completion_tokens']}")
+
+def main(input_file=None):
+    if not API_KEY:
+        raise RuntimeError("DEEPSEEK_API_KEY not found in environment")
+
+    STATS.clear()
+    seeds, total = load_seeds(input_file)
+    failed = []
+
+    dedup = None
+    if DEDUP_SEEDS:
+        dedup = build_index(load_seeds(input_file)[0])
+        dedup.seed_ids = [seed_id for seed_id, _ in keyed_seeds(load_seeds(input_file)[0])]
+        write_report(dedup)
+
+    # resume by seed id, not position: ingest order changes when a paper is
+    # added or re-ingested. Seeds that failed have no row, so they are
+    # retried on the next run.
+    done = done_seed_ids()
+
+    print(f"Starting dataset generation using {MODEL_NAME}")
+    print(f"Already expanded: {len(done)} seeds")
+
+    window_size = PACK_WINDOW if PACK_SHORT_SEEDS else 1
+    remaining = (
+        (i, {**item, "seed_id": seed_id})
+        for i, (seed_id, item) in enumerate(keyed_seeds(seeds))
+    )
+
+    with tqdm(total=total) as progress:
+        while True:
+            window = list(islice(remaining, window_size))
+            if not window:
+                break
+
+            # duplicates are answered when their representative is expanded
+            todo = [
+                (i, item) for i, item in window
+                if (not dedup or dedup.is_representative(i)) and item["seed_id"] not in done
+            ]
+            expand_window(todo, dedup, failed)
+            progress.update(len(window))
+
     if failed:
         json.dump(failed, open(FAILED_FILE, "w"), indent=2, ensure_ascii=False)
 
+    report_usage()
     print("Bhayo finally!! Hurray!!!")
+    return failed
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
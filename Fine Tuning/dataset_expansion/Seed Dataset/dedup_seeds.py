@@ -0,0 +1,262 @@
+''' Near-duplicate detection for seed questions and expanded rows
+
+MinHash signatures over character shingles of the normalized question text,
+bucketed with LSH bands per subject and mark, so candidate pairs come only
+from shared buckets instead of comparing every question against every other
+one. Questions worth different marks never merge: a 10-mark answer is not a
+2-mark answer.
+
+Usage:
+    python dedup_seeds.py                                  # ingested seeds
+    python dedup_seeds.py --expanded ../expanded_dataset_v1.jsonl
+'''
+import re
+import sys
+import json
+import random
+import hashlib
+from collections import defaultdict
+from itertools import combinations
+
+from ingest_seeds import iter_seeds
+
+# ---------------- CONFIG ----------------
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16                      # 16 bands x 4 rows -> candidate threshold ~0.5
+ROWS = NUM_PERM // BANDS
+SIMILARITY_THRESHOLD = 0.8      # estimated Jaccard to join a cluster; lower values start merging
+                                # templated questions that differ in one key word
+SMALL_BUCKET = 32               # buckets up to this size compare every pair
+
+REPORT_FILE = "dedup_clusters.json"
+
+_MERSENNE = (1 << 61) - 1
+_rng = random.Random(1729)      # fixed seed -> signatures are stable across runs
+_PERMS = [
+    (_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE))
+    for _ in range(NUM_PERM)
+]
+
+# ---------------- NORMALIZATION ----------------
+
+_SUBLABEL = re.compile(r"\(\s*(?:[a-z]|i{1,3}|iv|v)\s*\)")
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_question(text):
+    text = (text or "").lower()
+    text = text.replace("$", " ").replace("\\", " ")
+    text = _SUBLABEL.sub(" ", text)
+    text = _NON_WORD.sub(" ", text)
+    return " ".join(text.split())
+
+
+def shingles(norm):
+    if len(norm) <= SHINGLE_SIZE:
+        return {norm}
+    return {norm[i:i + SHINGLE_SIZE] for i in range(len(norm) - SHINGLE_SIZE + 1)}
+
+# ---------------- MINHASH ----------------
+
+def _hash64(s):
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def minhash(norm):
+    hashes = [_hash64(s) for s in shingles(norm)]
+    return tuple(
+        min((a * h + b) % _MERSENNE for h in hashes)
+        for a, b in _PERMS
+    )
+
+
+def estimate_jaccard(sig_a, sig_b):
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+# ---------------- INDEX ----------------
+
+class DedupIndex:
+    """
+    Clusters of near-duplicate questions with the same subject and mark.
+    `rep_of[i]` is the index of the representative of item i (itself if it
+    is one); `members[rep]` lists the other items in that cluster as
+    (index, subject, question, mark). `seed_ids[i]`, when the caller fills
+    it in, is item i's id in the expansion output.
+    """
+
+    def __init__(self):
+        self.rep_of = {}
+        self.members = defaultdict(list)
+        self.meta = []
+        self.seed_ids = []
+
+    def is_representative(self, idx):
+        return self.rep_of.get(idx, idx) == idx
+
+    def clusters(self):
+        return {rep: m for rep, m in self.members.items() if m}
+
+
+def _find(parent, x):
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+
+def _mark_key(mark):
+    # 5, 5.0 and "5" are the same mark
+    try:
+        return float(mark)
+    except (TypeError, ValueError):
+        return mark
+
+
+def build_index(items, threshold=SIMILARITY_THRESHOLD):
+    """
+    items: iterable of dicts with "subject", "question" and optionally "mark".
+    Only signatures and short metadata are kept, never whole rows.
+    """
+    sigs = []
+    meta = []
+    buckets = defaultdict(list)
+
+    for idx, item in enumerate(items):
+        subject = item.get("subject", "")
+        mark = item.get("mark", item.get("marks"))
+        norm = normalize_question(item.get("question"))
+        sig = minhash(norm)
+        sigs.append(sig)
+        meta.append((subject, item.get("question") or "", mark))
+
+        if not norm:
+            continue
+
+        for band in range(BANDS):
+            key = (subject, _mark_key(mark), band, sig[band * ROWS:(band + 1) * ROWS])
+            buckets[key].append(idx)
+
+    parent = list(range(len(sigs)))
+
+    def union(a, b):
+        ra, rb = _find(parent, a), _find(parent, b)
+        if ra != rb and estimate_jaccard(sigs[a], sigs[b]) >= threshold:
+            parent[rb] = ra
+
+    for bucket in buckets.values():
+        if len(bucket) <= SMALL_BUCKET:
+            for a, b in combinations(bucket, 2):
+                union(a, b)
+            continue
+        # big buckets (templated questions): each member against the first
+        # member of every cluster started in this bucket, not all pairs
+        roots = []
+        for idx in bucket:
+            for root in roots:
+                if estimate_jaccard(sigs[root], sigs[idx]) >= threshold:
+                    union(root, idx)
+                    break
+            else:
+                roots.append(idx)
+
+    groups = defaultdict(list)
+    for idx in range(len(sigs)):
+        groups[_find(parent, idx)].append(idx)
+
+    index = DedupIndex()
+    for group in groups.values():
+        # same mark throughout; the longest wording carries the most detail
+        rep = max(group, key=lambda i: (len(meta[i][1]), -i))
+        for idx in group:
+            index.rep_of[idx] = rep
+            if idx != rep:
+                index.members[rep].append((idx,) + meta[idx])
+        index.members.setdefault(rep, [])
+
+    index.meta = meta
+    return index
+
+# ---------------- FAN-OUT ----------------
+
+def fan_out(final, index, rep_idx):
+    """
+    Copies the expanded row of a representative onto every cluster member.
+    Members share its subject and mark; only the wording differs. Each row
+    gets the member's own seed id, not the representative's.
+    """
+    rows = []
+    for idx, subject, question, mark in index.members.get(rep_idx, []):
+        row = dict(final)
+        if "seed_id" in row:
+            row["seed_id"] = index.seed_ids[idx] if index.seed_ids else None
+        row["subject"] = subject
+        row["question"] = question
+        row["marks"] = mark
+        row["dedup_of"] = final["question"]
+        rows.append(row)
+    return rows
+
+
+def member_seeds(index, rep_idx, rep_item):
+    """
+    (index, seed) for each member of a representative's cluster, so they
+    can be retried on their own when the representative fails. Only the
+    short metadata is kept per member; the rest of the seed (family,
+    semester, ...) is the representative's, which shares subject and mark.
+    """
+    members = []
+    for idx, subject, question, mark in index.members.get(rep_idx, []):
+        seed = {**rep_item, "subject": subject, "question": question, "mark": mark}
+        if "seed_id" in seed:
+            seed["seed_id"] = index.seed_ids[idx] if index.seed_ids else None
+        members.append((idx, seed))
+    return members
+
+# ---------------- REPORT ----------------
+
+def write_report(index, path=REPORT_FILE):
+    report = []
+    for rep, members in sorted(index.clusters().items()):
+        subject, question, mark = index.meta[rep]
+        report.append({
+            "subject": subject,
+            "representative": {"index": rep, "question": question, "mark": mark},
+            "duplicates": [
+                {"index": i, "question": q, "mark": m}
+                for i, _, q, m in members
+            ]
+        })
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    total = len(index.rep_of)
+    dupes = sum(len(c["duplicates"]) for c in report)
+    print(f"Items: {total}")
+    print(f"Clusters with duplicates: {len(report)}")
+    print(f"Redundant items: {dupes} ({dupes / max(total, 1):.1%})")
+    print(f"Report: {path}")
+
+
+def iter_expanded(path):
+    """
+    Expanded JSONL rows, skipping lines that are not valid JSON.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping invalid JSON on line {line_no}")
+                # keep indices aligned with line numbers
+                yield {}
+
+
+if __name__ == "__main__":
+    if "--expanded" in sys.argv:
+        src = sys.argv[sys.argv.index("--expanded") + 1]
+        write_report(build_index(iter_expanded(src)), "dedup_expanded_clusters.json")
+    else:
+        write_report(build_index(iter_seeds()))
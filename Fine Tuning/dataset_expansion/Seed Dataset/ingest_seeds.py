@@ -0,0 +1,246 @@
+''' Streaming replacement for merged_datasets.py + syllbus_family_mapping.py
+
+Reads every "<n> Sem/*.json" file one item at a time, tags semester / family on
+the fly and writes one JSONL shard per source file into INGEST_DIR, plus a
+manifest with item counts and hashes. Files whose hash matches the previous
+manifest are skipped, so re-running after adding one paper only touches that
+paper. The source files are never rewritten.
+
+Usage:
+    python ingest_seeds.py            # incremental
+    python ingest_seeds.py --force    # rebuild every shard
+'''
+import os
+import sys
+import json
+import hashlib
+
+from syllbus_family_mapping import BASE_DIR, SEMESTER_MAP, infer_family
+
+# ---------------- CONFIG ----------------
+
+INGEST_DIR = os.path.join(BASE_DIR, "ingested")
+MANIFEST_FILE = os.path.join(INGEST_DIR, "manifest.json")
+
+READ_CHUNK = 64 * 1024
+
+# ---------------- STREAMING JSON ----------------
+
+_decoder = json.JSONDecoder()
+_WS = " \t\r\n"
+_DELIMS = _WS + ",]"
+
+
+def iter_json_array(file_path):
+    """
+    Yields the items of a top-level JSON array without loading the whole file.
+    Only the current item (plus one read chunk) is held in memory.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        buf = ""
+        started = False
+
+        while True:
+            buf = buf.lstrip(_WS)
+
+            if not started:
+                if not buf:
+                    chunk = f.read(READ_CHUNK)
+                    if not chunk:
+                        raise ValueError("empty file")
+                    buf += chunk
+                    continue
+                if buf[0] != "[":
+                    raise ValueError("top-level JSON is not a list")
+                buf = buf[1:]
+                started = True
+                continue
+
+            if buf[:1] == "]":
+                return
+            if buf[:1] == ",":
+                buf = buf[1:]
+                continue
+
+            try:
+                item, end = _decoder.raw_decode(buf)
+            except json.JSONDecodeError:
+                chunk = f.read(READ_CHUNK)
+                if not chunk:
+                    raise
+                buf += chunk
+                continue
+
+            # a number or literal is only complete once a delimiter follows
+            # it: "-1.5" may be the start of "-1.5e10" in the next chunk
+            if not isinstance(item, (dict, list, str)) and (end == len(buf) or buf[end] not in _DELIMS):
+                chunk = f.read(READ_CHUNK)
+                if chunk:
+                    buf += chunk
+                    continue
+
+            yield item
+            buf = buf[end:]
+
+
+def file_sha256(file_path):
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+# ---------------- MANIFEST ----------------
+
+def load_manifest(path=MANIFEST_FILE):
+    if not os.path.exists(path):
+        return {"files": {}, "total_items": 0}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+# ---------------- INGEST ----------------
+
+def enrich(item, semester):
+    """
+    Same tagging rules as syllbus_family_mapping.process_file, minus the rewrite.
+    """
+    if "semester" not in item:
+        item["semester"] = semester
+    if "family" not in item:
+        item["family"] = infer_family(item.get("subject", ""))
+    return item
+
+
+def shard_name(sem_folder, filename):
+    slug = sem_folder.lower().replace(" ", "_")
+    return f"{slug}__{os.path.splitext(filename)[0]}.jsonl"
+
+
+def ingest_file(file_path, semester, shard_path):
+    """
+    Streams one source file into its shard. Returns (count, shard_sha256).
+    """
+    count = 0
+    h = hashlib.sha256()
+    tmp = shard_path + ".tmp"
+
+    with open(tmp, "w", encoding="utf-8") as out:
+        for item in iter_json_array(file_path):
+            if not isinstance(item, dict):
+                continue
+            line = json.dumps(enrich(item, semester), ensure_ascii=False) + "\n"
+            out.write(line)
+            h.update(line.encode("utf-8"))
+            count += 1
+
+    os.replace(tmp, shard_path)
+    return count, h.hexdigest()
+
+
+def ingest_all(force=False):
+    os.makedirs(INGEST_DIR, exist_ok=True)
+
+    old = load_manifest()["files"]
+    files = {}
+    ingested = skipped = failed = 0
+
+    for sem_folder, semester in SEMESTER_MAP.items():
+        sem_path = os.path.join(BASE_DIR, sem_folder)
+
+        if not os.path.isdir(sem_path):
+            print(f"Skipping missing folder: {sem_path}")
+            continue
+
+        for filename in sorted(os.listdir(sem_path)):
+            if not filename.endswith(".json"):
+                continue
+
+            file_path = os.path.join(sem_path, filename)
+            key = f"{sem_folder}/{filename}"
+            shard = shard_name(sem_folder, filename)
+            shard_path = os.path.join(INGEST_DIR, shard)
+
+            try:
+                source_hash = file_sha256(file_path)
+                prev = old.get(key)
+
+                if (
+                    not force
+                    and prev
+                    and prev["source_sha256"] == source_hash
+                    and os.path.exists(shard_path)
+                ):
+                    files[key] = prev
+                    skipped += 1
+                    continue
+
+                count, shard_hash = ingest_file(file_path, semester, shard_path)
+                files[key] = {
+                    "semester": semester,
+                    "source_sha256": source_hash,
+                    "shard": shard,
+                    "shard_sha256": shard_hash,
+                    "count": count
+                }
+                ingested += 1
+                print(f"Ingested: {key} ({count} items)")
+
+            except Exception as e:
+                failed += 1
+                print(f"Failed to read {file_path}: {e}")
+                # keep the last good shard if there is one
+                if key in old and os.path.exists(shard_path):
+                    files[key] = old[key]
+
+    # drop shards whose source file is gone
+    for key, entry in old.items():
+        if key not in files:
+            stale = os.path.join(INGEST_DIR, entry["shard"])
+            if os.path.exists(stale):
+                os.remove(stale)
+            print(f"Removed stale shard: {entry['shard']}")
+
+    manifest = {
+        "files": files,
+        "total_items": sum(e["count"] for e in files.values())
+    }
+    save_manifest(manifest)
+
+    print("Ingest complete.")
+    print(f"Files ingested: {ingested}, unchanged: {skipped}, failed: {failed}")
+    print(f"Total items: {manifest['total_items']}")
+    print(f"Manifest: {MANIFEST_FILE}")
+    return manifest
+
+# ---------------- READERS ----------------
+
+def iter_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_seeds(ingest_dir=INGEST_DIR):
+    """
+    Lazily yields every ingested seed, in manifest order.
+    """
+    manifest = load_manifest(os.path.join(ingest_dir, "manifest.json"))
+    for entry in manifest["files"].values():
+        yield from iter_jsonl(os.path.join(ingest_dir, entry["shard"]))
+
+
+def count_seeds(ingest_dir=INGEST_DIR):
+    return load_manifest(os.path.join(ingest_dir, "manifest.json"))["total_items"]
+
+
+if __name__ == "__main__":
+    ingest_all(force="--force" in sys.argv)
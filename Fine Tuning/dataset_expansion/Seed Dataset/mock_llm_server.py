@@ -0,0 +1,344 @@
+''' Local stand-in for the DeepSeek /chat/completions endpoint
+
+Serves canned answers built from the rows already in the expanded datasets, in
+the same shape each prompt asks for (plain exam text for the math exam pass,
+tagged <RESULT> blocks otherwise), with configurable latency and fault
+injection so data_expand.py can be exercised without an API key or spend.
+
+Usage:
+    python mock_llm_server.py --port 8765 --rate-429 0.05 --rate-truncated 0.02
+    DEEPSEEK_API_KEY=mock DEEPSEEK_API_URL=http://127.0.0.1:8765/chat/completions \\
+        python data_expand.py
+
+Like DeepSeek's context cache, a prompt prefix (in 64-token units) that an
+earlier request already sent is reported as prompt_cache_hit_tokens and
+skips the simulated prefill time; the rest is prompt_cache_miss_tokens.
+
+GET /stats returns what the server has served and injected so far.
+'''
+import os
+import json
+import time
+import re
+import random
+import hashlib
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ---------------- CONFIG ----------------
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CANNED_SOURCES = [
+    os.path.join(DATA_DIR, "expanded_dataset_v1.jsonl"),
+    os.path.join(DATA_DIR, "test_expanded_dataset.jsonl"),
+]
+
+DEFAULTS = {
+    "latency_median_ms": 400.0,   # lognormal latency around this median
+    "latency_sigma": 0.5,
+    "rate_429": 0.0,
+    "rate_5xx": 0.0,
+    "rate_truncated": 0.0,        # content cut short, finish_reason "length"
+    "rate_malformed": 0.0,        # one closing tag mangled
+    "retry_after": "0.5",         # seconds, sent with every 429
+    "prefill_ms_per_ktok": 20.0,  # added latency per 1K prompt tokens not served from cache
+    "seed": 0,
+}
+
+# ---------------- CANNED OUTPUTS ----------------
+
+def render_response(row, exam_mode=True):
+    keywords = row.get("keywords") or []
+    exam_block = f"""<EXAM_MODE>
+{row.get('exam_mode_answer') or ''}
+</EXAM_MODE>
+
+""" if exam_mode else ""
+
+    return f"""<RESULT>
+
+{exam_block}<EXAM_FOLLOWUP>
+{row.get('exam_f_question') or ''}
+</EXAM_FOLLOWUP>
+
+<GUIDED_MODE>
+{row.get('guided_mode_answer') or ''}
+</GUIDED_MODE>
+
+<GUIDED_FOLLOWUP>
+{row.get('guided_f_question') or ''}
+</GUIDED_FOLLOWUP>
+
+<KEYWORDS>
+{', '.join(keywords)}
+</KEYWORDS>
+
+</RESULT>
+"""
+
+
+def load_rows(sources=CANNED_SOURCES):
+    rows = []
+    for path in sources:
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return rows
+
+
+_PACKED_ITEM = re.compile(r'<ITEM id="(\d+)">(.*?)</ITEM>', re.S)
+
+
+class CannedResponder:
+    """
+    Picks a canned row for a prompt: the row with the same question if there
+    is one, otherwise a stable hash of the prompt. Packed prompts get one
+    <ITEM_RESULT id="n"> block per <ITEM id="n">, each answered the same way.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.by_question = {r.get("question", "").strip(): r for r in rows}
+
+    def row_for(self, prompt):
+        marker = "QUESTION:\n"
+        if marker in prompt:
+            question = prompt.split(marker, 1)[1].split("\n\n", 1)[0].strip()
+            if question in self.by_question:
+                return self.by_question[question]
+        digest = hashlib.sha1(prompt.encode("utf-8")).digest()
+        return self.rows[int.from_bytes(digest[:4], "little") % len(self.rows)]
+
+    def answer(self, prompt):
+        items = _PACKED_ITEM.findall(prompt)
+        if items:
+            exam_only = "answer text only" in prompt
+            blocks = []
+            for n, body in items:
+                row = self.row_for(body)
+                content = (row.get("exam_mode_answer") or "") if exam_only else render_response(row)
+                blocks.append(f'<ITEM_RESULT id="{n}">\n{content}\n</ITEM_RESULT>')
+            return "\n\n".join(blocks) + "\n"
+
+        row = self.row_for(prompt)
+        if "EXAM ANSWER (for reference)" in prompt:
+            return render_response(row, exam_mode=False)
+        if "Output ONLY the answer text." in prompt:
+            return row.get("exam_mode_answer") or ""
+        return render_response(row)
+
+# ---------------- PREFIX CACHE ----------------
+
+CHARS_PER_TOKEN = 4
+CACHE_UNIT_CHARS = 64 * CHARS_PER_TOKEN
+
+
+class PrefixCache:
+    """
+    Remembers every prompt prefix sent so far at cache-unit boundaries, as a
+    running hash, and reports how much of a new prompt's start was seen.
+    """
+
+    def __init__(self):
+        self.seen = set()
+        self.lock = threading.Lock()
+
+    def hit_chars(self, prompt):
+        h = hashlib.sha1()
+        keys = []
+        for end in range(CACHE_UNIT_CHARS, len(prompt) + 1, CACHE_UNIT_CHARS):
+            h.update(prompt[end - CACHE_UNIT_CHARS:end].encode("utf-8"))
+            keys.append(h.digest())
+
+        with self.lock:
+            hits = 0
+            for key in keys:
+                if key not in self.seen:
+                    break
+                hits += 1
+            self.seen.update(keys)
+        return hits * CACHE_UNIT_CHARS
+
+# ---------------- FAULTS ----------------
+
+def truncate(text, rng):
+    return text[:int(len(text) * rng.uniform(0.2, 0.8))]
+
+
+def malform(text, rng):
+    closers = [t for t in ("</EXAM_MODE>", "</GUIDED_MODE>", "</GUIDED_FOLLOWUP>", "</KEYWORDS>") if t in text]
+    if not closers:
+        return truncate(text, rng)
+    tag = rng.choice(closers)
+    return text.replace(tag, tag.replace("_", " ").lower(), 1)
+
+# ---------------- SERVER ----------------
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config=None, rows=None):
+        super().__init__(address, MockHandler)
+        self.config = dict(DEFAULTS, **(config or {}))
+        self.responder = CannedResponder(rows if rows is not None else load_rows())
+        self.prefix_cache = PrefixCache()
+        self.rng = random.Random(self.config["seed"])
+        self.lock = threading.Lock()
+        self.stats = Counter()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/chat/completions"
+
+    def draw(self):
+        # one draw per request, under a lock so a seeded run is reproducible
+        # for a given arrival order
+        with self.lock:
+            c = self.config
+            latency = c["latency_median_ms"] / 1000 * self.rng.lognormvariate(0, c["latency_sigma"])
+            roll = self.rng.random()
+            fault = None
+            for name in ("rate_429", "rate_5xx", "rate_truncated", "rate_malformed"):
+                if roll < c[name]:
+                    fault = name[5:]
+                    break
+                roll -= c[name]
+            return latency, fault, random.Random(self.rng.random())
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    server_version = "MockLLM/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.server.lock:
+                self._send_json(200, dict(self.server.stats))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/chat/completions":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length))
+            prompt = "\n".join(m.get("content", "") for m in payload["messages"])
+        except (ValueError, KeyError, TypeError):
+            self._send_json(400, {"error": {"message": "invalid request body"}})
+            return
+
+        server = self.server
+        latency, fault, rng = server.draw()
+        prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+        hit_tokens = server.prefix_cache.hit_chars(prompt) // CHARS_PER_TOKEN
+        miss_tokens = prompt_tokens - hit_tokens
+        time.sleep(latency + miss_tokens / 1000 * server.config["prefill_ms_per_ktok"] / 1000)
+
+        with server.lock:
+            server.stats["requests"] += 1
+            server.stats["prompt_cache_hit_tokens"] += hit_tokens
+            server.stats["prompt_cache_miss_tokens"] += miss_tokens
+            if fault:
+                server.stats[fault] += 1
+
+        if fault == "429":
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                {"Retry-After": server.config["retry_after"]}
+            )
+            return
+        if fault == "5xx":
+            self._send_json(rng.choice([500, 502, 503]), {"error": {"message": "Server error"}})
+            return
+
+        content = server.responder.answer(prompt)
+        finish_reason = "stop"
+        if fault == "truncated":
+            content = truncate(content, rng)
+            finish_reason = "length"
+        elif fault == "malformed":
+            content = malform(content, rng)
+
+        completion_tokens = len(content) // CHARS_PER_TOKEN
+        self._send_json(200, {
+            "id": f"mock-{server.stats['requests']}",
+            "object": "chat.completion",
+            "model": payload.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": finish_reason
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_cache_hit_tokens": hit_tokens,
+                "prompt_cache_miss_tokens": miss_tokens
+            }
+        })
+
+
+def start_in_background(config=None, host="127.0.0.1", port=0):
+    """
+    Starts a server on a daemon thread (port 0 = any free port). Call
+    .shutdown() on the returned server when done.
+    """
+    server = MockLLMServer((host, port), config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_config_args(parser):
+    parser.add_argument("--latency-median-ms", type=float, default=DEFAULTS["latency_median_ms"])
+    parser.add_argument("--latency-sigma", type=float, default=DEFAULTS["latency_sigma"])
+    parser.add_argument("--rate-429", type=float, default=DEFAULTS["rate_429"])
+    parser.add_argument("--rate-5xx", type=float, default=DEFAULTS["rate_5xx"])
+    parser.add_argument("--rate-truncated", type=float, default=DEFAULTS["rate_truncated"])
+    parser.add_argument("--rate-malformed", type=float, default=DEFAULTS["rate_malformed"])
+    parser.add_argument("--retry-after", default=DEFAULTS["retry_after"])
+    parser.add_argument("--prefill-ms-per-ktok", type=float, default=DEFAULTS["prefill_ms_per_ktok"])
+    parser.add_argument("--seed", type=int, default=DEFAULTS["seed"])
+
+
+def config_from_args(args):
+    return {k: getattr(args, k) for k in DEFAULTS}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_config_args(parser)
+    args = parser.parse_args()
+
+    server = MockLLMServer((args.host, args.port), config_from_args(args))
+    print(f"Mock chat-completions listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,387 @@
+''' Prompt templates for data_expand.py, laid out for provider prefix caching
+
+DeepSeek caches the leading tokens of every request (in 64-token units) and
+bills a repeated prefix at the cache-hit rate, skipping its prefill. Only an
+identical *leading* run of tokens counts, so each template puts everything
+that doesn't depend on the seed into a system message that is byte-for-byte
+the same for every request of its family, and the seed's own fields
+(subject, semester, marks, question, ...) go last, in the user message.
+
+Keep it that way when editing: anything per-seed that creeps into a system
+text (a mark count, a word target) makes every request of the family miss.
+The usage block of each response reports prompt_cache_hit_tokens /
+prompt_cache_miss_tokens; data_expand.STATS sums them per run.
+'''
+
+
+class PromptTemplate:
+    """
+    A static system prefix plus a user message filled with str.format from
+    the seed's fields.
+    """
+
+    def __init__(self, name, system, user):
+        self.name = name
+        self.system = system.strip() + "\n"
+        self.user = user.strip() + "\n"
+
+    def render(self, **fields):
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user.format(**fields)},
+        ]
+
+
+def structure_marks(item, minimum):
+    return max(item["mark"], minimum)
+
+# ---------------- SHARED BLOCKS ----------------
+
+_DERIVATION_FLOW = """
+- Use derivation-style flow where applicable:
+  Here, its given that,
+  We know,
+  Now, by the definition of,
+  Substituting,
+  Similarly / Then,
+  We get,
+  Hence,
+"""
+
+_TAGGED_FORMAT = """
+<RESULT>
+
+<EXAM_MODE>
+... {exam_hint} ...
+</EXAM_MODE>
+
+<EXAM_FOLLOWUP>
+...
+</EXAM_FOLLOWUP>
+
+<GUIDED_MODE>
+...
+</GUIDED_MODE>
+
+<GUIDED_FOLLOWUP>
+1. ...
+2. ...
+3. ...
+</GUIDED_FOLLOWUP>
+
+<KEYWORDS>
+Exactly 4–6 syllabus-level technical terms, comma-separated.
+</KEYWORDS>
+
+</RESULT>
+"""
+
+_PROGRAMMING_RULES = """
+SPECIAL RULE — COMPARISON QUESTIONS:
+- If the question asks to compare, differentiate, distinguish, or find differences,
+  THEN the EXAM_MODE answer MUST be in a TABLE.
+- The table must have clear column headers.
+- Use plain text table format (rows and columns using | or tabs).
+- Do NOT write comparison answers in paragraph form.
+
+----------EXAM MODE----------
+Write the answer exactly as a KU student would write in exams.
+
+Rules:
+- Optimize strictly for the MARKS given with the question.
+- Correctness > verbosity.
+- Use C / C++ syntax where applicable/asked, else other languages like python is allowed
+- Include code ONLY if marks justify it.
+- If comparison-type question → TABLE FORMAT MANDATORY.
+
+----------GUIDED MODE----------
+Explain the same concept at Beginner → Intermediate level.
+
+Rules:
+- Explain the idea first, then syntax.
+- Break logic into clear steps.
+- Assume the student is learning this for the first time.
+
+----------FOLLOW-UP QUESTIONS----------
+Exam follow-up:
+- ONE question only.
+- More complex OR next syllabus topic.
+
+Guided follow-up:
+- THREE questions:
+  1. What problem does this concept solve?
+  2. What are the main components / flow?
+  3. How does it work in an actual program?
+"""
+
+_DESIGN_RULES = """
+SPECIAL RULE — COMPARISON QUESTIONS:
+- If the question asks to compare, differentiate, distinguish, or find differences,
+  THEN the EXAM_MODE answer MUST be written in TABULAR FORM.
+- Use clear column headings.
+- Do NOT explain comparisons in paragraph form in exam mode.
+
+----------EXAM MODE----------
+Write exactly as a KU student would write in exams.
+
+Rules:
+- Optimize strictly for the MARKS given with the question.
+- Structured, step-by-step or tabular format.
+- Use proper engineering terminology.
+- If comparison-type question → TABLE FORMAT MANDATORY.
+
+----------GUIDED MODE----------
+Explain the same task at Beginner → Intermediate level.
+
+Rules:
+- Explain the purpose first.
+- Then explain steps, rules, or conventions.
+- Guided mode may be longer than exam mode.
+
+----------FOLLOW-UP QUESTIONS----------
+Exam follow-up:
+- ONE question only.
+- More complex OR next syllabus task.
+
+Guided follow-up:
+- THREE questions:
+  1. Why is this concept / rule important?
+  2. What are the main conventions or standards?
+  3. How is it applied in exams or practice?
+"""
+
+_PROGRAMMING_FORMAT = _TAGGED_FORMAT.format(exam_hint="exam-style answer (TABLE if comparison)")
+_DESIGN_FORMAT = _TAGGED_FORMAT.format(exam_hint="exam-style steps OR TABLE if comparison")
+
+_PACKED_FOOTER = """
+<ITEM_RESULT id="2">
+...
+</ITEM_RESULT>
+"""
+
+# ---------------- SINGLE-SEED TEMPLATES ----------------
+
+MATH_EXAM = PromptTemplate(
+    "math_phys_exam",
+    system=f"""
+You are answering a Kathmandu University engineering exam question.
+The question, its marks and the target length follow in the next message.
+
+INSTRUCTIONS:
+- Write ONLY the exam answer.
+- Do NOT include headings, tags, metadata, or explanations.
+- Do NOT mention assumptions unless required for marks.
+- Optimize strictly for the MARKS given with the question.
+- Keep to the TYPICAL LENGTH given with the question (±20%).
+{_DERIVATION_FLOW}
+IMPORTANT:
+- Output ONLY the answer text.
+- Do NOT add anything before or after.
+""",
+    user="""
+SUBJECT: {subject}
+SEMESTER: {semester}
+MARKS: {mark}
+TYPICAL LENGTH: ~{words} words
+
+QUESTION:
+{question}
+""",
+)
+
+MATH_GUIDED = PromptTemplate(
+    "math_phys_guided",
+    system="""
+You are generating guided study material based on an exam answer.
+The question and its exam answer follow in the next message.
+
+CRITICAL:
+- Every tag below MUST appear exactly once.
+- Do NOT output anything outside the tags.
+- If something is not applicable, write "N/A".
+
+TASKS:
+1. Explain the concept at Beginner → Intermediate level.
+2. Generate ONE exam follow-up question.
+3. Generate THREE guided follow-up questions.
+4. Extract 4–6 syllabus-level technical keywords.
+
+----------OUTPUT FORMAT----------
+<RESULT>
+
+<EXAM_FOLLOWUP>
+...
+</EXAM_FOLLOWUP>
+
+<GUIDED_MODE>
+...
+</GUIDED_MODE>
+
+<GUIDED_FOLLOWUP>
+1. ...
+2. ...
+3. ...
+</GUIDED_FOLLOWUP>
+
+<KEYWORDS>
+term1, term2, term3, term4
+</KEYWORDS>
+
+</RESULT>
+""",
+    user="""
+SUBJECT: {subject}
+SEMESTER: {semester}
+QUESTION:
+{question}
+
+EXAM ANSWER (for reference):
+{exam_answer}
+""",
+)
+
+PROGRAMMING = PromptTemplate(
+    "programming",
+    system=f"""
+You are generating study material for Kathmandu University programming students.
+The question and its marks follow in the next message.
+
+CRITICAL:
+- Every tag listed below MUST appear exactly once.
+- If something is not applicable, write "N/A".
+- Do NOT output anything outside the tags.
+- Do NOT use JSON.
+{_PROGRAMMING_RULES}
+----------OUTPUT FORMAT (STRICT TAGS)----------
+{_PROGRAMMING_FORMAT}
+""",
+    user="""
+SUBJECT: {subject}
+SEMESTER: {semester}
+MARKS: {mark} (treat as {structure} for structure)
+
+QUESTION:
+{question}
+""",
+)
+
+DESIGN = PromptTemplate(
+    "design",
+    system=f"""
+You are generating study material for Kathmandu University engineering drawing / design students.
+The question and its marks follow in the next message.
+
+CRITICAL:
+- Every tag listed below MUST appear exactly once.
+- If something is not applicable, write "N/A".
+- Do NOT output anything outside the tags.
+- Do NOT draw diagrams.
+{_DESIGN_RULES}
+----------OUTPUT FORMAT (STRICT TAGS)----------
+{_DESIGN_FORMAT}
+""",
+    user="""
+SUBJECT: {subject}
+SEMESTER: {semester}
+MARKS: {mark} (treat as {structure} for structure)
+PAPER TYPE: {paper_type}
+SECTION: {section}
+
+QUESTION:
+{question}
+""",
+)
+
+# ---------------- PACKED TEMPLATES (SHORT SEEDS) ----------------
+
+PACKED_MATH_EXAM = PromptTemplate(
+    "packed_math_phys_exam",
+    system=f"""
+You are answering several Kathmandu University engineering exam questions.
+They follow in the next message as <ITEM id="n"> blocks; answer every ITEM independently.
+
+INSTRUCTIONS (for every item):
+- Write ONLY the exam answer.
+- Do NOT include headings, tags, metadata, or explanations inside an answer.
+- Do NOT mention assumptions unless required for marks.
+- Optimize strictly for that item's MARKS.
+- Typical length: ~35 words per structure mark (±20%).
+{_DERIVATION_FLOW}
+----------OUTPUT FORMAT----------
+One block per item, in order, carrying the item's id:
+
+<ITEM_RESULT id="1">
+... answer text only ...
+</ITEM_RESULT>
+
+<ITEM_RESULT id="2">
+... answer text only ...
+</ITEM_RESULT>
+
+IMPORTANT:
+- Every item MUST have exactly one ITEM_RESULT block.
+- Do NOT add anything outside the ITEM_RESULT blocks.
+""",
+    user="{items}",
+)
+
+PACKED_PROGRAMMING = PromptTemplate(
+    "packed_programming",
+    system=f"""
+You are generating study material for Kathmandu University programming students.
+The questions follow in the next message as <ITEM id="n"> blocks; answer every ITEM independently.
+
+CRITICAL:
+- Every item MUST have exactly one ITEM_RESULT block carrying its id.
+- Inside each block, every tag listed below MUST appear exactly once.
+- If something is not applicable, write "N/A".
+- Do NOT output anything outside the ITEM_RESULT blocks.
+- Do NOT use JSON.
+{_PROGRAMMING_RULES}
+----------OUTPUT FORMAT (STRICT TAGS, ONE BLOCK PER ITEM, IN ORDER)----------
+<ITEM_RESULT id="1">
+{_PROGRAMMING_FORMAT.strip()}
+</ITEM_RESULT>
+{_PACKED_FOOTER}
+""",
+    user="{items}",
+)
+
+PACKED_DESIGN = PromptTemplate(
+    "packed_design",
+    system=f"""
+You are generating study material for Kathmandu University engineering drawing / design students.
+The questions follow in the next message as <ITEM id="n"> blocks; answer every ITEM independently.
+
+CRITICAL:
+- Every item MUST have exactly one ITEM_RESULT block carrying its id.
+- Inside each block, every tag listed below MUST appear exactly once.
+- If something is not applicable, write "N/A".
+- Do NOT output anything outside the ITEM_RESULT blocks.
+- Do NOT draw diagrams.
+{_DESIGN_RULES}
+----------OUTPUT FORMAT (STRICT TAGS, ONE BLOCK PER ITEM, IN ORDER)----------
+<ITEM_RESULT id="1">
+{_DESIGN_FORMAT.strip()}
+</ITEM_RESULT>
+{_PACKED_FOOTER}
+""",
+    user="{items}",
+)
+
+
+def format_packed_items(items, minimum):
+    blocks = []
+    for n, item in enumerate(items, start=1):
+        extra = ""
+        if item.get("family") == "design":
+            extra = f"\nPAPER TYPE: {item.get('paper_type', 'N/A')}\nSECTION: {item.get('section', 'N/A')}"
+        blocks.append(f"""<ITEM id="{n}">
+SUBJECT: {item['subject']}
+SEMESTER: {item['semester']}
+MARKS: {item['mark']} (treat as {structure_marks(item, minimum)} for structure){extra}
+
+QUESTION:
+{item['question']}
+</ITEM>""")
+    return "\n\n".join(blocks)
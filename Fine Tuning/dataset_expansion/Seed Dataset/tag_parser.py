@@ -0,0 +1,92 @@
+''' Single-pass parser for the <TAG>...</TAG> blocks in model outputs
+
+One precompiled regex finds every open/close marker of the requested tags in a
+single left-to-right scan, instead of one fresh re.search per tag. Alongside
+the values it reports what was wrong with the response so failed seeds can be
+triaged from failed_seeds.json:
+
+    missing <KEYWORDS>              tag never appeared
+    unclosed <GUIDED_MODE> at 812   opened but the response ended (truncation)
+    duplicate <EXAM_MODE> at 1530   second complete block, first one is kept
+    nested <EXAM_MODE> at 240       opened again before being closed
+    stray </KEYWORDS> at 2011       closed without being opened
+
+Packed responses (several seeds in one request) are first cut into their
+<ITEM_RESULT id="n"> blocks with split_item_blocks, then scanned per item.
+'''
+import re
+
+TAGGED_FIELDS = ("EXAM_MODE", "EXAM_FOLLOWUP", "GUIDED_MODE", "GUIDED_FOLLOWUP", "KEYWORDS")
+MATH_GUIDED_FIELDS = ("EXAM_FOLLOWUP", "GUIDED_MODE", "GUIDED_FOLLOWUP", "KEYWORDS")
+
+_patterns = {}
+
+
+def _pattern(tags):
+    pat = _patterns.get(tags)
+    if pat is None:
+        alternation = "|".join(re.escape(t) for t in tags)
+        pat = _patterns[tags] = re.compile(fr"<(/?)({alternation})>")
+    return pat
+
+
+def scan_tags(text, tags=TAGGED_FIELDS):
+    """
+    Returns (values, problems). values maps every requested tag to its
+    stripped content, or None if no complete block was found.
+    """
+    tags = tuple(tags)
+    values = dict.fromkeys(tags)
+    problems = []
+    open_at = {}
+
+    for m in _pattern(tags).finditer(text or ""):
+        closing, tag = m.group(1), m.group(2)
+
+        if not closing:
+            if tag in open_at:
+                problems.append(f"nested <{tag}> at {m.start()}")
+            else:
+                open_at[tag] = m.end()
+            continue
+
+        start = open_at.pop(tag, None)
+        if start is None:
+            problems.append(f"stray </{tag}> at {m.start()}")
+        elif values[tag] is not None:
+            problems.append(f"duplicate <{tag}> at {start - len(tag) - 2}")
+        else:
+            values[tag] = text[start:m.start()].strip()
+
+    for tag, start in open_at.items():
+        problems.append(f"unclosed <{tag}> at {start - len(tag) - 2}")
+
+    for tag in tags:
+        if values[tag] is None and tag not in open_at:
+            problems.append(f"missing <{tag}>")
+
+    return values, problems
+
+
+def extract_tag(text, tag):
+    return scan_tags(text, (tag,))[0][tag]
+
+
+def split_keywords(raw):
+    return [k.strip() for k in raw.split(",")] if raw else []
+
+
+_ITEM_RESULT = re.compile(r'<ITEM_RESULT\s+id="?(\d+)"?\s*>(.*?)</ITEM_RESULT>', re.S)
+
+
+def split_item_blocks(text):
+    """
+    Splits a packed response into {item id: block text}. Only complete
+    <ITEM_RESULT id="n">...</ITEM_RESULT> blocks count, so items lost to
+    truncation or a mangled id are simply absent; a repeated id keeps its
+    first block.
+    """
+    blocks = {}
+    for m in _ITEM_RESULT.finditer(text or ""):
+        blocks.setdefault(int(m.group(1)), m.group(2))
+    return blocks
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+import data_expand
+
+
+def seed(question, mark=5):
+    return {"subject": "COMP 102", "question": question, "mark": mark, "family": "programming", "semester": 1}
+
+
+class Crash(Exception):
+    pass
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    """
+    run(seeds) expands them with a fake model; `crash_after` calls raise
+    Crash mid-run. Returns the seeds expanded in that run.
+    """
+    monkeypatch.setattr(data_expand, "API_KEY", "test")
+    monkeypatch.setattr(data_expand, "REQUEST_DELAY", 0)
+    monkeypatch.setattr(data_expand, "OUTPUT_FILE", str(tmp_path / "expanded.jsonl"))
+    monkeypatch.setattr(data_expand, "FAILED_FILE", str(tmp_path / "failed.json"))
+    monkeypatch.setattr(data_expand, "expand_pack", lambda items: [None] * len(items))
+
+    def run(seeds, crash_after=None, fail=()):
+        calls = []
+
+        def expand_item(item, exam_answer=None):
+            if crash_after is not None and len(calls) == crash_after:
+                raise Crash()
+            calls.append(item["question"])
+            if item["question"] in fail:
+                raise ValueError("Tagged output parse failed")
+            return data_expand.build_row(item, "exam", {"guided_mode_answer": "g", "guided_f_question": "f",
+                                                        "keywords": []})
+        monkeypatch.setattr(data_expand, "expand_item", expand_item)
+        path = tmp_path / "seeds.json"
+        path.write_text(json.dumps(seeds), encoding="utf-8")
+        try:
+            data_expand.main(str(path))
+        except Crash:
+            pass
+        return calls
+    return run
+
+
+def output_rows():
+    with open(data_expand.OUTPUT_FILE, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_crash_inside_a_packed_window_does_not_duplicate_rows(run, monkeypatch):
+    monkeypatch.setattr(data_expand, "PACK_SHORT_SEEDS", True)
+    seeds = [seed(f"q{i}", mark=2) for i in range(6)]
+    assert run(seeds, crash_after=3) == ["q0", "q1", "q2"]
+    assert run(seeds) == ["q3", "q4", "q5"]
+    assert [r["question"] for r in output_rows()] == [f"q{i}" for i in range(6)]
+
+
+def test_repeated_questions_get_their_own_ids(run):
+    run([seed("same"), seed("same"), seed("other")])
+    rows = output_rows()
+    assert len({r["seed_id"] for r in rows}) == 3
+    assert run([seed("same"), seed("same"), seed("other")]) == []
+
+
+def test_new_papers_shift_positions_without_re_expanding(run):
+    run([seed("a"), seed("b")])
+    # a paper ingested ahead of the old ones moves every position
+    assert run([seed("new"), seed("a"), seed("b"), seed("a")]) == ["new", "a"]
+    assert len(output_rows()) == 4
+
+
+def test_failed_seeds_are_retried_next_run(run):
+    assert run([seed("a"), seed("bad"), seed("b")], fail={"bad"}) == ["a", "bad", "b"]
+    assert run([seed("a"), seed("bad"), seed("b")]) == ["bad"]
+
+
+def test_rows_from_before_seed_ids_count_as_done(run):
+    with open(data_expand.OUTPUT_FILE, "w", encoding="utf-8") as f:
+        for question in ("a", "b"):
+            f.write(json.dumps({"subject": "COMP 102", "question": question, "marks": 5}) + "\n")
+    assert run([seed("a"), seed("b"), seed("c")]) == ["c"]
+    assert run([seed("a"), seed("b"), seed("c")]) == []
@@ -0,0 +1,74 @@
+import pytest
+
+import dedup_seeds
+from dedup_seeds import build_index, estimate_jaccard, fan_out, member_seeds, minhash, normalize_question
+
+STACK = "Explain the difference between a stack and a queue with suitable examples of each."
+RECURSION = "What is recursion? Write a recursive function to compute the factorial of n."
+
+
+def seed(question, mark=5, subject="COMP 102"):
+    return {"subject": subject, "question": question, "mark": mark}
+
+
+def clusters(index):
+    return {rep: sorted(i for i, *_ in members) for rep, members in index.clusters().items()}
+
+
+def test_normalization_ignores_formatting():
+    assert normalize_question("(a) Define  $\\mu$-law?") == normalize_question("define mu law")
+
+
+def test_identical_wording_has_identical_signature():
+    sig = minhash(normalize_question(STACK))
+    assert estimate_jaccard(sig, minhash(normalize_question(STACK.upper()))) == 1.0
+    assert estimate_jaccard(sig, minhash(normalize_question(RECURSION))) < 0.3
+
+
+def test_near_duplicates_cluster_under_the_longest_wording():
+    items = [seed(STACK.rstrip(".")), seed(RECURSION), seed("(a) " + STACK)]
+    index = build_index(items)
+    assert clusters(index) == {2: [0]}
+    assert not index.is_representative(0)
+    assert index.is_representative(1) and index.is_representative(2)
+
+
+def test_different_marks_or_subjects_never_merge():
+    items = [seed(STACK, 5), seed(STACK, 10), seed(STACK, "5"), seed(STACK, 5, "COMP 116")]
+    index = build_index(items)
+    # 5 and "5" are the same mark; 10 and another subject stay apart
+    assert clusters(index) == {0: [2]}
+
+
+def test_big_buckets_compare_against_every_cluster_root(monkeypatch):
+    # past SMALL_BUCKET only cluster roots are compared; a member that
+    # doesn't match the first root must still find the second
+    monkeypatch.setattr(dedup_seeds, "SMALL_BUCKET", 1)
+    items = [seed(RECURSION), seed(STACK), seed(STACK + "?"), seed(RECURSION.lower())]
+    groups = {frozenset([rep, *members]) for rep, members in clusters(build_index(items)).items()}
+    assert groups == {frozenset([0, 3]), frozenset([1, 2])}
+
+
+def test_fan_out_and_member_seeds_carry_member_ids():
+    items = [seed(STACK), seed(STACK + "?")]
+    index = build_index(items)
+    index.seed_ids = ["id-0", "id-1"]
+    rep = index.rep_of[0]
+    member = 1 - rep
+    row = {"seed_id": f"id-{rep}", "subject": "COMP 102", "question": items[rep]["question"],
+           "marks": 5, "exam_mode_answer": "answer"}
+
+    [copy] = fan_out(row, index, rep)
+    assert copy["seed_id"] == f"id-{member}"
+    assert copy["question"] == items[member]["question"]
+    assert copy["dedup_of"] == items[rep]["question"]
+    assert copy["exam_mode_answer"] == "answer"
+
+    [(idx, dup)] = member_seeds(index, rep, {**items[rep], "seed_id": f"id-{rep}", "family": "programming"})
+    assert idx == member and dup["seed_id"] == f"id-{member}" and dup["family"] == "programming"
+
+
+@pytest.mark.parametrize("question", ["", None])
+def test_empty_questions_stay_alone(question):
+    index = build_index([seed(question), seed(question)])
+    assert index.clusters() == {}
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+import ingest_seeds
+
+ITEMS = [
+    {"subject": "MATH 101", "question": "Evaluate the limit, then differentiate.", "mark": 5},
+    -1.5e10, 2.25e-3, 12345678901234, -0.0, True, False, None,
+    "a string with , and ] inside",
+    {"nested": [1, [2, {"x": "]"}]]},
+]
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "paper.json"
+    path.write_text(json.dumps(ITEMS, separators=(",", ":")), encoding="utf-8")
+    return path
+
+
+@pytest.mark.parametrize("chunk", [1, 2, 3, 5, 7, 64, 64 * 1024])
+def test_items_survive_any_chunk_boundary(source, chunk, monkeypatch):
+    monkeypatch.setattr(ingest_seeds, "READ_CHUNK", chunk)
+    assert list(ingest_seeds.iter_json_array(str(source))) == ITEMS
+
+
+def test_pretty_printed_file(tmp_path, monkeypatch):
+    path = tmp_path / "paper.json"
+    path.write_text(json.dumps(ITEMS, indent=2), encoding="utf-8")
+    monkeypatch.setattr(ingest_seeds, "READ_CHUNK", 3)
+    assert list(ingest_seeds.iter_json_array(str(path))) == ITEMS
+
+
+@pytest.mark.parametrize("text", ["", "{}", "[1, 2"])
+def test_malformed_files_raise(tmp_path, text):
+    path = tmp_path / "bad.json"
+    path.write_text(text, encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(ingest_seeds.iter_json_array(str(path)))
@@ -0,0 +1,54 @@
+import pytest
+
+from bench_tag_parser import legacy_parse, single_pass_parse
+from mock_llm_server import render_response, load_rows
+from tag_parser import TAGGED_FIELDS, scan_tags, extract_tag, split_keywords, split_item_blocks
+
+HAND_WRITTEN = [
+    "",
+    "no tags at all",
+    "<EXAM_MODE>  answer  </EXAM_MODE>",
+    "<EXAM_MODE>first</EXAM_MODE> <EXAM_MODE>second</EXAM_MODE>",
+    "<KEYWORDS>a, b ,c</KEYWORDS><GUIDED_MODE>g</GUIDED_MODE>",
+    "<EXAM_MODE>multi\nline\n</EXAM_MODE><EXAM_FOLLOWUP>why?</EXAM_FOLLOWUP>",
+    "<GUIDED_FOLLOWUP>cut off by max_tokens",
+]
+
+
+@pytest.mark.parametrize("text", HAND_WRITTEN)
+def test_matches_legacy_parser_on_hand_written_responses(text):
+    assert single_pass_parse(text) == legacy_parse(text)
+
+
+def test_matches_legacy_parser_on_the_expanded_bank():
+    rows = load_rows()
+    if not rows:
+        pytest.skip("no expanded rows to rebuild responses from")
+    for row in rows:
+        text = render_response(row)
+        assert single_pass_parse(text) == legacy_parse(text)
+
+
+def test_problems_are_reported():
+    text = "</KEYWORDS><EXAM_MODE>a<EXAM_MODE>b</EXAM_MODE><EXAM_MODE>c</EXAM_MODE><GUIDED_MODE>cut"
+    values, problems = scan_tags(text, TAGGED_FIELDS)
+    assert values["EXAM_MODE"] == "a<EXAM_MODE>b"
+    kinds = sorted(p.split()[0] for p in problems)
+    assert kinds == ["duplicate", "missing", "missing", "missing", "nested", "stray", "unclosed"]
+    assert f"unclosed <GUIDED_MODE> at {text.index('<GUIDED_MODE>')}" in problems
+
+
+def test_extract_tag_and_keywords():
+    assert extract_tag("<KEYWORDS> x , y </KEYWORDS>", "KEYWORDS") == "x , y"
+    assert split_keywords("x , y") == ["x", "y"]
+    assert split_keywords(None) == []
+
+
+def test_split_item_blocks():
+    text = (
+        '<ITEM_RESULT id="1">one</ITEM_RESULT>\n'
+        '<ITEM_RESULT id=2>two</ITEM_RESULT>\n'
+        '<ITEM_RESULT id="1">again</ITEM_RESULT>\n'
+        '<ITEM_RESULT id="3">truncated'
+    )
+    assert split_item_blocks(text) == {1: "one", 2: "two"}
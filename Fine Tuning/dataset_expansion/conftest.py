@@ -0,0 +1,3 @@
+# test_data_expand.py is the original expansion script run against the test
+# seed file, not a test module (it needs DEEPSEEK_API_KEY at import)
+collect_ignore = ["test_data_expand.py"]
@@ -0,0 +1,244 @@
+''' Columnar export of the expanded Q&A rows for fine-tuning
+
+Reads expanded_dataset_v1.jsonl (skipping lines that are not valid JSON) and
+structured_dataset_v1.json once, normalizes them into one typed schema and
+writes deterministic, stratified train/val/test splits as Arrow IPC files
+(memory-mappable, zero-copy reads) plus optional Parquet copies and a
+stats.json.
+
+Usage:
+    python export_training_set.py [--parquet]
+
+Reading back:
+    from export_training_set import load_split
+    train = load_split("train", columns=["subject", "question", "exam_mode_answer"])
+'''
+import os
+import ast
+import sys
+import json
+import hashlib
+from collections import Counter, defaultdict
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BASE_DIR, "Seed Dataset"))
+
+from syllbus_family_mapping import infer_family
+
+# ---------------- CONFIG ----------------
+
+SOURCES = [
+    os.path.join(BASE_DIR, "expanded_dataset_v1.jsonl"),
+    os.path.join(BASE_DIR, "structured_dataset_v1.json"),
+]
+EXPORT_DIR = os.path.join(BASE_DIR, "training_set")
+
+SPLITS = (("train", 0.8), ("val", 0.1), ("test", 0.1))
+
+SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("source", pa.dictionary(pa.int8(), pa.string())),
+    ("subject", pa.dictionary(pa.int8(), pa.string())),
+    ("family", pa.dictionary(pa.int8(), pa.string())),
+    ("marks", pa.float32()),
+    ("question", pa.string()),
+    ("exam_mode_answer", pa.string()),
+    ("exam_f_question", pa.string()),
+    ("guided_mode_answer", pa.string()),
+    ("guided_f_question", pa.string()),
+    ("keywords", pa.list_(pa.string())),
+    ("synthetic", pa.bool_()),
+])
+
+# ---------------- READ + NORMALIZE ----------------
+
+def parse_keywords(raw):
+    """
+    Keywords come as a list, a stringified Python list, or a comma string.
+    """
+    if isinstance(raw, list):
+        return [str(k).strip() for k in raw if str(k).strip()]
+    if not raw:
+        return []
+    raw = str(raw).strip()
+    if raw.startswith("["):
+        try:
+            return parse_keywords(ast.literal_eval(raw))
+        except (ValueError, SyntaxError):
+            raw = raw.strip("[]")
+    return [k.strip().strip("'\"") for k in raw.split(",") if k.strip()]
+
+
+def row_id(subject, question):
+    return hashlib.sha1(f"{subject}\n{question}".encode("utf-8")).hexdigest()[:16]
+
+
+def normalize_row(raw, source):
+    subject = (raw.get("subject") or "").strip()
+    question = (raw.get("question") or "").strip()
+    marks = raw.get("marks", raw.get("mark"))
+    try:
+        marks = float(marks) if marks is not None else None
+    except (TypeError, ValueError):
+        marks = None
+
+    return {
+        "id": row_id(subject, question),
+        "source": source,
+        "subject": subject,
+        "family": infer_family(subject),
+        "marks": marks,
+        "question": question,
+        "exam_mode_answer": raw.get("exam_mode_answer") or None,
+        "exam_f_question": raw.get("exam_f_question") or None,
+        "guided_mode_answer": raw.get("guided_mode_answer") or None,
+        "guided_f_question": raw.get("guided_f_question") or None,
+        "keywords": parse_keywords(raw.get("keywords")),
+        "synthetic": "synthetic_expansion" in raw,
+    }
+
+
+def iter_source(path, invalid):
+    source = os.path.basename(path)
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield normalize_row(json.loads(line), source)
+                except json.JSONDecodeError:
+                    invalid.append(f"{source}:{line_no}")
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            for raw in json.load(f):
+                yield normalize_row(raw, source)
+
+
+def load_rows(sources=SOURCES):
+    """
+    Returns (rows, invalid_lines). Exact (subject, question) repeats keep the
+    first occurrence so a question never lands in two splits.
+    """
+    invalid = []
+    seen = set()
+    rows = []
+    for path in sources:
+        if not os.path.exists(path):
+            continue
+        for row in iter_source(path, invalid):
+            if not row["question"] or row["id"] in seen:
+                continue
+            seen.add(row["id"])
+            rows.append(row)
+    return rows, invalid
+
+# ---------------- SPLITS ----------------
+
+def assign_splits(rows):
+    """
+    Stratified by (subject, marks): inside each stratum rows are ordered by
+    their id hash and cut at the SPLITS ratios, so the split is stable across
+    runs and every subject/marks combination shows up in train first.
+    """
+    strata = defaultdict(list)
+    for row in rows:
+        strata[(row["subject"], row["marks"])].append(row)
+
+    for members in strata.values():
+        members.sort(key=lambda r: r["id"])
+        n = len(members)
+        for pos, row in enumerate(members):
+            frac = (pos + 0.5) / n
+            acc = 0.0
+            for name, ratio in SPLITS:
+                acc += ratio
+                if frac < acc or name == SPLITS[-1][0]:
+                    row["split"] = name
+                    break
+    return rows
+
+# ---------------- WRITE ----------------
+
+def to_table(rows):
+    columns = {name: [r[name] for r in rows] for name in SCHEMA.names}
+    return pa.table(columns, schema=SCHEMA)
+
+
+def write_split(table, name, export_dir, parquet=False):
+    path = os.path.join(export_dir, f"{name}.arrow")
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=1024)
+
+    if parquet:
+        import pyarrow.parquet as pq
+        pq.write_table(table, os.path.join(export_dir, f"{name}.parquet"), compression="zstd")
+    return path
+
+
+def build_stats(rows, invalid):
+    by_split = defaultdict(lambda: {"rows": 0, "subjects": Counter(), "marks": Counter()})
+    for row in rows:
+        s = by_split[row["split"]]
+        s["rows"] += 1
+        s["subjects"][row["subject"]] += 1
+        s["marks"][str(row["marks"])] += 1
+
+    def avg_len(field):
+        vals = [len(r[field]) for r in rows if r[field]]
+        return round(sum(vals) / len(vals), 1) if vals else 0
+
+    return {
+        "rows": len(rows),
+        "invalid_lines": invalid,
+        "splits": {k: {"rows": v["rows"], "subjects": dict(v["subjects"]), "marks": dict(v["marks"])}
+                   for k, v in by_split.items()},
+        "avg_chars": {f: avg_len(f) for f in ("exam_mode_answer", "guided_mode_answer")},
+        "missing": {
+            f: sum(1 for r in rows if not r[f])
+            for f in ("exam_mode_answer", "guided_mode_answer", "exam_f_question", "guided_f_question")
+        },
+    }
+
+
+def export(export_dir=EXPORT_DIR, parquet=False):
+    rows, invalid = load_rows()
+    assign_splits(rows)
+
+    os.makedirs(export_dir, exist_ok=True)
+    for name, _ in SPLITS:
+        table = to_table([r for r in rows if r["split"] == name])
+        path = write_split(table, name, export_dir, parquet)
+        print(f"{name}: {table.num_rows} rows -> {path}")
+
+    stats = build_stats(rows, invalid)
+    with open(os.path.join(export_dir, "stats.json"), "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2, ensure_ascii=False)
+
+    if invalid:
+        print(f"Skipped invalid JSON lines: {', '.join(invalid)}")
+    print(f"Total rows: {len(rows)}")
+    return stats
+
+# ---------------- READ BACK ----------------
+
+def load_split(name, columns=None, subject=None, export_dir=EXPORT_DIR):
+    """
+    Memory-maps a split. Buffers point into the mapped file, so only the
+    columns actually touched are paged in.
+    """
+    source = pa.memory_map(os.path.join(export_dir, f"{name}.arrow"), "r")
+    table = pa.ipc.open_file(source).read_all()
+    if subject is not None:
+        table = table.filter(pc.equal(table["subject"].cast(pa.string()), subject))
+    if columns is not None:
+        table = table.select(columns)
+    return table
+
+
+if __name__ == "__main__":
+    export(parquet="--parquet" in sys.argv)
@@ -0,0 +1,324 @@
+''' Pre-tokenized, sequence-packed training blocks for fine-tuning
+
+Uses the same rows and the same train/val/test split as export_training_set.
+Every row gives up to two chat examples, exam mode and guided mode. Each
+has the mode's system prompt, the question, and the answer followed by its
+follow-up questions, rendered with the base model's chat template. The
+examples are tokenized once across worker processes and packed best-fit
+into fixed-length blocks. The only padding left is the tail of each block,
+not every short 1-mark answer padded out to the longest one.
+
+Per split, in training_set/packed/:
+    {split}.tokens.npy        (blocks, block_len) token ids; uint16 when the vocab fits
+    {split}.loss_mask.npy     (blocks, block_len) 1 on assistant tokens
+    {split}.position_ids.npy  (blocks, block_len) restart at 0 for every example
+    {split}.index.npy         one record per example: block, start, length,
+                              answer_start, row (the export's id), mode
+plus meta.json with the tokenizer, block length and density stats. All are
+plain .npy files, so loading is np.load(mmap_mode="r") with nothing to parse.
+
+Examples packed into one block must not attend to each other.
+position_ids restart at 0 at every example, and that is how flash-attention
+varlen kernels find the boundaries (HF models with
+attn_implementation="flash_attention_2" and position_ids passed in).
+PackedSplit.cu_seqlens() gives the same boundaries explicitly.
+
+Usage:
+    python pack_training_set.py --tokenizer <hf name or local path> [--block-len 2048] [--workers 8]
+
+Reading back:
+    from pack_training_set import PackedSplit
+    train = PackedSplit("train")
+    batch = train[0:8]    # input_ids, labels (-100 off the answers), position_ids
+'''
+import os
+import json
+import bisect
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+
+from export_training_set import EXPORT_DIR, SPLITS, load_rows, assign_splits
+
+# ---------------- CONFIG ----------------
+
+PACKED_DIR = os.path.join(EXPORT_DIR, "packed")
+BLOCK_LEN = 2048
+IGNORE_INDEX = -100
+SEED = 0
+
+# same wording as backend/search-service/generation.py, so the model is
+# trained on the system prompt it is served with
+SYSTEM_PROMPT = "You are Ask-M, a study assistant for Kathmandu University students."
+MODE_INSTRUCTIONS = {
+    "exam": (
+        "Write the answer exactly as a KU student would write in exams. "
+        "Correctness over verbosity. If the question asks to compare or "
+        "differentiate, answer in a table."
+    ),
+    "guided": (
+        "Explain the concept at beginner to intermediate level: the idea first, "
+        "then syntax, with the logic broken into clear steps."
+    ),
+}
+FOLLOW_UP_HEADINGS = {"exam": "Follow-up question:", "guided": "Check your understanding:"}
+MODES = tuple(MODE_INSTRUCTIONS)
+
+INDEX_DTYPE = np.dtype([
+    ("block", "<u4"), ("start", "<u4"), ("length", "<u4"), ("answer_start", "<u4"),
+    ("row", "<u8"), ("mode", "u1"),
+])
+
+# ---------------- RENDER ----------------
+
+def build_examples(row):
+    """
+    One chat example per mode the row has an answer for.
+    """
+    examples = []
+    for mode in MODES:
+        answer = row[f"{mode}_mode_answer"]
+        if not answer:
+            continue
+        follow_up = row[f"{mode}_f_question"]
+        if follow_up:
+            answer = f"{answer.rstrip()}\n\n{FOLLOW_UP_HEADINGS[mode]}\n{follow_up.strip()}"
+        examples.append({
+            "row": int(row["id"], 16),
+            "mode": MODES.index(mode),
+            "messages": [
+                {"role": "system", "content": f"{SYSTEM_PROMPT} {MODE_INSTRUCTIONS[mode]}"},
+                {"role": "user", "content": row["question"]},
+                {"role": "assistant", "content": answer},
+            ],
+        })
+    return examples
+
+# ---------------- TOKENIZE ----------------
+
+def load_tokenizer(name):
+    # only the build needs transformers; PackedSplit readers don't
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    if not tokenizer.chat_template:
+        raise ValueError(f"{name} has no chat template; use the tokenizer of an instruct/chat model")
+    return tokenizer
+
+
+_tokenizer = None
+
+
+def _init_worker(name):
+    global _tokenizer
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    _tokenizer = load_tokenizer(name)
+
+
+def tokenize_example(example):
+    """
+    Returns (token ids, index of the first answer token). The answer starts
+    where the prompt rendered with a generation prompt stops matching the
+    full conversation.
+    """
+    messages = example["messages"]
+    prompt = _tokenizer.apply_chat_template(messages[:-1], tokenize=False, add_generation_prompt=True)
+    full = _tokenizer.apply_chat_template(messages, tokenize=False)
+    prompt_ids = _tokenizer(prompt, add_special_tokens=False)["input_ids"]
+    ids = _tokenizer(full, add_special_tokens=False)["input_ids"]
+
+    answer_start = 0
+    for a, b in zip(prompt_ids, ids):
+        if a != b:
+            break
+        answer_start += 1
+    return np.asarray(ids, dtype=np.uint32), answer_start
+
+
+def tokenize_all(examples, tokenizer_name, workers):
+    if workers <= 1:
+        _init_worker(tokenizer_name)
+        return [tokenize_example(e) for e in examples]
+    with Pool(workers, initializer=_init_worker, initargs=(tokenizer_name,)) as pool:
+        return pool.map(tokenize_example, examples, chunksize=32)
+
+# ---------------- PACK ----------------
+
+def pack(lengths, block_len):
+    """
+    Best-fit decreasing: longest example first, each into the open block
+    with the least room that still fits it. Returns (block per example,
+    number of blocks).
+    """
+    assignment = np.empty(len(lengths), dtype=np.int64)
+    free = []                                    # sorted (room, block)
+    blocks = 0
+    for i in np.argsort(-np.asarray(lengths), kind="stable"):
+        n = int(lengths[i])
+        pos = bisect.bisect_left(free, (n, -1))
+        if pos < len(free):
+            room, block = free.pop(pos)
+        else:
+            room, block = block_len, blocks
+            blocks += 1
+        assignment[i] = block
+        if room - n > 0:
+            bisect.insort(free, (room - n, block))
+    return assignment, blocks
+
+
+def _open_array(path, dtype, shape, fill):
+    array = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+    array[:] = fill
+    return array
+
+
+def write_split(name, examples, tokenized, block_len, token_dtype, pad_id, export_dir):
+    keep = [i for i, (ids, _) in enumerate(tokenized) if len(ids) <= block_len]
+    too_long = sorted({f"{examples[i]['row']:016x}" for i in range(len(examples)) if len(tokenized[i][0]) > block_len})
+    lengths = [len(tokenized[i][0]) for i in keep]
+    assignment, blocks = pack(lengths, block_len)
+    # blocks come out of packing roughly sorted by fill; shuffle them once
+    # here so sequential reads don't see all the long examples first
+    order = np.random.default_rng(SEED).permutation(blocks)
+    assignment = order[assignment] if blocks else assignment
+
+    shape = (blocks, block_len)
+    paths = {part: os.path.join(export_dir, f"{name}.{part}.npy") for part in ("tokens", "loss_mask", "position_ids", "index")}
+    tokens = _open_array(paths["tokens"] + ".tmp", token_dtype, shape, pad_id)
+    loss_mask = _open_array(paths["loss_mask"] + ".tmp", np.uint8, shape, 0)
+    position_ids = _open_array(paths["position_ids"] + ".tmp", np.uint16 if block_len <= 65536 else np.uint32, shape, 0)
+
+    index = np.zeros(len(keep), dtype=INDEX_DTYPE)
+    used = np.zeros(blocks, dtype=np.int64)
+    for j, i in enumerate(keep):
+        ids, answer_start = tokenized[i]
+        block, n = assignment[j], len(ids)
+        start = used[block]
+        used[block] += n
+        tokens[block, start:start + n] = ids
+        loss_mask[block, start + answer_start:start + n] = 1
+        position_ids[block, start:start + n] = np.arange(n)
+        index[j] = (block, start, n, answer_start, examples[i]["row"], examples[i]["mode"])
+    index.sort(order=["block", "start"])
+
+    for array in (tokens, loss_mask, position_ids):
+        array.flush()
+    del tokens, loss_mask, position_ids
+    with open(paths["index"] + ".tmp", "wb") as f:
+        np.save(f, index)
+    for path in paths.values():
+        os.replace(path + ".tmp", path)
+
+    real = int(sum(lengths))
+    return {
+        "examples": len(keep),
+        "blocks": blocks,
+        "tokens": real,
+        "loss_tokens": int(sum(len(tokenized[i][0]) - tokenized[i][1] for i in keep)),
+        "max_example_tokens": max(lengths, default=0),
+        "mean_example_tokens": round(real / len(keep), 1) if keep else 0,
+        # share of each batch that is real tokens, packed vs one example per
+        # row padded to the longest
+        "fill": round(real / (blocks * block_len), 4) if blocks else 0,
+        "fill_unpacked": round(real / (len(keep) * max(lengths)), 4) if keep else 0,
+        "dropped_too_long": too_long,
+    }
+
+
+def build(tokenizer_name, block_len=BLOCK_LEN, workers=None, export_dir=PACKED_DIR):
+    rows, invalid = load_rows()
+    assign_splits(rows)
+    workers = workers or os.cpu_count() or 1
+
+    tokenizer = load_tokenizer(tokenizer_name)
+    vocab = len(tokenizer)
+    token_dtype = np.uint16 if vocab <= 65536 else np.uint32
+    pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+
+    examples = [e for row in rows for e in build_examples(row)]
+    tokenized = tokenize_all(examples, tokenizer_name, workers)
+    split_of = {int(r["id"], 16): r["split"] for r in rows}
+
+    os.makedirs(export_dir, exist_ok=True)
+    splits = {}
+    for name, _ in SPLITS:
+        members = [i for i, e in enumerate(examples) if split_of[e["row"]] == name]
+        splits[name] = write_split(
+            name, [examples[i] for i in members], [tokenized[i] for i in members],
+            block_len, token_dtype, pad_id, export_dir,
+        )
+        s = splits[name]
+        print(f"{name}: {s['examples']} examples -> {s['blocks']} blocks of {block_len} "
+              f"(fill {s['fill']:.1%}, unpacked {s['fill_unpacked']:.1%})")
+        if s["dropped_too_long"]:
+            print(f"  dropped {len(s['dropped_too_long'])} rows longer than {block_len} tokens")
+
+    meta = {
+        "tokenizer": tokenizer_name,
+        "vocab_size": vocab,
+        "token_dtype": np.dtype(token_dtype).name,
+        "pad_id": pad_id,
+        "block_len": block_len,
+        "modes": list(MODES),
+        "invalid_lines": invalid,
+        "splits": splits,
+    }
+    # arrays first; meta last, so a half-written build is never opened
+    with open(os.path.join(export_dir, "meta.json.tmp"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(os.path.join(export_dir, "meta.json.tmp"), os.path.join(export_dir, "meta.json"))
+    return meta
+
+# ---------------- READ BACK ----------------
+
+class PackedSplit:
+    """
+    Memory-mapped view of one packed split. Blocks are fixed length, so a
+    block (or a slice of blocks) is a slice of each array, paged in on first
+    touch.
+    """
+
+    def __init__(self, split, export_dir=PACKED_DIR):
+        with open(os.path.join(export_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        load = lambda part: np.load(os.path.join(export_dir, f"{split}.{part}.npy"), mmap_mode="r")
+        self.tokens = load("tokens")
+        self.loss_mask = load("loss_mask")
+        self.position_ids = load("position_ids")
+        self.index = load("index")
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __getitem__(self, i):
+        input_ids = self.tokens[i].astype(np.int64)
+        return {
+            "input_ids": input_ids,
+            "labels": np.where(self.loss_mask[i] == 1, input_ids, IGNORE_INDEX),
+            "position_ids": self.position_ids[i].astype(np.int64),
+        }
+
+    def examples(self, block):
+        # the index is sorted by (block, start)
+        lo, hi = np.searchsorted(self.index["block"], [block, block + 1])
+        return self.index[lo:hi]
+
+    def cu_seqlens(self, block):
+        """
+        Example boundaries inside a block, flash-attention varlen style:
+        [0, end of example 1, end of example 2, ...]. The padded tail is
+        not included.
+        """
+        ex = self.examples(block)
+        return np.concatenate([[0], ex["start"] + ex["length"]]).astype(np.int32)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0].strip())
+    parser.add_argument("--tokenizer", required=True, help="HF model name or local tokenizer path")
+    parser.add_argument("--block-len", type=int, default=BLOCK_LEN)
+    parser.add_argument("--workers", type=int, default=None, help="tokenizer processes (default: all cores)")
+    args = parser.parse_args()
+    build(args.tokenizer, args.block_len, args.workers)
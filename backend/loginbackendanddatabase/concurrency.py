@@ -0,0 +1,43 @@
+import asyncio
+
+from fastapi import HTTPException
+
+
+class EndpointLimit:
+    """
+    FastAPI dependency capping how many requests an endpoint handles at once.
+
+    Requests over the cap wait up to `max_wait` seconds for a slot and then
+    get a 503 with Retry-After, instead of piling up behind a slow upstream.
+
+        verify_limit = EndpointLimit("auth_verify", max_concurrent=128)
+
+        @app.post("/auth/verify", dependencies=[Depends(verify_limit)])
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_wait: float = 2.0, retry_after: int = 1):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def __call__(self):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f"Too many concurrent {self.name} requests, retry shortly",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
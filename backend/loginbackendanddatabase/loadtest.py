@@ -0,0 +1,196 @@
+""" Load test for /auth/verify against a local stub of the Supabase endpoints
+
+Starts a stub Supabase (auth user lookup, JWKS, profiles upsert) with fixed
+added latency, starts the backend with uvicorn pointed at it, then fires
+concurrent /auth/verify requests and reports requests/sec and latency
+percentiles. No real Supabase project is touched.
+
+Usage:
+    python loadtest.py --requests 3000 --concurrency 100 --verify remote
+    python loadtest.py --verify local          # tokens checked with SUPABASE_JWT_SECRET
+    python loadtest.py --app other_main:app    # compare against another version
+
+--verify remote makes every token fall back to the stub's /auth/v1/user,
+which is the path the original backend took on every call.
+"""
+import os
+import sys
+import time
+import json
+import base64
+import asyncio
+import argparse
+import subprocess
+from collections import Counter
+
+import httpx
+import jwt
+
+STUB_SECRET = "loadtest-secret-loadtest-secret-00"
+SERVICE_KEY = jwt.encode({"role": "service_role"}, STUB_SECRET, algorithm="HS256")
+
+# ---------------- STUB SUPABASE ----------------
+
+def build_stub(latency):
+    from fastapi import FastAPI, Request
+
+    stub = FastAPI()
+    counts = Counter()
+
+    def claims_from(request):
+        token = request.headers.get("Authorization", "").replace("Bearer ", "")
+        payload = token.split(".")[1]
+        return json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+
+    @stub.get("/")
+    async def root():
+        return dict(counts)
+
+    @stub.get("/auth/v1/.well-known/jwks.json")
+    async def jwks():
+        return {"keys": []}
+
+    @stub.get("/auth/v1/user")
+    async def get_user(request: Request):
+        counts["auth_user"] += 1
+        await asyncio.sleep(latency)
+        claims = claims_from(request)
+        return {
+            "id": claims["sub"],
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": claims.get("email"),
+            "app_metadata": {"provider": "google"},
+            "user_metadata": claims.get("user_metadata", {}),
+            "created_at": "2026-01-01T00:00:00Z",
+        }
+
+    @stub.post("/rest/v1/profiles")
+    async def upsert_profiles(request: Request):
+        counts["profiles_upsert"] += 1
+        body = await request.json()
+        counts["profiles_rows"] += len(body) if isinstance(body, list) else 1
+        await asyncio.sleep(latency)
+        return body if isinstance(body, list) else [body]
+
+    return stub
+
+# ---------------- PROCESSES ----------------
+
+def spawn(args, env):
+    return subprocess.Popen(args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_up(url, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+# ---------------- LOAD ----------------
+
+def make_tokens(users, secret, issuer):
+    now = int(time.time())
+    return [
+        jwt.encode({
+            "iss": issuer,
+            "sub": f"00000000-0000-0000-0000-{i:012d}",
+            "email": f"student{i}@ku.edu.np",
+            "aud": "authenticated",
+            "exp": now + 3600,
+            "user_metadata": {"full_name": f"Student {i}"},
+        }, secret, algorithm="HS256")
+        for i in range(users)
+    ]
+
+
+async def fire(url, tokens, total, concurrency):
+    latencies = []
+    statuses = Counter()
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        async def one(i):
+            async with sem:
+                start = time.perf_counter()
+                try:
+                    resp = await client.post(url, headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"})
+                    statuses[resp.status_code] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    pct = lambda p: round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+    return {
+        "requests": total,
+        "elapsed_s": round(elapsed, 2),
+        "requests_per_s": round(total / elapsed, 1),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "statuses": {str(k): v for k, v in statuses.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--app", default="main:app")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=50, help="added to every stub Supabase call")
+    parser.add_argument("--verify", choices=["remote", "local"], default="remote")
+    parser.add_argument("--stub-port", type=int, default=8799)
+    parser.add_argument("--app-port", type=int, default=8798)
+    parser.add_argument("--serve-stub", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_stub:
+        import uvicorn
+        uvicorn.run(build_stub(args.latency_ms / 1000), port=args.stub_port, log_level="warning")
+        return
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    env = dict(os.environ, SUPABASE_URL=stub_url, SUPABASE_SERVICE_ROLE_KEY=SERVICE_KEY)
+    env.pop("SUPABASE_JWT_SECRET", None)
+    if args.verify == "local":
+        env["SUPABASE_JWT_SECRET"] = STUB_SECRET
+
+    stub = spawn([sys.executable, __file__, "--serve-stub",
+                  "--stub-port", str(args.stub_port), "--latency-ms", str(args.latency_ms)], env)
+    app = None
+    try:
+        wait_until_up(stub_url)
+        app = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", args.app, "--port", str(args.app_port), "--log-level", "warning"],
+            env=env, cwd=here, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        app_url = f"http://127.0.0.1:{args.app_port}"
+        wait_until_up(app_url)
+
+        report = asyncio.run(fire(f"{app_url}/auth/verify", make_tokens(args.users, STUB_SECRET, f"{stub_url}/auth/v1"),
+                                  args.requests, args.concurrency))
+        time.sleep(1)
+        report["stub_calls"] = httpx.get(stub_url).json()
+        report["config"] = {k: v for k, v in vars(args).items() if k != "serve_stub"}
+        print(json.dumps(report, indent=2))
+    finally:
+        for proc in (app, stub):
+            if proc:
+                proc.terminate()
+                proc.wait()
+
+
+if __name__ == "__main__":
+    main()
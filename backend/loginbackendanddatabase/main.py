@@ -1,6 +1,8 @@
 import os
-from fastapi import FastAPI, HTTPException, Header
-from supabase import create_client, Client
+import sys
+import time
+from fastapi import FastAPI, HTTPException, Header, Depends, Request
+from supabase import Client
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -8,7 +10,16 @@ from pathlib import Path
 env_path = Path('.') / '.env'
 load_dotenv(dotenv_path=env_path)
 
+# modules shared with the other services
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shared"))
+
 from fastapi.middleware.cors import CORSMiddleware
+from token_verifier import TokenVerifier, TokenError, VerifierUnavailable
+from profile_sync import ProfileSync
+from supabase_client import create_pooled_client, run_supabase
+from concurrency import EndpointLimit
+from metrics_client import MetricsClient
+from profiling import install_profiling
 
 app = FastAPI()
 
@@ -22,25 +33,106 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Admin-only per-request cProfile and whole-process sampling (PROFILING_TOKEN)
+install_profiling(app, os.path.dirname(os.path.abspath(__file__)))
+
 # Supabase Configuration
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+# Only needed for projects still signing tokens with the legacy HS256 secret
+SUPABASE_JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET")
 
 if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
     print("WARNING: SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY not found in environment variables.")
 
 # Create Supabase client with Service Role key (to bypass RLS for administrative tasks)
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+# The client is synchronous: every call goes through run_supabase(), which runs it
+# on a bounded thread pool over a shared keep-alive connection pool.
+supabase: Client = create_pooled_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+
+# Per-endpoint caps on concurrent requests (503 + Retry-After beyond them)
+verify_limit = EndpointLimit("auth_verify", max_concurrent=int(os.environ.get("AUTH_VERIFY_CONCURRENCY", 256)))
+
+# Verifies JWTs locally against the project's signing keys (refreshed in the background)
+verifier = TokenVerifier(SUPABASE_URL, jwt_secret=SUPABASE_JWT_SECRET)
+
+# Skips no-op profile writes and batches the rest into bulk upserts
+profile_sync = ProfileSync(supabase)
+
+# Request latency and outcomes for the admin dashboard (METRICS_SERVICE_URL)
+metrics_client = MetricsClient("auth")
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        metrics_client.timing("unhandled", (time.perf_counter() - start) * 1000, "error")
+        raise
+    # keyed by route template, so arbitrary paths can't mint new series
+    route = request.scope.get("route")
+    name = (route.path.strip("/").replace("/", ".") or "root") if route else "unmatched"
+    if response.status_code in (429, 503):
+        status = "rejected"
+    elif response.status_code >= 400:
+        status = "error"
+    else:
+        status = "ok"
+    metrics_client.timing(name, (time.perf_counter() - start) * 1000, status)
+    if response.status_code >= 500:
+        metrics_client.log("ERROR", f"{request.method} {request.url.path} -> {response.status_code}")
+    return response
+
+@app.on_event("startup")
+async def start_background_tasks():
+    await verifier.start()
+    await profile_sync.start()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await verifier.stop()
+    await profile_sync.stop()
+
+async def authenticate(token: str) -> dict:
+    """
+    Returns {"id", "email", "user_metadata"} for a valid token.
+    Checked locally when possible; Supabase Auth is only asked when no local
+    key can verify the token.
+    """
+    try:
+        claims = await verifier.verify(token)
+        return {
+            "id": claims["sub"],
+            "email": claims.get("email"),
+            "user_metadata": claims.get("user_metadata") or {}
+        }
+    except TokenError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    except VerifierUnavailable as e:
+        print(f"Local verification unavailable, asking Supabase: {e}")
+        metrics_client.count("verify_fallback")
+
+    user_response = await run_supabase(supabase.auth.get_user, token)
+    user = user_response.user if user_response else None
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    return {
+        "id": user.id,
+        "email": user.email,
+        "user_metadata": user.user_metadata or {}
+    }
 
 @app.get("/")
 async def root():
     return {"message": "Python Backend is Running"}
 
-@app.post("/auth/verify")
+@app.post("/auth/verify", dependencies=[Depends(verify_limit)])
 async def verify_user(authorization: str = Header(None)):
     """
-    Receives a JWT from the frontend, verifies it with Supabase,
-    and ensures the user exists in the 'profiles' table.
+    Receives a JWT from the frontend, verifies it (locally, or with Supabase
+    as a fallback), and ensures the user exists in the 'profiles' table.
     """
     if not authorization:
         raise HTTPException(status_code=401, detail="Missing Authorization Header")
@@ -49,24 +141,21 @@ async def verify_user(authorization: str = Header(None)):
     token = authorization.replace("Bearer ", "")
     
     try:
-        # 1. Verify the JWT with Supabase Auth
+        # 1. Verify the JWT
         # This confirms the user is logged in and the token is valid
-        user_response = supabase.auth.get_user(token)
-        user = user_response.user
-        
-        if not user:
-            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        user = await authenticate(token)
 
         # 2. Extract profile details from the user object
         # User metadata contains info from Google OAuth (name, avatar, etc.)
-        metadata = user.user_metadata or {}
-        user_id = user.id
-        email = user.email
+        metadata = user["user_metadata"]
+        user_id = user["id"]
+        email = user["email"]
         full_name = metadata.get("full_name") or metadata.get("name", "")
         avatar_url = metadata.get("avatar_url") or metadata.get("picture", "")
 
         # 3. Sync with 'profiles' table in the database
-        # We use 'upsert' to create the record if it doesn't exist, or update it if it does.
+        # Unchanged profiles are skipped; changed ones are upserted in batches
+        # (create the record if it doesn't exist, or update it if it does).
         profile_data = {
             "id": user_id,
             "email": email,
@@ -75,7 +164,7 @@ async def verify_user(authorization: str = Header(None)):
         }
         
         # Note: 'upsert' works because 'id' is our primary key tied to auth.users.id
-        result = supabase.table("profiles").upsert(profile_data).execute()
+        await profile_sync.sync(profile_data)
         
         return {
             "status": "success",
@@ -87,6 +176,8 @@ async def verify_user(authorization: str = Header(None)):
             }
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         # Log the error for debugging
         print(f"Verification Error: {str(e)}")
@@ -0,0 +1,190 @@
+import time
+import json
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from supabase_client import run_supabase
+
+
+def profile_fingerprint(profile: dict) -> str:
+    fields = {k: profile.get(k) for k in ("email", "full_name", "avatar_url")}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class FingerprintStore(ABC):
+    """
+    Remembers the fingerprint of the last profile written per user id.
+    Subclass with a shared backend (e.g. Redis GET/SETEX) to share it
+    between workers; the default keeps it in-process.
+    """
+
+    @abstractmethod
+    def get(self, user_id: str) -> str | None:
+        ...
+
+    @abstractmethod
+    def set(self, user_id: str, fingerprint: str):
+        ...
+
+
+class MemoryFingerprintStore(FingerprintStore):
+    """LRU with a TTL, so a profile is re-written at least once per TTL."""
+
+    def __init__(self, max_entries: int = 50_000, ttl: float = 6 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        fingerprint, expires = entry
+        if expires <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return fingerprint
+
+    def set(self, user_id, fingerprint):
+        self._entries[user_id] = (fingerprint, time.monotonic() + self.ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class ProfileSync:
+    """
+    Coalesces profile upserts.
+
+    sync() drops profiles identical to the last one written for that user,
+    and otherwise queues the latest version per user. A background task writes
+    everything queued as one bulk upsert every `flush_interval` seconds,
+    stamping `updated_at`. When someone is waiting on a write the task wakes
+    early and only holds the batch open for `coalesce_window` seconds.
+
+    Rows of a failed batch go back on the queue for the next flush, up to
+    `max_retries` times each.
+    """
+
+    def __init__(self, supabase, store: FingerprintStore | None = None,
+                 flush_interval: float = 2.0, coalesce_window: float = 0.05,
+                 max_batch: int = 500, max_retries: int = 3):
+        self.supabase = supabase
+        self.store = store or MemoryFingerprintStore()
+        self.flush_interval = flush_interval
+        self.coalesce_window = coalesce_window
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+
+        self._pending: dict[str, tuple[dict, str]] = {}
+        self._retries: dict[str, int] = {}
+        self._waiters: dict[str, list[asyncio.Future]] = {}
+        self._task: asyncio.Task | None = None
+        self._wake = asyncio.Event()
+        self.stats = {"submitted": 0, "skipped": 0, "written": 0, "batches": 0, "errors": 0,
+                      "retried": 0, "dropped": 0}
+
+    async def sync(self, profile: dict) -> bool:
+        """
+        Queues the profile unless it matches the last one written. Returns
+        whether a write was queued. For a user with nothing on record (new
+        user, or evicted / restarted cache) it waits until the batch holding
+        the row is written, so the profile exists before the caller responds;
+        known users don't wait.
+        """
+        self.stats["submitted"] += 1
+        user_id = profile["id"]
+        fingerprint = profile_fingerprint(profile)
+        last = self.store.get(user_id)
+
+        if last == fingerprint:
+            self.stats["skipped"] += 1
+            return False
+
+        self._pending[user_id] = (profile, fingerprint)
+        self._retries.pop(user_id, None)
+        if last is None:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(user_id, []).append(future)
+            self._wake.set()
+            await future
+        return True
+
+    async def flush(self):
+        while self._pending:
+            user_ids = list(self._pending)[:self.max_batch]
+            batch = {uid: self._pending.pop(uid) for uid in user_ids}
+            waiters = {uid: self._waiters.pop(uid, []) for uid in user_ids}
+
+            now = datetime.now(timezone.utc).isoformat()
+            rows = [dict(profile, updated_at=now) for profile, _ in batch.values()]
+
+            try:
+                await run_supabase(
+                    lambda: self.supabase.table("profiles").upsert(rows).execute()
+                )
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Profile batch upsert failed ({len(rows)} rows): {e}")
+                # waiters get the error now rather than holding a login open
+                # across retries
+                for futures in waiters.values():
+                    for f in futures:
+                        if not f.done():
+                            f.set_exception(e)
+                self._requeue(batch)
+                # the rest waits for the next flush too, instead of hammering
+                # a backend that just failed
+                return
+
+            for uid, (_, fingerprint) in batch.items():
+                self.store.set(uid, fingerprint)
+                self._retries.pop(uid, None)
+            for futures in waiters.values():
+                for f in futures:
+                    if not f.done():
+                        f.set_result(True)
+
+            self.stats["written"] += len(rows)
+            self.stats["batches"] += 1
+
+    def _requeue(self, batch: dict[str, tuple[dict, str]]):
+        for uid, entry in batch.items():
+            if uid in self._pending:
+                continue   # re-submitted while the batch was in flight; the newer one goes
+            attempts = self._retries.get(uid, 0) + 1
+            if attempts > self.max_retries:
+                self._retries.pop(uid, None)
+                self.stats["dropped"] += 1
+                print(f"Profile upsert for {uid} dropped after {self.max_retries} retries")
+                continue
+            self._retries[uid] = attempts
+            self._pending[uid] = entry
+            self.stats["retried"] += 1
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+                await asyncio.sleep(self.coalesce_window)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Profile flush loop error: {e}")
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
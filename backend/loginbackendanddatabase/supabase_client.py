@@ -0,0 +1,48 @@
+import os
+import functools
+
+import anyio
+import httpx
+from supabase import create_client, Client, ClientOptions
+
+from profiling import profiled
+
+# Seconds. Supabase calls sit on the request path, so fail fast instead of
+# holding a worker thread for the library default of 120s.
+SUPABASE_CONNECT_TIMEOUT = float(os.environ.get("SUPABASE_CONNECT_TIMEOUT", 3))
+SUPABASE_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT", 10))
+
+# Keep-alive connections shared by the auth and database clients
+SUPABASE_MAX_CONNECTIONS = int(os.environ.get("SUPABASE_MAX_CONNECTIONS", 32))
+
+# Threads allowed to sit in a blocking Supabase call at once. Kept separate
+# from Starlette's default threadpool so Supabase latency can't starve it.
+SUPABASE_MAX_THREADS = int(os.environ.get("SUPABASE_MAX_THREADS", 32))
+
+_limiter = anyio.CapacityLimiter(SUPABASE_MAX_THREADS)
+
+
+def create_pooled_client(url: str, key: str) -> Client:
+    http_client = httpx.Client(
+        timeout=httpx.Timeout(SUPABASE_TIMEOUT, connect=SUPABASE_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=SUPABASE_MAX_CONNECTIONS,
+            max_keepalive_connections=SUPABASE_MAX_CONNECTIONS,
+            keepalive_expiry=60,
+        ),
+    )
+    options = ClientOptions(
+        postgrest_client_timeout=SUPABASE_TIMEOUT,
+        auto_refresh_token=False,
+        persist_session=False,
+        httpx_client=http_client,
+    )
+    return create_client(url, key, options=options)
+
+
+async def run_supabase(fn, *args, **kwargs):
+    """
+    Runs a blocking supabase-py call on the bounded Supabase thread pool.
+    """
+    # profiled() is a no-op outside an admin-profiled request
+    return await anyio.to_thread.run_sync(profiled(functools.partial(fn, *args, **kwargs)), limiter=_limiter)
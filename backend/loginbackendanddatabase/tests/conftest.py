@@ -0,0 +1,8 @@
+import os
+import sys
+
+# tests import the service's modules the way uvicorn does, from its directory,
+# with backend/shared on the path as main.py sets it up
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+sys.path.append(os.path.join(os.path.dirname(SERVICE_DIR), "shared"))
@@ -0,0 +1,186 @@
+import asyncio
+
+import pytest
+
+from profile_sync import FingerprintStore, MemoryFingerprintStore, ProfileSync, profile_fingerprint
+
+
+class FakeTable:
+    def __init__(self, client):
+        self.client = client
+
+    def upsert(self, rows):
+        self.rows = rows
+        return self
+
+    def execute(self):
+        if self.client.failures:
+            self.client.failures -= 1
+            raise RuntimeError("connection reset")
+        self.client.batches.append(self.rows)
+
+
+class FakeSupabase:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    def table(self, name):
+        assert name == "profiles"
+        return FakeTable(self)
+
+
+def profile(uid, name="Ada"):
+    return {"id": uid, "email": f"{uid}@example.com", "full_name": name, "avatar_url": None}
+
+
+def known(sync, *profiles):
+    """Marks the profiles as already written, so sync() doesn't wait."""
+    for p in profiles:
+        sync.store.set(p["id"], profile_fingerprint(p))
+
+
+def test_unchanged_profile_is_skipped():
+    async def main():
+        sync = ProfileSync(FakeSupabase())
+        known(sync, profile("u1"))
+        assert await sync.sync(profile("u1")) is False
+        await sync.flush()
+        return sync
+
+    sync = asyncio.run(main())
+    assert sync.supabase.batches == []
+    assert sync.stats["skipped"] == 1
+
+
+def test_updates_coalesce_into_one_bulk_upsert():
+    async def main():
+        sync = ProfileSync(FakeSupabase())
+        known(sync, profile("u1"), profile("u2"))
+        assert await sync.sync(profile("u1", "Ada L")) is True
+        await sync.sync(profile("u1", "Ada Lovelace"))
+        await sync.sync(profile("u2", "Grace"))
+        await sync.flush()
+        return sync
+
+    sync = asyncio.run(main())
+    [batch] = sync.supabase.batches
+    assert sorted((r["id"], r["full_name"]) for r in batch) == [("u1", "Ada Lovelace"), ("u2", "Grace")]
+    assert all("updated_at" in r for r in batch)
+    assert sync.stats["written"] == 2 and sync.stats["batches"] == 1
+
+
+def test_batches_are_capped_at_max_batch():
+    async def main():
+        sync = ProfileSync(FakeSupabase(), max_batch=2)
+        profiles = [profile(f"u{i}") for i in range(5)]
+        known(sync, *[profile(p["id"], "old") for p in profiles])
+        for p in profiles:
+            await sync.sync(p)
+        await sync.flush()
+        return sync
+
+    sync = asyncio.run(main())
+    assert [len(b) for b in sync.supabase.batches] == [2, 2, 1]
+
+
+def test_new_users_wait_for_their_batch():
+    async def main():
+        sync = ProfileSync(FakeSupabase(), flush_interval=10, coalesce_window=0.01)
+        await sync.start()
+        results = await asyncio.wait_for(
+            asyncio.gather(sync.sync(profile("u1")), sync.sync(profile("u2"))), timeout=1)
+        await sync.stop()
+        return sync, results
+
+    sync, results = asyncio.run(main())
+    assert results == [True, True]
+    # both waiters woke the loop inside one coalesce window
+    assert len(sync.supabase.batches) == 1
+    assert sync.store.get("u1") is not None
+
+
+def test_new_user_gets_the_error_of_a_failed_batch():
+    async def main():
+        sync = ProfileSync(FakeSupabase(failures=1), flush_interval=10, coalesce_window=0.01)
+        await sync.start()
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(sync.sync(profile("u1")), timeout=1)
+        await sync.stop()
+        return sync
+
+    sync = asyncio.run(main())
+    # requeued after the failure and written by stop()'s final flush
+    assert [[r["id"] for r in b] for b in sync.supabase.batches] == [["u1"]]
+
+
+def test_failed_rows_are_retried_then_dropped():
+    async def main():
+        sync = ProfileSync(FakeSupabase(failures=10), max_retries=2)
+        known(sync, profile("u1", "old"))
+        await sync.sync(profile("u1"))
+        for _ in range(4):
+            await sync.flush()
+        return sync
+
+    sync = asyncio.run(main())
+    assert sync.stats["errors"] == 3
+    assert sync.stats["retried"] == 2
+    assert sync.stats["dropped"] == 1
+    assert not sync._pending and not sync._retries
+
+
+def test_retry_recovers_once_the_backend_is_back():
+    async def main():
+        sync = ProfileSync(FakeSupabase(failures=1))
+        known(sync, profile("u1", "old"))
+        await sync.sync(profile("u1"))
+        await sync.flush()
+        await sync.flush()
+        return sync
+
+    sync = asyncio.run(main())
+    assert len(sync.supabase.batches) == 1
+    assert sync.stats["retried"] == 1 and sync.stats["dropped"] == 0
+    assert not sync._retries
+
+
+def test_resubmission_during_a_failed_batch_is_kept(monkeypatch):
+    async def main():
+        sync = ProfileSync(FakeSupabase(failures=1))
+        known(sync, profile("u1", "old"))
+        await sync.sync(profile("u1", "first"))
+        execute = FakeTable.execute
+
+        def resubmit_then_fail(table):
+            # a newer profile arrives while the batch is in flight
+            sync._pending["u1"] = (profile("u1", "second"), "fp")
+            return execute(table)
+        monkeypatch.setattr(FakeTable, "execute", resubmit_then_fail)
+        await sync.flush()
+        monkeypatch.undo()
+        await sync.flush()
+        return sync
+
+    sync = asyncio.run(main())
+    [batch] = sync.supabase.batches
+    assert batch[0]["full_name"] == "second"
+
+
+def test_memory_store_expires_and_evicts(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("profile_sync.time.monotonic", lambda: now[0])
+    store = MemoryFingerprintStore(max_entries=2, ttl=60)
+    store.set("a", "1")
+    store.set("b", "2")
+    store.get("a")
+    store.set("c", "3")
+    assert store.get("b") is None   # least recently used
+    assert store.get("a") == "1"
+    now[0] += 61
+    assert store.get("c") is None
+
+
+def test_fingerprint_store_is_abstract():
+    with pytest.raises(TypeError):
+        FingerprintStore()
@@ -0,0 +1,106 @@
+import json
+import time
+import asyncio
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jwt.algorithms import ECAlgorithm, RSAAlgorithm
+
+from token_verifier import TokenVerifier, TokenError, VerifierUnavailable
+
+SUPABASE_URL = "https://project.supabase.co"
+ISSUER = f"{SUPABASE_URL}/auth/v1"
+SECRET = "legacy-jwt-secret-that-is-long-enough"
+
+RSA_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+EC_KEY = ec.generate_private_key(ec.SECP256R1())
+
+
+def public_jwk(algorithm, private_key, kid):
+    jwk = json.loads(algorithm.to_jwk(private_key.public_key()))
+    jwk["kid"] = kid
+    return jwk
+
+
+def claims(**overrides):
+    return {"sub": "user-1", "aud": "authenticated", "iss": ISSUER, "exp": int(time.time()) + 300, **overrides}
+
+
+def verifier(**kwargs):
+    jwks = {"keys": [public_jwk(RSAAlgorithm, RSA_KEY, "rsa-1"), public_jwk(ECAlgorithm, EC_KEY, "ec-1")]}
+    return TokenVerifier(SUPABASE_URL, jwks=jwks, **kwargs)
+
+
+def verify(v, token):
+    return asyncio.run(v.verify(token))
+
+
+def test_rs256_token_verifies_against_jwks():
+    token = jwt.encode(claims(), RSA_KEY, algorithm="RS256", headers={"kid": "rsa-1"})
+    assert verify(verifier(), token)["sub"] == "user-1"
+
+
+def test_es256_token_verifies_against_jwks():
+    token = jwt.encode(claims(), EC_KEY, algorithm="ES256", headers={"kid": "ec-1"})
+    assert verify(verifier(), token)["sub"] == "user-1"
+
+
+def test_hs256_token_verifies_against_secret():
+    token = jwt.encode(claims(), SECRET, algorithm="HS256")
+    assert verify(verifier(jwt_secret=SECRET), token)["sub"] == "user-1"
+
+
+def test_hs256_without_secret_falls_back_to_remote():
+    token = jwt.encode(claims(), SECRET, algorithm="HS256")
+    with pytest.raises(VerifierUnavailable):
+        verify(verifier(), token)
+
+
+def test_expired_token_is_rejected():
+    token = jwt.encode(claims(exp=int(time.time()) - 3600), RSA_KEY, algorithm="RS256", headers={"kid": "rsa-1"})
+    with pytest.raises(TokenError):
+        verify(verifier(), token)
+
+
+def test_wrong_audience_is_rejected():
+    token = jwt.encode(claims(aud="service_role"), RSA_KEY, algorithm="RS256", headers={"kid": "rsa-1"})
+    with pytest.raises(TokenError):
+        verify(verifier(), token)
+
+
+def test_wrong_issuer_is_rejected():
+    token = jwt.encode(claims(iss="https://other.supabase.co/auth/v1"), SECRET, algorithm="HS256")
+    with pytest.raises(TokenError):
+        verify(verifier(jwt_secret=SECRET), token)
+
+
+def test_unknown_kid_falls_back_to_remote():
+    other = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    token = jwt.encode(claims(), other, algorithm="RS256", headers={"kid": "rotated"})
+    with pytest.raises(VerifierUnavailable):
+        verify(verifier(), token)
+
+
+def test_algorithm_comes_from_the_key_not_the_header():
+    # signed with a different curve under a known kid: the header's alg
+    # must not be what decides which algorithm is accepted
+    token = jwt.encode(claims(), ec.generate_private_key(ec.SECP384R1()), algorithm="ES384", headers={"kid": "ec-1"})
+    with pytest.raises(TokenError):
+        verify(verifier(), token)
+
+
+def test_tampered_signature_is_rejected():
+    token = jwt.encode(claims(), RSA_KEY, algorithm="RS256", headers={"kid": "rsa-1"})
+    head, body, sig = token.split(".")
+    forged = jwt.encode(claims(sub="admin"), RSA_KEY, algorithm="RS256", headers={"kid": "rsa-1"}).split(".")[1]
+    with pytest.raises(TokenError):
+        verify(verifier(), ".".join([head, forged, sig]))
+
+
+def test_verified_token_is_cached_until_expiry():
+    v = verifier()
+    token = jwt.encode(claims(), RSA_KEY, algorithm="RS256", headers={"kid": "rsa-1"})
+    first = verify(v, token)
+    v._keys = {}   # a cache hit never needs the key again
+    assert verify(v, token) is first
@@ -0,0 +1,179 @@
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+
+import httpx
+import jwt
+
+# what Supabase signs with; the token header only picks among these
+JWKS_ALGORITHMS = {"RS256", "ES256"}
+
+
+class TokenError(Exception):
+    """The token is malformed, expired, or its signature does not check out."""
+
+
+class VerifierUnavailable(Exception):
+    """No local key can verify this token; the caller should ask Supabase."""
+
+
+class TokenVerifier:
+    """
+    Verifies Supabase access tokens locally.
+
+    Asymmetric tokens (RS256/ES256) are checked against the project's JWKS,
+    which is fetched once and refreshed in the background. Legacy HS256 tokens
+    are checked against the project JWT secret when one is configured.
+    Verified tokens are remembered (by SHA-256 of the token) until they expire,
+    so repeat calls with the same session skip the signature check entirely.
+    """
+
+    def __init__(
+        self,
+        supabase_url: str | None,
+        jwt_secret: str | None = None,
+        audience: str = "authenticated",
+        jwks: dict | None = None,
+        refresh_interval: float = 600,
+        cache_size: int = 10_000,
+        leeway: int = 10,
+    ):
+        base = (supabase_url or "").rstrip("/")
+        self.issuer = f"{base}/auth/v1" if base else None
+        self.jwks_url = f"{base}/auth/v1/.well-known/jwks.json" if base else None
+        self.jwt_secret = jwt_secret
+        self.audience = audience
+        self.refresh_interval = refresh_interval
+        self.cache_size = cache_size
+        self.leeway = leeway
+
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._cache: OrderedDict[str, dict] = OrderedDict()
+        self._last_refresh = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+        if jwks:
+            self._load_jwks(jwks)
+
+    # ---------------- KEYS ----------------
+
+    def _load_jwks(self, jwks: dict):
+        keys = {}
+        for jwk in jwks.get("keys", []):
+            try:
+                key = jwt.PyJWK(jwk)
+            except jwt.PyJWTError as e:
+                print(f"Skipping unusable JWK {jwk.get('kid')}: {e}")
+                continue
+            if key.algorithm_name not in JWKS_ALGORITHMS:
+                print(f"Skipping JWK {jwk.get('kid')} with algorithm {key.algorithm_name}")
+                continue
+            keys[jwk.get("kid", "")] = key
+        self._keys = keys
+        self._last_refresh = time.monotonic()
+
+    async def refresh_keys(self):
+        if not self.jwks_url:
+            return
+        async with self._refresh_lock:
+            async with httpx.AsyncClient(timeout=5) as client:
+                resp = await client.get(self.jwks_url)
+                resp.raise_for_status()
+                self._load_jwks(resp.json())
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh_keys()
+            except Exception as e:
+                # keep serving with the keys we already have
+                print(f"JWKS refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def start(self):
+        if self.jwks_url and self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    # ---------------- CACHE ----------------
+
+    def _cached(self, token_hash: str):
+        claims = self._cache.get(token_hash)
+        if claims is None:
+            return None
+        if claims.get("exp", 0) <= time.time():
+            del self._cache[token_hash]
+            return None
+        self._cache.move_to_end(token_hash)
+        return claims
+
+    def _remember(self, token_hash: str, claims: dict):
+        self._cache[token_hash] = claims
+        self._cache.move_to_end(token_hash)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # ---------------- VERIFY ----------------
+
+    async def _key_for(self, header: dict):
+        """
+        (key, algorithms to accept). The algorithm comes from the key, never
+        from the token header, which only chooses between the secret and the
+        JWKS.
+        """
+        if header.get("alg") == "HS256":
+            if not self.jwt_secret:
+                raise VerifierUnavailable("HS256 token but no SUPABASE_JWT_SECRET configured")
+            return self.jwt_secret, ["HS256"]
+
+        kid = header.get("kid", "")
+        key = self._keys.get(kid)
+        # unknown kid: keys may have rotated, refetch at most once a minute
+        if key is None and time.monotonic() - self._last_refresh > 60:
+            try:
+                await self.refresh_keys()
+            except Exception as e:
+                print(f"JWKS refresh failed: {e}")
+            key = self._keys.get(kid)
+        if key is None:
+            raise VerifierUnavailable(f"No signing key for kid {kid!r}")
+        return key, [key.algorithm_name]
+
+    async def verify(self, token: str) -> dict:
+        """
+        Returns the token claims, raises TokenError for a bad token and
+        VerifierUnavailable when it can't be checked locally.
+        """
+        token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        claims = self._cached(token_hash)
+        if claims is not None:
+            return claims
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError as e:
+            raise TokenError(f"Malformed token: {e}")
+
+        key, algorithms = await self._key_for(header)
+
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=algorithms,
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.leeway,
+                options={"require": ["exp", "sub"]},
+            )
+        except jwt.PyJWTError as e:
+            raise TokenError(str(e))
+
+        self._remember(token_hash, claims)
+        return claims
@@ -0,0 +1,231 @@
+# aggregator.py
+import math
+import os
+import threading
+import time
+from array import array
+from collections import deque
+
+BUCKET_SECONDS = int(os.getenv("METRICS_BUCKET_SECONDS", 5))
+BUCKETS = int(os.getenv("METRICS_BUCKETS", 180))           # 15 min of history at 5 s
+WINDOWS = (60, 300, 900)                                     # seconds, for percentiles and rates
+MAX_SERIES = int(os.getenv("METRICS_MAX_SERIES", 128))
+LOG_LINES = int(os.getenv("METRICS_LOG_LINES", 200))
+
+# latency histogram: bin 0 is < 1 ms, then log-spaced bins 20% wide up to
+# HIST_MAX_MS, which puts any percentile within 10% of the true value; the
+# last bin is an open-ended overflow. Multi-page OCR requests run for
+# minutes, so the range goes well past them.
+HIST_MAX_MS = 6 * 3600 * 1000
+HIST_GROWTH = 1.2
+_LOG_GROWTH = math.log(HIST_GROWTH)
+HIST_BINS = 2 + math.ceil(math.log(HIST_MAX_MS) / _LOG_GROWTH)
+
+STATUSES = ("ok", "error", "rejected")
+LEVELS = ("INFO", "SUCCESS", "WARNING", "ERROR")
+
+
+def hist_bin(ms: float) -> int:
+    if ms < 1:
+        return 0
+    return min(HIST_BINS - 1, 1 + int(math.log(ms) / _LOG_GROWTH))
+
+
+def bin_value(b: int) -> float:
+    # geometric middle of the bin, in ms
+    if b == 0:
+        return 0.5
+    return HIST_GROWTH ** (b - 1) * math.sqrt(HIST_GROWTH)
+
+
+class Series:
+    """
+    One metric's history as a ring of BUCKETS time buckets. Every array is
+    allocated up front, so memory is fixed per series; a slot is reset
+    lazily when the ring comes round to it again, which keeps recording an
+    event O(1) (at worst one bucket's worth of zeroing, once per bucket).
+    """
+
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind                                    # "timing" | "counter" | "gauge"
+        self.epoch = array("q", [-1]) * BUCKETS             # absolute bucket number held by each slot
+        self.counts = array("Q", [0]) * (BUCKETS * len(STATUSES))
+        self.total = array("d", [0.0]) * BUCKETS            # sum of values (ms for timings)
+        self.peak = array("d", [0.0]) * BUCKETS             # max value seen in the bucket
+        self.hist = array("I", [0]) * (BUCKETS * HIST_BINS) if kind == "timing" else None
+        self.last = None
+
+    def _slot(self, epoch: int) -> int:
+        i = epoch % BUCKETS
+        if self.epoch[i] != epoch:
+            self.epoch[i] = epoch
+            for s in range(len(STATUSES)):
+                self.counts[i * len(STATUSES) + s] = 0
+            self.total[i] = 0.0
+            self.peak[i] = 0.0
+            if self.hist is not None:
+                base = i * HIST_BINS
+                self.hist[base:base + HIST_BINS] = array("I", [0]) * HIST_BINS
+        return i
+
+    def record(self, epoch: int, value: float, status: int, count: int = 1):
+        i = self._slot(epoch)
+        self.counts[i * len(STATUSES) + status] += count
+        self.total[i] += value
+        if value > self.peak[i]:
+            self.peak[i] = value
+        if self.hist is not None:
+            self.hist[i * HIST_BINS + hist_bin(value)] += 1
+        self.last = value
+
+    def _live(self, now_epoch: int, buckets: int):
+        # slots still holding one of the last `buckets` buckets, oldest first
+        for epoch in range(now_epoch - buckets + 1, now_epoch + 1):
+            i = epoch % BUCKETS
+            if self.epoch[i] == epoch:
+                yield epoch, i
+
+    def window(self, now_epoch: int, seconds: int) -> dict:
+        buckets = max(1, min(BUCKETS, seconds // BUCKET_SECONDS))
+        counts = [0] * len(STATUSES)
+        total, peak = 0.0, 0.0
+        merged = [0] * HIST_BINS if self.hist is not None else None
+        for _, i in self._live(now_epoch, buckets):
+            for s in range(len(STATUSES)):
+                counts[s] += self.counts[i * len(STATUSES) + s]
+            total += self.total[i]
+            peak = max(peak, self.peak[i])
+            if merged is not None:
+                base = i * HIST_BINS
+                for b, c in enumerate(self.hist[base:base + HIST_BINS]):
+                    merged[b] += c
+
+        n = sum(counts)
+        out = {"count": n, "per_min": round(n * 60 / (buckets * BUCKET_SECONDS), 2)}
+        if counts[1] or counts[2]:
+            out["errors"] = counts[1]
+            out["rejected"] = counts[2]
+            out["error_rate"] = round((counts[1] + counts[2]) / n, 4)
+        if self.kind == "timing" and n:
+            out["mean_ms"] = round(total / n, 1)
+            out["p50_ms"] = round(percentile(merged, 0.50, peak), 1)
+            out["p95_ms"] = round(percentile(merged, 0.95, peak), 1)
+            out["max_ms"] = round(peak, 1)
+            if merged[-1]:
+                out["over_max_ms"] = merged[-1]
+        elif self.kind == "gauge":
+            out["max"] = round(peak, 2)
+        return out
+
+    def sparkline(self, now_epoch: int, buckets: int) -> list:
+        # per bucket: event count for counters/timings, peak for gauges
+        values = dict.fromkeys(range(now_epoch - buckets + 1, now_epoch + 1), 0)
+        for epoch, i in self._live(now_epoch, buckets):
+            if self.kind == "gauge":
+                values[epoch] = round(self.peak[i], 2)
+            else:
+                values[epoch] = sum(self.counts[i * len(STATUSES):(i + 1) * len(STATUSES)])
+        return list(values.values())
+
+
+def percentile(hist, q: float, peak: float) -> float:
+    n = sum(hist)
+    if not n:
+        return 0.0
+    rank = q * n
+    seen = 0
+    for b, c in enumerate(hist):
+        seen += c
+        if seen >= rank:
+            break
+    # the overflow bin has no middle; the window's max is the honest answer
+    return peak if b == HIST_BINS - 1 else bin_value(b)
+
+
+class MetricsAggregator:
+    """
+    Time-bucketed counters, gauges and latency histograms for events pushed
+    by the other services, plus a bounded tail of log lines for the admin
+    dashboard. At most MAX_SERIES metric names are tracked; events for
+    further names are counted as dropped rather than growing memory.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.series: dict[str, Series] = {}
+        self.logs = deque(maxlen=LOG_LINES)
+        self._log_id = 0
+        self.stats = {"events": 0, "dropped": 0, "invalid": 0}
+
+    def _series(self, name: str, kind: str):
+        s = self.series.get(name)
+        if s is None:
+            if len(self.series) >= MAX_SERIES:
+                return None
+            s = self.series[name] = Series(name, kind)
+        return s if s.kind == kind else None
+
+    def record(self, event: dict, source: str = "unknown"):
+        """
+        event: {"type": "timing" | "counter" | "gauge" | "log", "name": ...,
+        "value": ms / count / reading, "status": "ok" | "error" | "rejected",
+        "ts": unix seconds (defaults to now)}. Log events carry "level" and
+        "message" instead of name/value.
+        """
+        now = self.clock()
+        # clients batch events, so ts is a little in the past; clock skew
+        # can't push it into the future
+        ts = min(float(event.get("ts") or now), now)
+        kind = event.get("type")
+        with self._lock:
+            self.stats["events"] += 1
+            if kind == "log":
+                self._log_id += 1
+                level = event.get("level", "INFO")
+                self.logs.append({
+                    "id": self._log_id,
+                    "level": level if level in LEVELS else "INFO",
+                    "timestamp": time.strftime("%H:%M:%S", time.localtime(ts)),
+                    "source": source,
+                    "message": str(event.get("message", ""))[:500],
+                })
+                return
+
+            try:
+                value = float(event.get("value", 1 if kind == "counter" else 0))
+                status = STATUSES.index(event.get("status", "ok"))
+                name = f"{source}.{event['name']}"
+            except (KeyError, ValueError, TypeError):
+                self.stats["invalid"] += 1
+                return
+            epoch = int(ts // BUCKET_SECONDS)
+            series = self._series(name, kind) if kind in ("timing", "counter", "gauge") else None
+            if series is None or epoch <= int(now // BUCKET_SECONDS) - BUCKETS:
+                # unknown type, over the series cap, or older than the ring
+                self.stats["dropped"] += 1
+                return
+            series.record(epoch, value, status,
+                          count=int(value) if kind == "counter" else 1)
+
+    def snapshot(self, sparkline_buckets: int = 36, log_lines: int = 50) -> dict:
+        now_epoch = int(self.clock() // BUCKET_SECONDS)
+        with self._lock:
+            metrics = {}
+            for name, s in self.series.items():
+                metrics[name] = {
+                    "type": s.kind,
+                    "last": round(s.last, 2) if s.last is not None else None,
+                    "windows": {f"{w}s": s.window(now_epoch, w) for w in WINDOWS},
+                    "sparkline": s.sparkline(now_epoch, min(sparkline_buckets, BUCKETS)),
+                }
+            logs = list(self.logs)[-log_lines:]
+            stats = dict(self.stats)
+        return {
+            "generated_at": round(self.clock(), 3),
+            "bucket_seconds": BUCKET_SECONDS,
+            "metrics": metrics,
+            "logs": logs[::-1],
+            "stats": {**stats, "series": len(metrics)},
+        }
@@ -0,0 +1,91 @@
+import os
+import hmac
+import json
+import asyncio
+from typing import Literal
+
+from fastapi import Depends, FastAPI, HTTPException, Header, Query, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from aggregator import MetricsAggregator
+
+app = FastAPI(title="Ask-M Metrics Backend")
+
+# the admin dashboard reads the feed straight from the browser
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["*"],
+)
+
+# when set, services must send it as X-Metrics-Token to push events
+METRICS_INGEST_TOKEN = os.getenv("METRICS_INGEST_TOKEN")
+# required to read the feed, whose log lines name users' uploads: sent as
+# X-Metrics-Read-Token, or ?token= for EventSource, which can't set headers.
+# Unset, the feed is closed.
+METRICS_READ_TOKEN = os.getenv("METRICS_READ_TOKEN")
+FEED_INTERVAL = float(os.getenv("METRICS_FEED_INTERVAL", 2.0))
+MAX_BATCH = 1000
+
+aggregator = MetricsAggregator()
+
+
+class MetricEvent(BaseModel):
+    type: Literal["timing", "counter", "gauge", "log"]
+    name: str | None = Field(None, max_length=64)
+    value: float | None = None
+    status: Literal["ok", "error", "rejected"] = "ok"
+    level: str | None = None
+    message: str | None = None
+    ts: float | None = None
+
+
+class EventBatch(BaseModel):
+    source: str = Field(..., min_length=1, max_length=32)     # "ocr", "auth", ...
+    events: list[MetricEvent] = Field(..., max_length=MAX_BATCH)
+
+
+def token_matches(supplied: str | None, expected: str | None) -> bool:
+    return bool(supplied and expected and hmac.compare_digest(supplied.encode(), expected.encode()))
+
+
+def require_reader(x_metrics_read_token: str | None = Header(None), token: str | None = Query(None)):
+    if not token_matches(x_metrics_read_token or token, METRICS_READ_TOKEN):
+        raise HTTPException(status_code=401, detail="Metrics read token required")
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/events")
+async def ingest(batch: EventBatch, x_metrics_token: str | None = Header(None)):
+    if METRICS_INGEST_TOKEN and not token_matches(x_metrics_token, METRICS_INGEST_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    for event in batch.events:
+        aggregator.record(event.model_dump(exclude_none=True), batch.source)
+    return {"accepted": len(batch.events)}
+
+
+@app.get("/metrics", dependencies=[Depends(require_reader)])
+async def metrics(sparkline: int = Query(36, ge=1, le=180), logs: int = Query(50, ge=0, le=200)):
+    # per metric: last value, count/rate/error rate and p50/p95 over 1, 5 and
+    # 15 minute windows, and a per-bucket sparkline; plus the latest log lines
+    return aggregator.snapshot(sparkline, logs)
+
+
+@app.get("/metrics/stream", dependencies=[Depends(require_reader)])
+async def metrics_stream(request: Request, sparkline: int = Query(36, ge=1, le=180), logs: int = Query(50, ge=0, le=200)):
+    async def events():
+        while not await request.is_disconnected():
+            yield sse("snapshot", aggregator.snapshot(sparkline, logs))
+            await asyncio.sleep(FEED_INTERVAL)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
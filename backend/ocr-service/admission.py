@@ -0,0 +1,258 @@
+# admission.py
+import io
+import os
+import math
+import time
+import asyncio
+import contextlib
+from collections import OrderedDict, deque
+
+from fastapi import HTTPException
+from pdf2image import pdfinfo_from_bytes
+from pdf2image.exceptions import PDFInfoNotInstalledError, PDFPageCountError, PDFSyntaxError
+from PIL import Image
+
+# Work is measured in megapixels: memory and TrOCR time both scale with it.
+# A4 rendered at pdf_bytes_to_images' 300 dpi is 2480 x 3508 = 8.7 MP.
+PDF_PAGE_MP = 8.7
+OCR_CAPACITY_MP = float(os.getenv("OCR_CAPACITY_MP", 60))            # in flight at once
+OCR_MAX_QUEUED_MP = float(os.getenv("OCR_MAX_QUEUED_MP", 600))       # waiting, all users
+OCR_MAX_USER_QUEUED_MP = float(os.getenv("OCR_MAX_USER_QUEUED_MP", 200))
+OCR_MAX_WAIT = float(os.getenv("OCR_MAX_WAIT", 120))
+OCR_MAX_DOWNLOAD_BYTES = int(os.getenv("OCR_MAX_DOWNLOAD_BYTES", 1024 ** 3))   # file bytes in memory, all jobs
+# when pdfinfo can't read a PDF: assume this many pages per MB, which
+# overestimates scans (a few hundred KB a page) rather than under-admitting
+PDF_PAGES_PER_MB = 20
+
+
+def pdf_pages(file_bytes: bytes) -> int:
+    # pdfinfo reads the page tree, including pages kept in compressed
+    # object streams, which a scan of the raw bytes can't see
+    try:
+        return max(1, int(pdfinfo_from_bytes(file_bytes)["Pages"]))
+    except (PDFInfoNotInstalledError, PDFPageCountError, PDFSyntaxError, KeyError, ValueError):
+        return max(1, math.ceil(len(file_bytes) / 1e6 * PDF_PAGES_PER_MB))
+
+
+def estimate_cost(file_bytes: bytes, filename: str) -> float:
+    """
+    Megapixels the OCR pipeline will have to process, read from headers only:
+    the page count of a PDF, or the dimensions of an image.
+    """
+    if filename.lower().endswith(".pdf"):
+        return pdf_pages(file_bytes) * PDF_PAGE_MP
+    try:
+        # Image.open parses the header without decoding the pixels
+        width, height = Image.open(io.BytesIO(file_bytes)).size
+    except Exception:
+        return 1.0
+    return max(0.1, width * height / 1e6)
+
+
+class _Ticket:
+    __slots__ = ("user", "cost", "future", "queued_at")
+
+    def __init__(self, user, cost):
+        self.user = user
+        self.cost = cost
+        self.future = asyncio.get_running_loop().create_future()
+        self.queued_at = time.monotonic()
+
+
+class AdmissionController:
+    """
+    Cost-bounded admission for OCR jobs.
+
+    At most `capacity` MP of work runs at once; a job costlier than that is
+    clamped and runs alone. Waiting jobs sit in one FIFO per user and are
+    granted round-robin across users, so one user's bulk reindex queues
+    behind itself rather than in front of everyone's interactive uploads.
+
+    A job that would push its user past `max_user_queued` MP of waiting work
+    gets a 429; past `max_queued` MP overall, or after waiting `max_wait`
+    seconds, a 503. Both carry a Retry-After derived from recent throughput.
+
+        async with admission.slot(user_id, cost):
+            ...
+    """
+
+    def __init__(self, capacity: float = OCR_CAPACITY_MP, max_queued: float = OCR_MAX_QUEUED_MP,
+                 max_user_queued: float = OCR_MAX_USER_QUEUED_MP, max_wait: float = OCR_MAX_WAIT):
+        self.capacity = capacity
+        self.max_queued = max_queued
+        self.max_user_queued = max_user_queued
+        self.max_wait = max_wait
+
+        self._queues: OrderedDict[str, deque[_Ticket]] = OrderedDict()
+        self._queued_by_user: dict[str, float] = {}
+        self.in_flight = 0.0
+        self.queued = 0.0
+        self._throughput = None     # EWMA of MP completed per second of work
+        self._waits = deque(maxlen=500)
+        self.stats = {"admitted": 0, "completed": 0, "rejected_user": 0, "rejected_full": 0, "timed_out": 0}
+
+    def retry_after(self, backlog: float) -> int:
+        rate = self._throughput or 1.0
+        return int(min(300, max(1, backlog / rate)))
+
+    def _reject(self, status, detail, backlog):
+        raise HTTPException(status_code=status, detail=detail,
+                            headers={"Retry-After": str(self.retry_after(backlog))})
+
+    def _dispatch(self):
+        # hand out capacity round-robin by user, FIFO within a user; stop at the
+        # first head that doesn't fit so big jobs aren't starved by small ones
+        while self._queues:
+            user, queue = next(iter(self._queues.items()))
+            ticket = queue[0]
+            if self.in_flight and self.in_flight + ticket.cost > self.capacity:
+                return
+            queue.popleft()
+            self._unqueue(ticket)
+            if queue:
+                self._queues.move_to_end(user)
+            else:
+                del self._queues[user]
+            self.in_flight += ticket.cost
+            ticket.future.set_result(None)
+
+    def _withdraw(self, ticket):
+        # a ticket that gave up before being granted
+        queue = self._queues[ticket.user]
+        queue.remove(ticket)
+        if not queue:
+            del self._queues[ticket.user]
+        self._unqueue(ticket)
+        # whatever was behind it may fit now
+        self._dispatch()
+
+    def _unqueue(self, ticket):
+        self.queued -= ticket.cost
+        self._queued_by_user[ticket.user] -= ticket.cost
+        if self._queued_by_user[ticket.user] <= 1e-9:
+            del self._queued_by_user[ticket.user]
+
+    async def acquire(self, user: str, cost: float) -> float:
+        cost = min(cost, self.capacity)
+        if self._queued_by_user.get(user, 0) + cost > self.max_user_queued:
+            self.stats["rejected_user"] += 1
+            self._reject(429, "Too many OCR jobs queued for this user, retry later",
+                         self._queued_by_user.get(user, 0))
+        if self.queued + cost > self.max_queued:
+            self.stats["rejected_full"] += 1
+            self._reject(503, "OCR queue is full, retry later", self.queued)
+
+        ticket = _Ticket(user, cost)
+        self._queues.setdefault(user, deque()).append(ticket)
+        self._queued_by_user[user] = self._queued_by_user.get(user, 0) + cost
+        self.queued += cost
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            # granted just as the wait ran out: keep the slot
+            if not ticket.future.done():
+                self._withdraw(ticket)
+                self.stats["timed_out"] += 1
+                self._reject(503, "Timed out waiting for OCR capacity, retry later", self.queued)
+        except BaseException:
+            # cancelled (client went away, upload job cancelled): the ticket
+            # must not stay queued, or be granted with nobody to release it
+            if ticket.future.done():
+                self.in_flight -= ticket.cost
+                self._dispatch()
+            else:
+                self._withdraw(ticket)
+            raise
+
+        self._waits.append(time.monotonic() - ticket.queued_at)
+        self.stats["admitted"] += 1
+        return cost
+
+    def release(self, cost: float, elapsed: float):
+        self.in_flight -= cost
+        self.stats["completed"] += 1
+        if elapsed > 0:
+            rate = cost / elapsed
+            self._throughput = rate if self._throughput is None else 0.8 * self._throughput + 0.2 * rate
+        self._dispatch()
+
+    def slot(self, user: str, cost: float):
+        return _Slot(self, user, cost)
+
+    def metrics(self) -> dict:
+        waits = sorted(self._waits)
+        return {
+            **self.stats,
+            "queue_depth": sum(len(q) for q in self._queues.values()),
+            "queued_mp": round(self.queued, 2),
+            "in_flight_mp": round(self.in_flight, 2),
+            "capacity_mp": self.capacity,
+            "users_waiting": len(self._queues),
+            "throughput_mp_per_s": round(self._throughput, 3) if self._throughput else None,
+            "wait_ms_p50": round(waits[len(waits) // 2] * 1000, 1) if waits else None,
+            "wait_ms_p95": round(waits[int(len(waits) * 0.95)] * 1000, 1) if waits else None,
+        }
+
+
+class _Slot:
+    def __init__(self, controller, user, cost):
+        self.controller = controller
+        self.user = user
+        self.cost = cost
+
+    async def __aenter__(self):
+        self.cost = await self.controller.acquire(self.user, self.cost)
+        self._start = time.monotonic()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.controller.release(self.cost, time.monotonic() - self._start)
+
+
+class ByteBudget:
+    """
+    Bytes of downloaded files held in memory at once. A job takes its
+    file's size (from a HEAD) out of the budget before downloading and
+    gives it back once its OCR is over, so concurrent large files wait
+    here instead of all being read into RAM. Waiters go first come, first
+    served, so a big file isn't starved by a stream of small ones; one
+    bigger than the whole budget is clamped and runs alone. After
+    `max_wait` seconds the job gets a 503.
+
+        async with budget.hold(size):
+            ...
+    """
+
+    def __init__(self, limit: int = OCR_MAX_DOWNLOAD_BYTES, max_wait: float = OCR_MAX_WAIT):
+        self.limit = limit
+        self.max_wait = max_wait
+        self.used = 0
+        self._waiting = deque()
+        self._changed = asyncio.Condition()
+
+    @contextlib.asynccontextmanager
+    async def hold(self, size: int):
+        size = min(size, self.limit)
+        turn = object()
+        async with self._changed:
+            self._waiting.append(turn)
+            try:
+                await asyncio.wait_for(
+                    self._changed.wait_for(lambda: self._waiting[0] is turn and self.used + size <= self.limit),
+                    timeout=self.max_wait,
+                )
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=503, detail="Too many large files in progress, retry later",
+                                    headers={"Retry-After": "30"})
+            finally:
+                self._waiting.remove(turn)
+                self._changed.notify_all()
+            self.used += size
+        try:
+            yield
+        finally:
+            async with self._changed:
+                self.used -= size
+                self._changed.notify_all()
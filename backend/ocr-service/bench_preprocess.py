@@ -0,0 +1,96 @@
+# bench_preprocess.py
+"""
+Times each preprocessing step and what it buys segmentation, so steps that
+don't pay for their CPU time can be switched off (OCR_PDF_STEPS / OCR_PHOTO_STEPS).
+
+    python bench_preprocess.py                     # synthetic skewed, shadowed pages
+    python bench_preprocess.py photo1.jpg scan.png # real pages (no line-count truth)
+    python bench_preprocess.py --ocr photo1.jpg    # also run TrOCR and print the text
+
+For every configuration (all steps, then all steps minus one) it reports
+ms per page, the skew found, and the number of lines segmented; on
+synthetic pages the expected line count is known, so a configuration that
+merges or drops lines shows up as a line error.
+"""
+import sys
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+from preprocess import ALL_STEPS, decode_gray, preprocess_page
+from line_segment import segment_lines
+
+
+def synthetic_page(angle: float, lines: int = 20, seed: int = 0) -> np.ndarray:
+    # a printed page photographed at an angle with a shadow across it
+    rng = np.random.default_rng(seed)
+    h, w = 2400, 1800
+    img = np.full((h, w), 235, np.uint8)
+    for i in range(lines):
+        cv2.putText(img, f"{i + 1}. the quick brown fox jumps over {i * 7} lazy dogs",
+                    (100, 150 + i * 100), cv2.FONT_HERSHEY_SIMPLEX, 1.5, 20, 3)
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    img = cv2.warpAffine(img, matrix, (w, h), borderValue=235)
+    shade = np.linspace(0.45, 1.0, w)[None, :] * np.linspace(0.8, 1.0, h)[:, None]
+    img = (img * shade + rng.normal(0, 8, img.shape)).clip(0, 255).astype(np.uint8)
+    return img
+
+
+def configurations():
+    yield "all", ALL_STEPS
+    for step in ALL_STEPS:
+        yield f"-{step}", tuple(s for s in ALL_STEPS if s != step)
+    yield "none", ()
+
+
+def bench(pages, repeat: int = 3):
+    print(f"{'config':<10} {'ms/page':>8} {'line err':>9}  per-step ms")
+    for name, steps in configurations():
+        total, errors, step_ms = 0.0, [], {}
+        for gray, expected in pages:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                page = preprocess_page(gray, steps)
+                lines = segment_lines(page)
+                total += time.perf_counter() - start
+            for step, ms in page["timings"].items():
+                step_ms[step] = step_ms.get(step, 0) + ms / len(pages)
+            if expected is not None:
+                errors.append(abs(len(lines) - expected))
+
+        per_page = total * 1000 / (len(pages) * repeat)
+        err = f"{np.mean(errors):.1f}" if errors else "-"
+        detail = " ".join(f"{k}={v:.0f}" for k, v in step_ms.items())
+        print(f"{name:<10} {per_page:>8.1f} {err:>9}  {detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*")
+    parser.add_argument("--ocr", action="store_true", help="run TrOCR on the lines of each image")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.images:
+        pages = []
+        for path in args.images:
+            with open(path, "rb") as f:
+                pages.append((decode_gray(f.read()), None))
+    else:
+        pages = [(synthetic_page(angle, seed=i), 20) for i, angle in enumerate((-4.0, -1.5, 0.0, 2.0, 5.0))]
+
+    bench(pages, args.repeat)
+
+    if args.ocr:
+        from ocr_pipeline import recognize_page
+        for (gray, _), path in zip(pages, args.images or ["synthetic"] * len(pages)):
+            start = time.perf_counter()
+            text = recognize_page(gray, ALL_STEPS)
+            print(f"\n--- {path} ({time.perf_counter() - start:.1f}s) ---")
+            print("\n".join(text))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# bench_tiling.py
+"""
+Latency and peak RSS of photo segmentation as camera resolution grows.
+
+    python bench_tiling.py               # 12, 24 and 48 MP synthetic JPEGs
+    python bench_tiling.py --mp 12 50
+
+Each resolution runs in a fresh subprocess so its peak RSS is its own.
+"native" is the old path (full decode, one full-frame threshold);
+"capped" is load_capped + segment_lines_tiled as used by run_ocr.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+import cv2
+import numpy as np
+
+
+def synthetic_photo(mp: float) -> bytes:
+    # same page layout at any resolution: text height scales with the photo
+    w = int((mp * 1e6 * 3 / 4) ** 0.5)
+    h = int(w * 4 / 3)
+    img = np.full((h, w), 230, np.uint8)
+    scale = w / 1800
+    for i in range(25):
+        cv2.putText(img, f"{i + 1}. the quick brown fox jumps over {i * 7} lazy dogs",
+                    (int(100 * scale), int((150 + i * 90) * scale)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.4 * scale, 25, max(1, int(3 * scale)))
+    img = (img * np.linspace(0.6, 1.0, w)[None, :]).astype(np.uint8)
+    return cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def peak_rss_mb() -> float:
+    # VmHWM starts over at exec; ru_maxrss would carry the parent's peak
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run_one(mode: str, path: str) -> dict:
+    from preprocess import decode_gray, preprocess_page, PHOTO_STEPS
+    from line_segment import segment_lines
+    from tiling import load_capped, segment_lines_tiled, TILE_HEIGHT
+
+    with open(path, "rb") as f:
+        data = f.read()
+    base_rss = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == "native":
+        lines = segment_lines(preprocess_page(decode_gray(data), PHOTO_STEPS))
+        shape = None
+    else:
+        gray = load_capped(data)
+        shape = gray.shape
+        if gray.shape[0] > TILE_HEIGHT * 1.5:
+            lines = segment_lines_tiled(gray, PHOTO_STEPS)
+        else:
+            lines = segment_lines(preprocess_page(gray, PHOTO_STEPS))
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_mb()
+    return {"ms": round(elapsed * 1000), "lines": len(lines), "peak_mb": round(peak),
+            "added_mb": round(peak - base_rss), "working": shape}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mp", type=float, nargs="*", default=[12, 24, 48])
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_one(*args.child)))
+        return
+
+    print(f"{'MP':>5} {'mode':<7} {'ms':>6} {'lines':>6} {'peak MB':>8} {'added MB':>9}  working")
+    for mp in args.mp:
+        # generated here so the full-size raster doesn't count toward the child's RSS
+        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+            f.write(synthetic_photo(mp))
+        for mode in ("native", "capped"):
+            out = subprocess.run([sys.executable, __file__, "--child", mode, f.name],
+                                 capture_output=True, text=True, check=True)
+            r = json.loads(out.stdout)
+            print(f"{mp:>5.0f} {mode:<7} {r['ms']:>6} {r['lines']:>6} {r['peak_mb']:>8} {r['added_mb']:>9}  {r['working']}")
+        os.remove(f.name)
+
+
+if __name__ == "__main__":
+    main()
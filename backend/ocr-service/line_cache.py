@@ -0,0 +1,125 @@
+# line_cache.py
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+LINE_CACHE_SIZE = int(os.getenv("OCR_LINE_CACHE_SIZE", 4096))
+# Two crops count as the same line when, in every glyph-wide window of the
+# hash, at most this fraction of bits differ. A whole-hash fraction can't
+# tell "COMP 101" from "COMP 102" (one glyph is ~1.5% of a 20-char line,
+# scan noise ~1%); per window, noise stays ~5% and a changed glyph is 20%+.
+LINE_CACHE_THRESHOLD = float(os.getenv("OCR_LINE_CACHE_THRESHOLD", 0.12))
+GLOBAL_PREFILTER = 0.05     # whole-hash bit fraction, cheap first cut
+
+HASH_ROWS = 16
+WINDOW_COLS = 8             # about one glyph at 16 rows
+MAX_HASH_COLS = 256
+
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+def line_hash(line_img: np.ndarray) -> tuple[int, np.ndarray] | None:
+    """
+    Perceptual hash of a line crop: Otsu ink mask trimmed to the ink, scaled
+    to 16 rows and a width following its aspect ratio, one bit per cell
+    with more ink than average. Returns (cols, packed bits); crops of the
+    same printed line at different scans/scales land on the same cols.
+    """
+    _, ink = cv2.threshold(line_img, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    ys, xs = np.nonzero(ink)
+    if len(ys) == 0:
+        return None
+    ink = ink[ys.min():ys.max() + 1, xs.min():xs.max() + 1]
+
+    h, w = ink.shape
+    cols = int(min(MAX_HASH_COLS, max(8, round(HASH_ROWS * w / h / 8) * 8)))
+    cells = cv2.resize(ink, (cols, HASH_ROWS), interpolation=cv2.INTER_AREA)
+    bits = cells > cells.mean()
+    return cols, np.packbits(bits.ravel())
+
+
+class LineCache:
+    """
+    Recognized text of line crops, looked up by perceptual hash so a
+    header, footer or title repeated across pages and documents is run
+    through TrOCR once. Exact hash matches are a dict hit; otherwise the
+    nearest entry with the same hash width is taken if no glyph-wide window
+    differs in more than `threshold` of its bits. LRU-bounded at `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = LINE_CACHE_SIZE, threshold: float = LINE_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        # (cols, hash bytes) -> text, in LRU order
+        self._entries: OrderedDict[tuple[int, bytes], str] = OrderedDict()
+        self.stats = {"exact_hits": 0, "near_hits": 0, "misses": 0, "evictions": 0}
+
+    def _nearest(self, cols, packed):
+        keys = [k for k in self._entries if k[0] == cols]
+        if not keys:
+            return None
+        stored = np.frombuffer(b"".join(k[1] for k in keys), dtype=np.uint8).reshape(len(keys), -1)
+        xor = stored ^ packed
+        total = _POPCOUNT[xor].sum(axis=1, dtype=np.int32)
+        candidates = np.flatnonzero(total <= GLOBAL_PREFILTER * cols * HASH_ROWS)
+        if not len(candidates):
+            return None
+
+        # worst glyph-wide window per candidate
+        diff = np.unpackbits(xor[candidates], axis=1)[:, :cols * HASH_ROWS].reshape(len(candidates), HASH_ROWS, cols)
+        per_col = diff.sum(axis=1)
+        windows = np.cumsum(np.pad(per_col, ((0, 0), (1, 0))), axis=1)
+        worst = (windows[:, WINDOW_COLS:] - windows[:, :-WINDOW_COLS]).max(axis=1)
+        ok = worst <= self.threshold * WINDOW_COLS * HASH_ROWS
+        if not ok.any():
+            return None
+        best = candidates[ok][np.argmin(total[candidates][ok])]
+        return keys[int(best)]
+
+    def get(self, line_img: np.ndarray):
+        """
+        Returns (text | None, key); pass the key to put() on a miss.
+        """
+        hashed = line_hash(line_img)
+        if hashed is None:
+            return None, None
+        cols, packed = hashed
+        key = (cols, packed.tobytes())
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return self._entries[key], key
+            near = self._nearest(cols, packed)
+            if near is not None:
+                self._entries.move_to_end(near)
+                self.stats["near_hits"] += 1
+                return self._entries[near], key
+            self.stats["misses"] += 1
+        return None, key
+
+    def put(self, key, text: str):
+        if key is None:
+            return
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def metrics(self) -> dict:
+        lookups = self.stats["exact_hits"] + self.stats["near_hits"] + self.stats["misses"]
+        hits = lookups - self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+line_cache = LineCache()
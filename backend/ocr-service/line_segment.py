@@ -2,21 +2,13 @@
 import cv2
 import numpy as np
 
-def segment_lines_from_image_bytes(image_bytes):
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE)
+from preprocess import decode_gray, preprocess_page, PHOTO_STEPS
 
-    if img is None:
-        return []
-
-    # Invert for text detection
-    thresh = cv2.adaptiveThreshold(
-        img, 255,
-        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-        cv2.THRESH_BINARY_INV,
-        31, 15
-    )
 
+def line_boxes(thresh: np.ndarray) -> list[tuple[int, int, int, int]]:
+    """
+    (x, y, w, h) of each text line in an ink mask, top to bottom.
+    """
     # Merge characters horizontally → line blobs
     kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (40, 1))
     dilated = cv2.dilate(thresh, kernel, iterations=1)
@@ -27,13 +19,29 @@ def segment_lines_from_image_bytes(image_bytes):
         cv2.CHAIN_APPROX_SIMPLE
     )
 
-    lines = []
+    boxes = []
     for cnt in sorted(contours, key=lambda c: cv2.boundingRect(c)[1]):
         x, y, w, h = cv2.boundingRect(cnt)
 
         # filter noise
         if h > 20 and w > 100:
-            line_img = img[y:y+h, x:x+w]
-            lines.append(line_img)
+            boxes.append((x, y, w, h))
+
+    return boxes
 
-    return lines
+
+def segment_lines(page: dict):
+    """
+    Line crops from a preprocess_page() result: blobs are found on its ink
+    mask and cut from its cleaned grayscale, top to bottom.
+    """
+    img = page["gray"]
+    return [img[y:y+h, x:x+w] for x, y, w, h in line_boxes(page["binary"])]
+
+
+def segment_lines_from_image_bytes(image_bytes, steps=PHOTO_STEPS):
+    try:
+        img = decode_gray(image_bytes)
+    except ValueError:
+        return []
+    return segment_lines(preprocess_page(img, steps))
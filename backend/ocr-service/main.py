@@ -1,27 +1,343 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from r2 import download_from_r2
+import os
+import sys
+import time
+import asyncio
+import requests
+from collections import OrderedDict
+from typing import Literal
+from botocore.exceptions import ClientError
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+
+# modules shared with the other services
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shared"))
+
+from r2 import download_from_r2, object_size
+from uploads import (
+    UPLOAD_BUCKET, UPLOAD_PREFIX, MAX_UPLOAD_BYTES, create_upload, upload_status,
+    complete_upload, abort_upload, load_result, save_result
+)
 from ocr_pipeline import run_ocr
+from admission import AdmissionController, ByteBudget, estimate_cost
+from line_cache import line_cache
+from metrics_client import MetricsClient
+from profiling import install_profiling, profiled
 
 app = FastAPI(title="Ask-M OCR Backend")
 
+# admin-only per-request cProfile and whole-process sampling (PROFILING_TOKEN)
+install_profiling(app, os.path.dirname(os.path.abspath(__file__)))
+
+# bounds the megapixels being OCR'd at once; see admission.py
+admission = AdmissionController()
+# bounds the bytes of downloaded files held in memory, from download to the
+# end of their OCR; admission only sees a file once it has been downloaded
+download_budget = ByteBudget()
+
+# search-service base URL; when set, OCR output is pushed there for indexing
+SEARCH_SERVICE_URL = os.getenv("SEARCH_SERVICE_URL")
+
+# latency, queue depth and job outcomes for the admin dashboard (METRICS_SERVICE_URL)
+metrics_client = MetricsClient("ocr")
+
+# OCR jobs started by completed uploads, by object ETag; finished results
+# also live in the bucket (uploads.save_result), so this only has to cover
+# jobs in progress and recent failures
+upload_jobs: OrderedDict[str, dict] = OrderedDict()
+MAX_UPLOAD_JOBS = 1000
+UPLOAD_OCR_RETRIES = 5
+_background_tasks = set()
+
 class OCRRequest(BaseModel):
     bucket: str = "ask-m-notes"
     file_key: str 
+    kind: Literal["note", "syllabus"] = "note"
+    subject: str | None = None
+    index: bool = True
+    user_id: str | None = None      # fairness key; defaults to the client address
+
+
+# later uploads of a file whose OCR is still running, by ETag: each gets
+# the text indexed under its own key and metadata once the job finishes
+duplicate_uploads: dict[str, list[OCRRequest]] = {}
+
+
+class UploadRequest(BaseModel):
+    filename: str = Field(..., min_length=1)
+    size: int = Field(..., gt=0)                # bytes; decides the number of parts
+    content_type: str = "application/octet-stream"
+    user_id: str | None = None
+
+
+class CompleteUploadRequest(BaseModel):
+    key: str
+    size: int = Field(..., gt=0)                # the size given to /uploads; every part must be in
+    kind: Literal["note", "syllabus"] = "note"
+    subject: str | None = None
+    index: bool = True
+    user_id: str | None = None
+
+
+def send_to_index(req: OCRRequest, raw_text: str) -> str:
+    # indexing is best-effort: the OCR text is still returned if it fails,
+    # and the document shows up as not indexed in the search service status
+    if not (SEARCH_SERVICE_URL and req.index):
+        return "skipped"
+    try:
+        resp = requests.post(
+            f"{SEARCH_SERVICE_URL.rstrip('/')}/index/ocr",
+            json={"file_key": req.file_key, "raw_text": raw_text, "kind": req.kind, "subject": req.subject},
+            timeout=60
+        )
+        resp.raise_for_status()
+        return resp.json().get("status", "indexed")
+    except requests.RequestException as e:
+        print(f"Indexing {req.file_key} failed: {e}")
+        return "failed"
+
+def report_queue():
+    queue = admission.metrics()
+    metrics_client.gauge("queue_depth", queue["queue_depth"])
+    metrics_client.gauge("queued_mp", queue["queued_mp"])
+    metrics_client.gauge("in_flight_mp", queue["in_flight_mp"])
+
+
+def client_user(user_id: str | None, request: Request) -> str:
+    return user_id or (request.client.host if request.client else "anonymous")
+
+
+async def ocr_object(req: OCRRequest, user: str) -> dict:
+    start = time.perf_counter()
+
+    def failed(status: str):
+        metrics_client.timing("request", (time.perf_counter() - start) * 1000, status)
+        report_queue()
+
+    # 1. Size from a HEAD, so an object is only pulled into memory once the
+    #    download budget has room for it
+    try:
+        size = await run_in_threadpool(object_size, req.bucket, req.file_key)
+    except Exception as e:
+        failed("error")
+        metrics_client.log("ERROR", f"Looking up {req.file_key} failed: {e}")
+        raise HTTPException(status_code=500, detail=f"OCR Failed: {str(e)}")
+    if size > MAX_UPLOAD_BYTES:
+        failed("rejected")
+        raise HTTPException(status_code=413, detail=f"File is larger than {MAX_UPLOAD_BYTES} bytes")
+
+    try:
+        async with download_budget.hold(size):
+            # 2. Fetch file (PDF or Image) from R2
+            try:
+                file_bytes = await run_in_threadpool(profiled(download_from_r2), req.bucket, req.file_key)
+            except Exception as e:
+                metrics_client.log("ERROR", f"Download of {req.file_key} failed: {e}")
+                raise HTTPException(status_code=500, detail=f"OCR Failed: {str(e)}")
+            downloaded = time.perf_counter()
+            metrics_client.timing("download", (downloaded - start) * 1000)
+
+            # 3. Wait for capacity; over the limits this raises 429/503 with Retry-After
+            # (the page count runs pdfinfo, a subprocess, so off the loop)
+            cost = await run_in_threadpool(estimate_cost, file_bytes, req.file_key)
+            slot = admission.slot(user, cost)
+            report_queue()
+            async with slot:
+                admitted = time.perf_counter()
+                metrics_client.timing("queue_wait", (admitted - downloaded) * 1000)
+                try:
+                    # 4. Run the pipeline (now handles PDF pages automatically) off the event loop
+                    extracted_text = await run_in_threadpool(profiled(run_ocr), file_bytes, req.file_key)
+                except Exception as e:
+                    metrics_client.timing("ocr", (time.perf_counter() - admitted) * 1000, "error")
+                    metrics_client.log("ERROR", f"OCR of {req.file_key} failed: {e}")
+                    raise HTTPException(status_code=500, detail=f"OCR Failed: {str(e)}")
+                metrics_client.timing("ocr", (time.perf_counter() - admitted) * 1000)
+            del file_bytes
+    except HTTPException as e:
+        status = "rejected" if e.status_code in (429, 503) else "error"
+        failed(status)
+        if status == "rejected":
+            metrics_client.log("WARNING", f"OCR of {req.file_key} turned away ({e.status_code}): {e.detail}")
+        raise
+    report_queue()
+
+    # 5. Hand the text to the search index
+    index_status = await run_in_threadpool(profiled(send_to_index), req, extracted_text)
+
+    elapsed = (time.perf_counter() - start) * 1000
+    metrics_client.timing("request", elapsed)
+    metrics_client.log("SUCCESS", f"{req.file_key} processed in {elapsed:.0f} ms (index: {index_status})")
+
+    return {
+        "status": "success",
+        "file_key": req.file_key,
+        "raw_text": extracted_text,
+        "index_status": index_status
+    }
+
 
 @app.post("/process-ocr")
-async def process_ocr(req: OCRRequest):
-    try:
-        # 1. Fetch file (PDF or Image) from R2
-        file_bytes = download_from_r2(req.bucket, req.file_key)
-        
-        # 2. Run the pipeline (now handles PDF pages automatically)
-        extracted_text = run_ocr(file_bytes, req.file_key)
-        
-        return {
-            "status": "success",
-            "file_key": req.file_key,
-            "raw_text": extracted_text
-        }
+async def process_ocr(req: OCRRequest, request: Request):
+    return await ocr_object(req, client_user(req.user_id, request))
+
+# ---------------- UPLOADS ----------------
+
+def check_upload_key(key: str):
+    if not key.startswith(UPLOAD_PREFIX):
+        raise HTTPException(status_code=400, detail="Not an upload key")
+
+
+def s3_failure(e: ClientError, action: str) -> HTTPException:
+    code = e.response.get("Error", {}).get("Code")
+    if code in ("NoSuchUpload", "NoSuchKey"):
+        return HTTPException(status_code=404, detail="Upload not found (completed, aborted or expired)")
+    return HTTPException(status_code=502, detail=f"{action} failed: {code}")
+
+
+async def run_upload_ocr(etag: str, req: OCRRequest, user: str):
+    job = upload_jobs[etag]
+    try:
+        for attempt in range(UPLOAD_OCR_RETRIES + 1):
+            job["status"] = "running"
+            try:
+                result = await ocr_object(req, user)
+                break
+            except HTTPException as e:
+                # admission turned it away; wait as told and queue again
+                if e.status_code in (429, 503) and attempt < UPLOAD_OCR_RETRIES:
+                    job["status"] = "queued"
+                    await asyncio.sleep(float((e.headers or {}).get("Retry-After", 5)))
+                    continue
+                job.update(status="failed", error=e.detail)
+                return
+
+        try:
+            await run_in_threadpool(save_result, etag, {
+                "etag": etag,
+                "file_key": req.file_key,
+                "raw_text": result["raw_text"],
+                "index_status": result["index_status"],
+            })
+        except ClientError as e:
+            # the text still went to the index; only dedup of later uploads is lost
+            print(f"Saving OCR result for {etag} failed: {e}")
+        job.update(status="done", index_status=result["index_status"])
+    except asyncio.CancelledError:
+        job.update(status="failed", error="OCR was cancelled (service shutting down)")
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"OCR Failed: {str(e)}")
\ No newline at end of file
+        job.update(status="failed", error=f"OCR Failed: {str(e)}")
+    finally:
+        # uploads of the same file that arrived while this ran get the text
+        # indexed for them too; if OCR failed, they see the failed job
+        duplicates = duplicate_uploads.pop(etag, [])
+        if job["status"] == "done":
+            for dup in duplicates:
+                await run_in_threadpool(profiled(send_to_index), dup, result["raw_text"])
+        elif duplicates:
+            print(f"OCR of {etag} failed; {len(duplicates)} duplicate upload(s) see the failed job")
+
+
+def public_job(job: dict) -> dict:
+    # the object key belongs to whoever uploaded the file first
+    return {k: v for k, v in job.items() if k != "file_key"}
+
+
+@app.post("/uploads")
+async def start_upload(body: UploadRequest, request: Request):
+    """
+    Starts a multipart upload and returns one presigned PUT URL per part.
+    The client PUTs byte range [(n-1)*part_size, n*part_size) to part n's
+    URL, any number in parallel, then calls /uploads/{upload_id}/complete.
+    """
+    try:
+        return await run_in_threadpool(
+            create_upload, body.filename, body.size, body.content_type, client_user(body.user_id, request)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientError as e:
+        raise s3_failure(e, "Starting upload")
+
+
+@app.get("/uploads/{upload_id}")
+async def resume_upload(upload_id: str, key: str, size: int):
+    # parts R2 already has, and fresh URLs for the missing ones
+    check_upload_key(key)
+    try:
+        return await run_in_threadpool(upload_status, key, upload_id, size)
+    except ClientError as e:
+        raise s3_failure(e, "Listing parts")
+
+
+@app.delete("/uploads/{upload_id}")
+async def cancel_upload(upload_id: str, key: str):
+    check_upload_key(key)
+    try:
+        await run_in_threadpool(abort_upload, key, upload_id)
+    except ClientError as e:
+        raise s3_failure(e, "Aborting upload")
+    return {"status": "aborted"}
+
+
+@app.post("/uploads/{upload_id}/complete")
+async def finish_upload(upload_id: str, body: CompleteUploadRequest, request: Request):
+    """
+    Assembles the uploaded parts and queues OCR for the object, unless a
+    file with the same ETag is already being, or has been, processed.
+    """
+    check_upload_key(body.key)
+    try:
+        done = await run_in_threadpool(complete_upload, body.key, upload_id, body.size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientError as e:
+        raise s3_failure(e, "Completing upload")
+
+    etag = done["etag"]
+    metrics_client.count("uploads_completed")
+    response = {**done, "job": f"/uploads/jobs/{etag}"}
+
+    req = OCRRequest(bucket=UPLOAD_BUCKET, file_key=body.key, kind=body.kind,
+                     subject=body.subject, index=body.index, user_id=body.user_id)
+
+    # the same file again: no second OCR, but it is indexed under this
+    # upload's own key, kind and subject
+    job = upload_jobs.get(etag)
+    if job is not None and job["status"] not in ("failed", "done"):
+        duplicate_uploads.setdefault(etag, []).append(req)
+        return {**response, "ocr": job["status"], "duplicate": True}
+
+    previous = await run_in_threadpool(load_result, etag)
+    if previous is not None:
+        index_status = await run_in_threadpool(profiled(send_to_index), req, previous["raw_text"])
+        metrics_client.log("INFO", f"Upload {etag} was already processed, OCR skipped (index: {index_status})")
+        return {**response, "ocr": "done", "duplicate": True, "index_status": index_status}
+
+    upload_jobs[etag] = {"etag": etag, "file_key": body.key, "status": "queued"}
+    while len(upload_jobs) > MAX_UPLOAD_JOBS:
+        upload_jobs.popitem(last=False)
+    task = asyncio.create_task(run_upload_ocr(etag, req, client_user(body.user_id, request)))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return {**response, "ocr": "queued"}
+
+
+@app.get("/uploads/jobs/{etag}")
+async def upload_job(etag: str):
+    job = upload_jobs.get(etag)
+    if job is not None and job["status"] != "done":
+        return public_job(job)
+    result = await run_in_threadpool(load_result, etag)
+    if result is None:
+        if job is not None:
+            return public_job(job)
+        raise HTTPException(status_code=404, detail="No OCR job for this ETag")
+    return {**public_job(result), "status": "done"}
+
+
+@app.get("/metrics")
+async def metrics():
+    # queue depth, queued/in-flight megapixels, wait-time percentiles, rejections
+    return {**admission.metrics(), "line_cache": line_cache.metrics()}
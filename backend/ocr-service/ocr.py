@@ -3,6 +3,7 @@ from transformers import TrOCRProcessor, VisionEncoderDecoderModel
 from PIL import Image
 import torch
 import io
+import numpy as np
 
 # Load once (important)
 processor = TrOCRProcessor.from_pretrained(
@@ -17,7 +18,15 @@ model.to("cpu")
 
 def extract_text_trocr(image_bytes: bytes) -> str:
     image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    return extract_text_trocr_image(image)
 
+
+def extract_text_trocr_array(line_img: np.ndarray) -> str:
+    # grayscale crop straight from segmentation, no PNG round trip
+    return extract_text_trocr_image(Image.fromarray(line_img).convert("RGB"))
+
+
+def extract_text_trocr_image(image: Image.Image) -> str:
     pixel_values = processor(
         image,
         return_tensors="pt"
@@ -1,9 +1,40 @@
 # ocr_pipeline.py
-from ocr import extract_text_trocr
+from ocr import extract_text_trocr_array
 from pdf_utils import pdf_bytes_to_images
-from line_segment import segment_lines_from_image_bytes
+from line_segment import segment_lines
+from preprocess import preprocess_page, PDF_STEPS, PHOTO_STEPS
+from tiling import load_capped, segment_lines_tiled, TILE_HEIGHT
+from line_cache import line_cache
+import numpy as np
 import cv2
-import io
+
+
+def recognize_lines(lines) -> list[str]:
+    texts = []
+    for line in lines:
+        # repeated printed lines (headers, footers, titles) skip TrOCR
+        line_text, key = line_cache.get(line)
+        if line_text is None:
+            line_text = extract_text_trocr_array(line)
+            line_cache.put(key, line_text)
+        if line_text.strip():
+            texts.append(line_text)
+    return texts
+
+
+def recognize_page(gray: np.ndarray, steps) -> list[str]:
+    # decode once, preprocess once; segmentation and TrOCR both read the result
+    return recognize_lines(segment_lines(preprocess_page(gray, steps)))
+
+
+def recognize_photo(file_bytes: bytes) -> list[str]:
+    # phone photos: decode at a resolution capped by text size, and work in
+    # strips when the page is still tall
+    gray = load_capped(file_bytes)
+    if gray.shape[0] > TILE_HEIGHT * 1.5:
+        return recognize_lines(segment_lines_tiled(gray, PHOTO_STEPS))
+    return recognize_page(gray, PHOTO_STEPS)
+
 
 def run_ocr(file_bytes: bytes, filename: str) -> str:
     texts = []
@@ -12,27 +43,11 @@ def run_ocr(file_bytes: bytes, filename: str) -> str:
         pages = pdf_bytes_to_images(file_bytes)
 
         for page_idx, page in enumerate(pages, start=1):
-            buf = io.BytesIO()
-            page.save(buf, format="PNG")
-            page_bytes = buf.getvalue()
-
-            lines = segment_lines_from_image_bytes(page_bytes)
-
-            page_text = []
-            for line in lines:
-                _, enc = cv2.imencode(".png", line)
-                line_text = extract_text_trocr(enc.tobytes())
-                if line_text.strip():
-                    page_text.append(line_text)
-
+            gray = cv2.cvtColor(np.asarray(page.convert("RGB")), cv2.COLOR_RGB2GRAY)
+            page_text = recognize_page(gray, PDF_STEPS)
             texts.append(f"--- Page {page_idx} ---\n" + "\n".join(page_text))
 
     else:
-        lines = segment_lines_from_image_bytes(file_bytes)
-        for line in lines:
-            _, enc = cv2.imencode(".png", line)
-            line_text = extract_text_trocr(enc.tobytes())
-            if line_text.strip():
-                texts.append(line_text)
+        texts.extend(recognize_photo(file_bytes))
 
     return "\n".join(texts)
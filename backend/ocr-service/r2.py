@@ -9,13 +9,15 @@ load_dotenv()
 ACCOUNT_ID = os.getenv("R2_ACCOUNT_ID")
 ACCESS_KEY = os.getenv("R2_ACCESS_KEY")
 SECRET_KEY = os.getenv("R2_SECRET_KEY")
+# Any other S3-compatible server (MinIO, moto_server) for local end-to-end runs
+ENDPOINT_URL = os.getenv("R2_ENDPOINT_URL")
 
-if not all([ACCOUNT_ID, ACCESS_KEY, SECRET_KEY]):
+if not all([ACCESS_KEY, SECRET_KEY]) or not (ACCOUNT_ID or ENDPOINT_URL):
     raise RuntimeError("Missing R2 environment variables")
 
 s3 = boto3.client(
     "s3",
-    endpoint_url=f"https://{ACCOUNT_ID}.r2.cloudflarestorage.com",
+    endpoint_url=ENDPOINT_URL or f"https://{ACCOUNT_ID}.r2.cloudflarestorage.com",
     aws_access_key_id=ACCESS_KEY,
     aws_secret_access_key=SECRET_KEY,
     config=Config(signature_version="s3v4"),
@@ -28,3 +30,7 @@ def download_from_r2(bucket_name: str, file_key: str) -> bytes:
         Key=file_key
     )
     return response["Body"].read()
+
+
+def object_size(bucket_name: str, file_key: str) -> int:
+    return s3.head_object(Bucket=bucket_name, Key=file_key)["ContentLength"]
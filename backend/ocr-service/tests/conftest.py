@@ -0,0 +1,5 @@
+import os
+import sys
+
+# tests import the service's modules the way uvicorn does, from its directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
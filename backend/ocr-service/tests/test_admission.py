@@ -0,0 +1,170 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from admission import PDF_PAGE_MP, AdmissionController, ByteBudget, estimate_cost, pdf_pages
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_estimate_cost_reads_image_headers():
+    buf = io.BytesIO()
+    Image.new("L", (2000, 1500)).save(buf, format="PNG")
+    assert estimate_cost(buf.getvalue(), "scan.png") == pytest.approx(3.0)
+    assert estimate_cost(b"not an image", "scan.png") == 1.0
+
+
+def test_unreadable_pdf_falls_back_to_size():
+    data = b"%PDF-1.4" + b"x" * 2_000_000
+    assert pdf_pages(data) == 41
+    assert estimate_cost(data, "paper.PDF") == pytest.approx(41 * PDF_PAGE_MP)
+
+
+def test_jobs_run_within_capacity_round_robin_by_user():
+    async def main():
+        a = AdmissionController(capacity=10)
+        order, peak = [], [0.0]
+
+        async def job(user, name):
+            async with a.slot(user, 6):
+                order.append(name)
+                peak[0] = max(peak[0], a.in_flight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(job("bulk", f"b{i}") for i in range(1, 5)), job("user", "u1"))
+        return a, order, peak[0]
+
+    a, order, peak = asyncio.run(main())
+    # u1 alternates with the bulk backlog instead of queueing behind all of it
+    assert order == ["b1", "b2", "u1", "b3", "b4"]
+    assert peak <= 10
+    assert a.in_flight == 0 and a.queued == 0
+    assert a.stats["completed"] == 5
+
+
+def test_oversized_job_is_clamped_and_runs_alone():
+    async def main():
+        a = AdmissionController(capacity=10)
+        cost = await a.acquire("u", 50)
+        assert cost == 10 and a.in_flight == 10
+        a.release(cost, 1.0)
+        return a
+
+    assert asyncio.run(main()).in_flight == 0
+
+
+def test_queue_limits_reject_with_retry_after():
+    async def main():
+        a = AdmissionController(capacity=10, max_queued=15, max_user_queued=10)
+        held = await a.acquire("u1", 10)
+        waiting = asyncio.create_task(a.acquire("u1", 8))
+        await settle()
+        with pytest.raises(HTTPException) as user_full:
+            await a.acquire("u1", 5)
+        with pytest.raises(HTTPException) as queue_full:
+            await a.acquire("u2", 8)
+        a.release(held, 1.0)
+        a.release(await waiting, 1.0)
+        return a, user_full.value, queue_full.value
+
+    a, user_full, queue_full = asyncio.run(main())
+    assert user_full.status_code == 429
+    assert queue_full.status_code == 503
+    assert int(user_full.headers["Retry-After"]) >= 1
+    assert a.stats["rejected_user"] == 1 and a.stats["rejected_full"] == 1
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        a = AdmissionController(capacity=10)
+        held = await a.acquire("u1", 8)
+        waiter = asyncio.create_task(a.acquire("u2", 8))
+        await settle()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert a.queued == 0 and not a._queues
+        a.release(held, 1.0)
+        return a
+
+    a = asyncio.run(main())
+    assert a.in_flight == 0
+
+
+def test_cancel_racing_the_grant_gives_the_slot_back():
+    async def main():
+        a = AdmissionController(capacity=10)
+        held = await a.acquire("u1", 9)
+        waiter = asyncio.create_task(a.acquire("u2", 5))
+        await settle()
+        waiter.cancel()
+        await asyncio.sleep(0)
+        a.release(held, 1.0)     # grants the cancelled waiter's ticket
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return a
+
+    a = asyncio.run(main())
+    assert a.in_flight == 0 and a.queued == 0 and not a._queues
+
+
+def test_timed_out_head_lets_the_job_behind_it_run():
+    async def main():
+        a = AdmissionController(capacity=10, max_wait=0.05)
+        held = await a.acquire("u1", 8)
+        big = asyncio.create_task(a.acquire("u2", 8))
+        await settle()
+        small = asyncio.create_task(a.acquire("u2", 1))
+        with pytest.raises(HTTPException) as timed_out:
+            await big
+        await settle()
+        assert small.done()
+        a.release(await small, 0.1)
+        a.release(held, 1.0)
+        return a, timed_out.value
+
+    a, timed_out = asyncio.run(main())
+    assert timed_out.status_code == 503
+    assert a.stats["timed_out"] == 1
+    assert a.in_flight == 0 and a.queued == 0
+
+
+def test_byte_budget_is_fifo_and_bounded():
+    async def main():
+        b = ByteBudget(limit=100, max_wait=1)
+        order, peak = [], [0]
+
+        async def job(name, size):
+            async with b.hold(size):
+                order.append(name)
+                peak[0] = max(peak[0], b.used)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(job("a", 60), job("b", 60), job("huge", 500), job("small", 30))
+        return b, order, peak[0]
+
+    b, order, peak = asyncio.run(main())
+    # "small" would fit beside "a" but doesn't jump the queue
+    assert order == ["a", "b", "huge", "small"]
+    assert peak <= 100
+    assert b.used == 0
+
+
+def test_byte_budget_times_out_with_503():
+    async def main():
+        b = ByteBudget(limit=100, max_wait=0.05)
+        async with b.hold(100):
+            with pytest.raises(HTTPException) as timed_out:
+                async with b.hold(10):
+                    pass
+        return b, timed_out.value
+
+    b, timed_out = asyncio.run(main())
+    assert timed_out.status_code == 503
+    assert b.used == 0 and not b._waiting
@@ -0,0 +1,142 @@
+"""
+The upload flow end to end against a local moto S3 server: create, upload
+some parts, resume, complete, OCR, and dedup of a second identical upload.
+The OCR model itself is replaced by a byte counter; it is not what these
+tests are about and needs torch.
+"""
+import os
+import sys
+import time
+import types
+import socket
+import importlib.util
+
+import boto3
+import pytest
+import requests
+
+moto_server = pytest.importorskip("moto.server")
+
+PART = 5 * 1024 * 1024   # the S3 minimum part size
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def service():
+    port = free_port()
+    server = moto_server.ThreadedMotoServer(port=port)
+    server.start()
+    endpoint = f"http://127.0.0.1:{port}"
+    os.environ.update(R2_ENDPOINT_URL=endpoint, R2_ACCESS_KEY="test", R2_SECRET_KEY="test",
+                      UPLOAD_PART_SIZE=str(PART), SEARCH_SERVICE_URL="")
+    boto3.client("s3", endpoint_url=endpoint, aws_access_key_id="test", aws_secret_access_key="test",
+                 region_name="us-east-1").create_bucket(Bucket="ask-m-notes")
+
+    calls = []
+    pipeline = types.ModuleType("ocr_pipeline")
+    pipeline.run_ocr = lambda data, name: calls.append(name) or f"{len(data)} bytes of {name}"
+    sys.modules["ocr_pipeline"] = pipeline
+
+    from fastapi.testclient import TestClient
+    # by path: every service has a main.py, and another may already be imported
+    spec = importlib.util.spec_from_file_location(
+        "ocr_service_main", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py"))
+    main = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(main)
+
+    indexed = []
+    main.send_to_index = lambda req, text: indexed.append((req.file_key, req.kind, text)) or "indexed"
+    with TestClient(main.app) as client:
+        yield types.SimpleNamespace(client=client, main=main, calls=calls, indexed=indexed)
+    server.stop()
+
+
+def start(client, data, name="notes.pdf"):
+    resp = client.post("/uploads", json={"filename": name, "size": len(data), "user_id": "u1"})
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+def put_parts(upload, data, parts):
+    size = upload["part_size"]
+    for part in parts:
+        n = part["part_number"]
+        resp = requests.put(part["url"], data=data[(n - 1) * size:n * size])
+        assert resp.status_code == 200, resp.text
+
+
+def wait_for_job(client, job_url, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(job_url).json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job still {job['status']}")
+
+
+def test_resume_complete_and_ocr(service):
+    client = service.client
+    data = os.urandom(PART + 4096)
+    upload = start(client, data)
+    assert len(upload["parts"]) == 2
+
+    put_parts(upload, data, upload["parts"][:1])
+    body = {"key": upload["key"], "size": len(data)}
+    incomplete = client.post(f"/uploads/{upload['upload_id']}/complete", json=body)
+    assert incomplete.status_code == 400
+
+    status = client.get(f"/uploads/{upload['upload_id']}", params=body).json()
+    assert [p["part_number"] for p in status["parts"]] == [2]
+    put_parts(upload, data, status["parts"])
+
+    done = client.post(f"/uploads/{upload['upload_id']}/complete", json=body).json()
+    assert done["ocr"] == "queued"
+    job = wait_for_job(client, done["job"])
+    assert job["status"] == "done"
+    assert "file_key" not in job
+    assert service.calls == [upload["key"]]
+
+    stored = service.main.download_from_r2("ask-m-notes", upload["key"])
+    assert stored == data
+
+    # the same bytes again: indexed under the new key and kind, not OCR'd
+    again = start(client, data)
+    put_parts(again, data, again["parts"])
+    dup = client.post(f"/uploads/{again['upload_id']}/complete",
+                      json={"key": again["key"], "size": len(data), "kind": "syllabus"}).json()
+    assert dup["duplicate"] is True and dup["etag"] == done["etag"]
+    assert service.calls == [upload["key"]]
+    assert service.indexed[-1][:2] == (again["key"], "syllabus")
+
+
+def test_unexpected_error_marks_the_job_failed(service, monkeypatch):
+    # not an HTTPException: used to leave the job "running" forever
+    client = service.client
+
+    def broken(req, text):
+        raise RuntimeError("index connection reset")
+    monkeypatch.setattr(service.main, "send_to_index", broken)
+
+    data = os.urandom(2048)
+    upload = start(client, data, "scan.png")
+    put_parts(upload, data, upload["parts"])
+    done = client.post(f"/uploads/{upload['upload_id']}/complete",
+                       json={"key": upload["key"], "size": len(data)}).json()
+    job = wait_for_job(client, done["job"])
+    assert job["status"] == "failed"
+    assert "index connection reset" in job["error"]
+
+
+def test_aborted_upload_is_gone(service):
+    client = service.client
+    upload = start(client, os.urandom(10), "a.png")
+    params = {"key": upload["key"]}
+    assert client.delete(f"/uploads/{upload['upload_id']}", params=params).json() == {"status": "aborted"}
+    resp = client.get(f"/uploads/{upload['upload_id']}", params={**params, "size": 10})
+    assert resp.status_code == 404
@@ -0,0 +1,148 @@
+# tiling.py
+import io
+import os
+import cv2
+import numpy as np
+from PIL import Image
+
+from preprocess import decode_gray, preprocess_page, remove_border, binarize, estimate_skew, rotate, denoise, SKEW_STEP_DEG
+from line_segment import line_boxes
+
+# TrOCR resizes every line crop to 384 px, so text taller than this only
+# costs memory and CPU upstream without adding detail
+TARGET_TEXT_PX = int(os.getenv("OCR_TARGET_TEXT_PX", 40))
+MAX_WORKING_MP = float(os.getenv("OCR_MAX_WORKING_MP", 16))
+TILE_HEIGHT = int(os.getenv("OCR_TILE_HEIGHT", 1600))
+
+
+def estimate_text_height(small: np.ndarray) -> float | None:
+    """
+    Median height of character-sized ink blobs in a downscaled page.
+    """
+    ink = cv2.adaptiveThreshold(small, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 10)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    # drop specks and rules/borders
+    keep = (heights >= 3) & (heights <= small.shape[0] / 10) & (widths <= small.shape[1] / 4)
+    if keep.sum() < 20:
+        return None
+    return float(np.median(heights[keep]))
+
+
+def load_capped(image_bytes: bytes) -> np.ndarray:
+    """
+    Decodes an uploaded photo at the working resolution instead of native:
+    scaled so text is about TARGET_TEXT_PX tall and the page is at most
+    MAX_WORKING_MP. JPEGs are decoded straight at 1/2, 1/4 or 1/8 scale by
+    libjpeg, so a 50 MP photo never exists in memory at full size.
+    """
+    try:
+        width, height = Image.open(io.BytesIO(image_bytes)).size
+    except Exception:
+        return decode_gray(image_bytes)
+
+    buf = np.frombuffer(image_bytes, np.uint8)
+    small = cv2.imdecode(buf, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if small is None:
+        raise ValueError("Invalid image")
+
+    scale = min(1.0, (MAX_WORKING_MP * 1e6 / (width * height)) ** 0.5)
+    text_px = estimate_text_height(small)
+    if text_px:
+        scale = min(scale, TARGET_TEXT_PX / (text_px * width / small.shape[1]))
+    scale = max(scale, 0.125)
+
+    if scale > 0.5:
+        flag, reduced = cv2.IMREAD_GRAYSCALE, 1
+    elif scale > 0.25:
+        flag, reduced = cv2.IMREAD_REDUCED_GRAYSCALE_2, 2
+    elif scale > 0.125:
+        flag, reduced = cv2.IMREAD_REDUCED_GRAYSCALE_4, 4
+    else:
+        flag, reduced = cv2.IMREAD_REDUCED_GRAYSCALE_8, 8
+    img = small if reduced == 8 else cv2.imdecode(buf, flag)
+
+    target = (max(1, round(width * scale)), max(1, round(height * scale)))
+    if (img.shape[1], img.shape[0]) != target:
+        img = cv2.resize(img, target, interpolation=cv2.INTER_AREA)
+    return img
+
+
+def _page_deskew(gray: np.ndarray) -> np.ndarray:
+    # skew is a page property: estimate it once on a small copy, rotate once
+    scale = min(1.0, 1000 / max(gray.shape))
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    angle = estimate_skew(binarize(small))
+    return rotate(gray, angle, 255) if abs(angle) >= SKEW_STEP_DEG else gray
+
+
+def _overlap(a, b) -> float:
+    # intersection over the smaller box
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    return iw * ih / min(aw * ah, bw * bh)
+
+
+def _union(a, b):
+    x0, y0 = min(a[0], b[0]), min(a[1], b[1])
+    x1, y1 = max(a[0] + a[2], b[0] + b[2]), max(a[1] + a[3], b[1] + b[3])
+    return (x0, y0, x1 - x0, y1 - y0)
+
+
+def segment_lines_tiled(gray: np.ndarray, steps, tile_height: int = TILE_HEIGHT):
+    """
+    Line crops from a large page, processed in overlapping horizontal
+    strips so the per-step buffers (shadow background, threshold, dilation)
+    stay bounded by the strip instead of the page.
+
+    Strips overlap by a few text lines. A line that lies fully inside a
+    strip is taken from it once; a line cut by a strip edge is dropped if a
+    neighbouring strip has it whole, and otherwise (taller than the
+    overlap) the pieces from both sides are stitched into one box.
+    """
+    if "border" in steps:
+        gray = remove_border(gray)
+    if "deskew" in steps:
+        gray = _page_deskew(gray)
+    strip_steps = tuple(s for s in steps if s not in ("border", "deskew"))
+
+    h = gray.shape[0]
+    overlap = max(4 * TARGET_TEXT_PX, tile_height // 8)
+    whole, cut, crops = [], [], {}
+
+    y0 = 0
+    while True:
+        y1 = min(h, y0 + tile_height)
+        page = preprocess_page(gray[y0:y1], strip_steps)
+        for x, y, w, bh in line_boxes(page["binary"]):
+            box = (x, y0 + y, w, bh)
+            touches = (y == 0 and y0 > 0) or (y + bh >= y1 - y0 and y1 < h)
+            if touches:
+                cut.append(box)
+            elif not any(_overlap(box, other) > 0.5 for other in whole):
+                whole.append(box)
+                crops[box] = page["gray"][y:y + bh, x:x + w]
+        if y1 >= h:
+            break
+        y0 = y1 - overlap
+
+    # stitch seam-cut pieces that no strip saw whole
+    stitched = []
+    for box in cut:
+        if any(_overlap(box, other) > 0.8 for other in whole):
+            continue
+        for i, other in enumerate(stitched):
+            if _overlap(box, other) > 0:
+                stitched[i] = _union(box, other)
+                break
+        else:
+            stitched.append(box)
+    for x, y, w, bh in stitched:
+        crops[(x, y, w, bh)] = denoise(gray[y:y + bh, x:x + w])
+
+    return [crops[box] for box in sorted(crops, key=lambda b: (b[1], b[0]))]
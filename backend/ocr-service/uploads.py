@@ -0,0 +1,166 @@
+# uploads.py
+"""
+Direct-to-R2 multipart uploads. The service only signs URLs: the browser
+PUTs each part straight to the bucket, in parallel, so file bytes never
+pass through Python.
+
+    create_upload()     starts the multipart upload, signs a URL per part
+    upload_status()     parts already stored + fresh URLs for the rest (resume)
+    complete_upload()   checks every part is there, stitches them, returns the ETag
+    abort_upload()      drops the parts
+
+The part size is fixed server-side, so the same file always gets the
+same multipart ETag. It is used as the dedup key for OCR: a finished
+result is stored at ocr-results/<etag>.json, and an upload whose ETag
+already has one is not OCR'd again.
+
+Parts are listed on the server at completion, so the browser doesn't need
+to read the ETag response header (which R2 only exposes with a bucket CORS
+rule: ExposeHeaders ["ETag"]).
+
+To run the whole flow locally, point R2_ENDPOINT_URL at an S3-compatible
+server (`moto_server -p 5000`, MinIO) with any R2_ACCESS_KEY / R2_SECRET_KEY.
+"""
+import os
+import re
+import json
+import math
+import uuid
+
+from botocore.exceptions import ClientError
+
+from r2 import s3
+
+UPLOAD_BUCKET = os.getenv("UPLOAD_BUCKET", "ask-m-notes")
+UPLOAD_PREFIX = "uploads/"
+RESULTS_PREFIX = "ocr-results/"
+PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE", 16 * 1024 * 1024))       # S3/R2 minimum is 5 MiB
+# the OCR service holds a whole file in memory while it is processed (see
+# admission.ByteBudget), so this is also the largest file it will OCR
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 256 * 1024 ** 2))
+URL_TTL = int(os.getenv("UPLOAD_URL_TTL", 3600))                        # seconds a part URL stays valid
+MAX_PARTS = 10000
+ALLOWED_EXTENSIONS = {".pdf", ".png", ".jpg", ".jpeg", ".webp", ".tif", ".tiff", ".bmp"}
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def safe_filename(filename: str) -> str:
+    name = _UNSAFE.sub("_", os.path.basename(filename.replace("\\", "/"))).strip("._")
+    return name[:120] or "upload"
+
+
+def part_size_for(size: int) -> int:
+    # grow parts past the default only when a file would need > MAX_PARTS
+    return max(PART_SIZE, math.ceil(size / MAX_PARTS))
+
+
+def _part_url(key: str, upload_id: str, number: int) -> str:
+    # signing is local, no request to R2
+    return s3.generate_presigned_url(
+        "upload_part",
+        Params={"Bucket": UPLOAD_BUCKET, "Key": key, "UploadId": upload_id, "PartNumber": number},
+        ExpiresIn=URL_TTL,
+    )
+
+
+def create_upload(filename: str, size: int, content_type: str, owner: str) -> dict:
+    if os.path.splitext(filename)[1].lower() not in ALLOWED_EXTENSIONS:
+        raise ValueError("Only PDFs and images can be uploaded for OCR")
+    if not 0 < size <= MAX_UPLOAD_BYTES:
+        raise ValueError(f"File size must be between 1 byte and {MAX_UPLOAD_BYTES} bytes")
+
+    key = f"{UPLOAD_PREFIX}{safe_filename(owner)}/{uuid.uuid4().hex}/{safe_filename(filename)}"
+    upload = s3.create_multipart_upload(Bucket=UPLOAD_BUCKET, Key=key, ContentType=content_type)
+    upload_id = upload["UploadId"]
+    part_size = part_size_for(size)
+    parts = math.ceil(size / part_size)
+    return {
+        "upload_id": upload_id,
+        "key": key,
+        "part_size": part_size,
+        "expires_in": URL_TTL,
+        "parts": [{"part_number": n, "url": _part_url(key, upload_id, n)} for n in range(1, parts + 1)],
+    }
+
+
+def uploaded_parts(key: str, upload_id: str) -> list[dict]:
+    parts, marker = [], 0
+    while True:
+        page = s3.list_parts(Bucket=UPLOAD_BUCKET, Key=key, UploadId=upload_id, PartNumberMarker=marker)
+        parts.extend({"PartNumber": p["PartNumber"], "ETag": p["ETag"], "Size": p["Size"]} for p in page.get("Parts", []))
+        if not page.get("IsTruncated"):
+            return parts
+        marker = page["NextPartNumberMarker"]
+
+
+def upload_status(key: str, upload_id: str, size: int) -> dict:
+    """
+    What a resuming client needs: the parts R2 already has, and newly
+    signed URLs for the ones it doesn't (old URLs may have expired).
+    """
+    done = uploaded_parts(key, upload_id)
+    have = {p["PartNumber"] for p in done}
+    part_size = part_size_for(size)
+    total = math.ceil(size / part_size)
+    return {
+        "upload_id": upload_id,
+        "key": key,
+        "part_size": part_size,
+        "uploaded": [{"part_number": p["PartNumber"], "size": p["Size"]} for p in done],
+        "parts": [{"part_number": n, "url": _part_url(key, upload_id, n)}
+                  for n in range(1, total + 1) if n not in have],
+    }
+
+
+def complete_upload(key: str, upload_id: str, size: int) -> dict:
+    """
+    Stitches the parts, but only when every part of a `size`-byte file is
+    there at its full size; an interrupted upload would otherwise become a
+    truncated object, OCR'd and cached under its ETag for good.
+    """
+    parts = uploaded_parts(key, upload_id)
+    part_size = part_size_for(size)
+    total = math.ceil(size / part_size)
+    have = {p["PartNumber"]: p["Size"] for p in parts}
+    missing = [n for n in range(1, total + 1) if n not in have]
+    if missing:
+        raise ValueError(f"Upload is incomplete: {len(missing)} of {total} parts missing (first: {missing[0]})")
+    if len(have) != total:
+        raise ValueError(f"Upload has parts beyond the {total} expected for {size} bytes")
+    for n in range(1, total + 1):
+        expected = part_size if n < total else size - part_size * (total - 1)
+        if have[n] != expected:
+            raise ValueError(f"Part {n} is {have[n]} bytes, expected {expected}")
+
+    result = s3.complete_multipart_upload(
+        Bucket=UPLOAD_BUCKET, Key=key, UploadId=upload_id,
+        MultipartUpload={"Parts": [{"PartNumber": p["PartNumber"], "ETag": p["ETag"]} for p in parts]},
+    )
+    return {"key": key, "etag": result["ETag"].strip('"'), "size": size}
+
+
+def abort_upload(key: str, upload_id: str):
+    s3.abort_multipart_upload(Bucket=UPLOAD_BUCKET, Key=key, UploadId=upload_id)
+
+
+def _result_key(etag: str) -> str:
+    return f"{RESULTS_PREFIX}{safe_filename(etag)}.json"
+
+
+def load_result(etag: str) -> dict | None:
+    try:
+        obj = s3.get_object(Bucket=UPLOAD_BUCKET, Key=_result_key(etag))
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None
+        raise
+    return json.loads(obj["Body"].read())
+
+
+def save_result(etag: str, result: dict):
+    s3.put_object(
+        Bucket=UPLOAD_BUCKET, Key=_result_key(etag),
+        Body=json.dumps(result, ensure_ascii=False).encode("utf-8"),
+        ContentType="application/json",
+    )
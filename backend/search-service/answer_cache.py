@@ -0,0 +1,130 @@
+# answer_cache.py
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 2048))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 6 * 3600))
+# cosine similarity at which two phrasings count as the same question;
+# "what is a mole" / "define mole" score ~0.9 with MiniLM, "mole" / "molarity" well below
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.92))
+
+
+_PUNCT = re.compile(r"[^\w\s]+")
+
+
+def normalize_query(query: str) -> str:
+    # "What is a Mole?" -> "what is a mole". Unlike BM25 tokens, question
+    # words stay: "why is TCP reliable" and "how is TCP reliable" must not
+    # share an exact key. Rephrasings are the semantic lookup's job.
+    return " ".join(_PUNCT.sub(" ", query.lower()).split())
+
+
+class SemanticCache:
+    """
+    Query -> response cache for search results and generated answers,
+    scoped by everything else that changes them (subject, filters, mode,
+    top_k, answer mode).
+
+    A lookup first tries the normalized query text, which needs no
+    embedding. If that misses it asks for the query vector and takes the most
+    similar cached query in the same scope above `threshold`. Entries expire
+    after `ttl`, the least recently used go first past `max_entries`, and the
+    whole cache is dropped when the index version it was filled from changes.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL,
+                 threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.version = None
+        self._lock = threading.Lock()
+        # (scope, normalized query) -> (vector | None, value, expires)
+        self._entries: OrderedDict[tuple, tuple[np.ndarray | None, dict, float]] = OrderedDict()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "invalidations": 0}
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self._entries:
+                self.stats["invalidations"] += 1
+            self._entries.clear()
+            self.version = version
+
+    def _exact(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _similar(self, scope, query_vec, now):
+        keys, vectors = [], []
+        for key, (vector, _, expires) in self._entries.items():
+            if key[0] == scope and vector is not None and expires > now:
+                keys.append(key)
+                vectors.append(vector)
+        if not keys:
+            return None
+        sims = np.stack(vectors) @ query_vec
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            return None
+        self._entries.move_to_end(keys[best])
+        return self._entries[keys[best]][1]
+
+    def lookup(self, query: str, scope: tuple, version, embed=None):
+        """
+        Returns (value | None, how, query_vec). `embed` is only called on an
+        exact miss; the vector it returns is handed back for the retrieval
+        that follows a miss.
+        """
+        key = (scope, normalize_query(query))
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            value = self._exact(key, now)
+            if value is not None:
+                self.stats["exact_hits"] += 1
+                return value, "exact", None
+
+        # embedding happens outside the lock
+        query_vec = embed() if embed else None
+        with self._lock:
+            if query_vec is not None:
+                value = self._similar(scope, query_vec, now)
+                if value is not None:
+                    self.stats["semantic_hits"] += 1
+                    return value, "semantic", query_vec
+            self.stats["misses"] += 1
+        return None, None, query_vec
+
+    def put(self, query: str, scope: tuple, version, value: dict, query_vec: np.ndarray | None = None):
+        key = (scope, normalize_query(query))
+        with self._lock:
+            if version != self.version:
+                return   # the index moved on while this answer was computed
+            self._entries[key] = (query_vec, value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def summary(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            entries = len(self._entries)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        hits = lookups - stats["misses"]
+        return {
+            **stats,
+            "entries": entries,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "version": self.version,
+        }
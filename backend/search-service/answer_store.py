@@ -0,0 +1,142 @@
+# answer_store.py
+import os
+import json
+import mmap
+import hashlib
+import threading
+
+import numpy as np
+
+from answer_cache import normalize_query
+
+ANSWER_STORE_DIR = os.getenv(
+    "ANSWER_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "index_state", "answers")
+)
+# cosine similarity between the query and a bank question above which the
+# stored answer is served as-is instead of generating one
+ANSWER_MATCH_THRESHOLD = float(os.getenv("ANSWER_MATCH_THRESHOLD", 0.9))
+
+RECORD_FIELDS = (
+    "id", "subject", "semester", "marks", "question",
+    "exam_mode_answer", "exam_f_question", "guided_mode_answer", "guided_f_question", "keywords",
+)
+INDEX_DTYPE = np.dtype([("key", "<u8"), ("offset", "<u8"), ("length", "<u4")])
+# part of the fingerprint, so a store keyed by an older normalize_query is rebuilt
+QUESTION_KEY_VERSION = 2
+
+
+def _key(text: str) -> int:
+    return int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+
+
+def id_key(row_id: str) -> int:
+    return _key("id:" + row_id)
+
+
+def question_key(question: str) -> int:
+    return _key("q:" + normalize_query(question))
+
+
+class AnswerStore:
+    """
+    Precomputed exam/guided answers from the question bank, as two files:
+
+      records.bin  JSON records back to back, one per question
+      index.npy    (key, offset, length) sorted by key, two keys per record:
+                   the row id and the hash of the normalized question text
+
+    Both are memory-mapped, so a lookup is a binary search over the index
+    plus one JSON decode of a single record, with nothing held in the heap.
+    build() rewrites the files only when the set of records changed.
+    """
+
+    def __init__(self, path: str = ANSWER_STORE_DIR):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index = None
+        self._data = None
+        self.fingerprint = None
+        self.open()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def open(self):
+        try:
+            with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            index = np.load(self._file("index.npy"), mmap_mode="r")
+            with open(self._file("records.bin"), "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        except (OSError, ValueError, json.JSONDecodeError):
+            return
+        with self._lock:
+            self._index, self._data, self.fingerprint = index, data, meta["fingerprint"]
+
+    def __len__(self):
+        return len(self._index) // 2 if self._index is not None else 0
+
+    def build(self, entries: list[dict]) -> bool:
+        records = [
+            json.dumps({f: e.get(f) for f in RECORD_FIELDS}, ensure_ascii=False, sort_keys=True).encode("utf-8")
+            for e in entries
+        ]
+        fingerprint = hashlib.sha1(
+            f"question-key-v{QUESTION_KEY_VERSION}\n".encode("utf-8") + b"\n".join(sorted(records))
+        ).hexdigest()
+        if fingerprint == self.fingerprint:
+            return False
+
+        index = np.zeros(2 * len(records), dtype=INDEX_DTYPE)
+        offset = 0
+        for i, (entry, record) in enumerate(zip(entries, records)):
+            index[2 * i] = (id_key(entry["id"]), offset, len(record))
+            index[2 * i + 1] = (question_key(entry["question"]), offset, len(record))
+            offset += len(record)
+        index.sort(order="key")
+
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._file("records.bin.tmp"), "wb") as f:
+            f.write(b"".join(records))
+        with open(self._file("index.npy.tmp"), "wb") as f:
+            np.save(f, index)
+        with open(self._file("meta.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "records": len(records)}, f)
+        # records and index first; meta last, so a half-written build is never opened
+        for name in ("records.bin", "index.npy", "meta.json"):
+            os.replace(self._file(name + ".tmp"), self._file(name))
+
+        self.open()
+        return True
+
+    def _lookup(self, key: int) -> list[dict]:
+        with self._lock:
+            index, data = self._index, self._data
+        if index is None:
+            return []
+        keys = index["key"]
+        lo = int(np.searchsorted(keys, key, side="left"))
+        hi = int(np.searchsorted(keys, key, side="right"))
+        return [
+            json.loads(data[int(off):int(off) + int(length)])
+            for off, length in zip(index["offset"][lo:hi], index["length"][lo:hi])
+        ]
+
+    def get(self, row_id: str) -> dict | None:
+        matches = self._lookup(id_key(row_id))
+        return matches[0] if matches else None
+
+    def find_question(self, question: str, subject: str | None = None) -> dict | None:
+        """
+        Exact match on the normalized question text, optionally within a subject.
+        """
+        normalized = normalize_query(question)
+        for record in self._lookup(question_key(question)):
+            # the key is a 64-bit hash; confirm the text actually matches
+            if normalize_query(record["question"]) != normalized:
+                continue
+            if subject and record["subject"] != subject:
+                continue
+            return record
+        return None
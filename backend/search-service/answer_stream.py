@@ -0,0 +1,98 @@
+# answer_stream.py
+import re
+import json
+import time
+
+from generation import generation_enabled, build_messages, stream_completion
+
+# one event per point/sentence when replaying a stored answer, so the client
+# renders it progressively the same way it renders generated text
+_POINT = re.compile(r"((?<=[.!?:])\s+(?=[A-Z0-9(])|\n+)")
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def split_points(text: str) -> list[str]:
+    # separators stay attached to the point before them, so the chunks
+    # concatenate back to the original text, tables and lists included
+    parts = _POINT.split(text)
+    points = ["".join(parts[i:i + 2]) for i in range(0, len(parts), 2)]
+    return [p for p in points if p.strip()]
+
+
+def summarize_hit(hit: dict) -> dict:
+    return {k: hit.get(k) for k in ("id", "kind", "score", "similarity", "subject", "question", "doc_id", "page")}
+
+
+def stored_answer(hit: dict, mode: str) -> tuple[str | None, str | None]:
+    # (answer, follow-up) for the mode, from the dataset's exam/guided split
+    return hit.get(f"{mode}_mode_answer"), hit.get(f"{mode}_f_question")
+
+
+def stream_answer(query: str, mode: str, results: list[dict], start: float, precomputed: dict | None = None,
+                  cached: str | None = None):
+    """
+    SSE events for one answer:
+
+      retrieval  {"results", "ttfb_ms"}         - sent as soon as retrieval is done
+      answer     {"text"}                        - repeated, in order
+      follow_up  {"question"}                    - optional
+      done       {"source", "first_chunk_ms", "total_ms"}
+
+    A `precomputed` record (a confident match to a bank question) is sent
+    as stored. Otherwise, with a generation endpoint configured, the answer
+    is the model's token stream over the retrieved context; without one it
+    is the stored answer of the best question-bank match. `cached` is a
+    previously generated answer to the same question, replayed instead of
+    generating again.
+
+    Returns the generated text when generation ran to completion, for the
+    caller to cache.
+    """
+    def ms():
+        return round((time.perf_counter() - start) * 1000, 2)
+
+    yield sse("retrieval", {"results": [summarize_hit(h) for h in results], "ttfb_ms": ms()})
+
+    first_chunk_ms = None
+    follow_up = None
+    source = "none"
+    generated = None
+
+    if precomputed is None and cached:
+        source = "cached"
+        for point in split_points(cached):
+            if first_chunk_ms is None:
+                first_chunk_ms = ms()
+            yield sse("answer", {"text": point})
+    elif precomputed is None and generation_enabled():
+        source = "generated"
+        deltas = []
+        try:
+            for delta in stream_completion(build_messages(query, mode, results)):
+                if first_chunk_ms is None:
+                    first_chunk_ms = ms()
+                deltas.append(delta)
+                yield sse("answer", {"text": delta})
+            generated = "".join(deltas) or None
+        except Exception as e:
+            yield sse("error", {"detail": f"Generation failed: {str(e)}"})
+    else:
+        # the best question-bank hit that has an answer in this mode
+        best = precomputed or next(
+            (h for h in results if h.get("kind") == "qa" and stored_answer(h, mode)[0]), None
+        )
+        answer, follow_up = stored_answer(best, mode) if best else (None, None)
+        if answer:
+            source = "precomputed" if precomputed else "stored"
+            for point in split_points(answer):
+                if first_chunk_ms is None:
+                    first_chunk_ms = ms()
+                yield sse("answer", {"text": point})
+
+    if follow_up:
+        yield sse("follow_up", {"question": follow_up})
+    yield sse("done", {"source": source, "first_chunk_ms": first_chunk_ms, "total_ms": ms()})
+    return generated
@@ -0,0 +1,158 @@
+# bm25.py
+import re
+from collections import defaultdict
+
+import numpy as np
+
+# Field weights: a hit in the syllabus keywords says more than one in the
+# question text, which says more than one somewhere in a long answer.
+FIELD_WEIGHTS = {
+    "keywords": 3.0,
+    "question": 2.0,
+    "answers": 1.0,
+}
+K1 = 1.2
+B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by define describe do does explain for from how in is it "
+    "its of on or s the to what when which why with write".split()
+)
+
+
+def tokenize(text: str | None) -> list[str]:
+    if not text:
+        return []
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def entry_fields(entry: dict | None) -> dict[str, str]:
+    # None is a free row in the vector index; it stays in the arrays but never matches
+    entry = entry or {}
+    return {
+        "keywords": " ".join(entry.get("keywords") or []),
+        "question": entry.get("question") or "",
+        "answers": " ".join(filter(None, [entry.get("exam_mode_answer"), entry.get("guided_mode_answer"), entry.get("text")])),
+    }
+
+
+class BM25Index:
+    """
+    BM25F over the weighted fields above, updated one document at a time.
+
+    Rows are the vector index's row numbers. Each term keeps its raw
+    per-field counts by row, and each row its field lengths; set() and
+    remove() only touch the terms of that one document. Length
+    normalization, tf saturation and idf depend on collection-wide
+    averages, so they are applied at query time, vectorized over a term's
+    postings: doc ids (int32) and per-field tf (float32), compiled from the
+    counts the first time a query needs the term after it changed.
+    """
+
+    def __init__(self, field_weights: dict[str, float] = FIELD_WEIGHTS, k1: float = K1, b: float = B):
+        self.field_weights = field_weights
+        self.fields = list(field_weights)
+        self.weights = np.array([field_weights[f] for f in self.fields], dtype=np.float32)
+        self.k1 = k1
+        self.b = b
+        self.n_docs = 0                                  # live documents
+        self.n_rows = 0                                  # length of the score vector
+        self.field_len = np.zeros((1024, len(self.fields)), dtype=np.float32)
+        self.total_len = np.zeros(len(self.fields), dtype=np.float64)
+        self._counts: dict[str, dict[int, tuple]] = defaultdict(dict)   # term -> row -> per-field tf
+        self._terms: dict[int, list[str]] = {}                          # row -> its terms
+        self._compiled: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+
+    def build(self, entries: list[dict | None]):
+        self.__init__(self.field_weights, self.k1, self.b)
+        for row, entry in enumerate(entries):
+            self.set(row, entry)
+        self.n_rows = len(entries)
+
+    def set(self, row: int, entry: dict | None):
+        """
+        Indexes `entry` at `row`, replacing whatever was there. None clears it.
+        """
+        self.remove(row)
+        self.n_rows = max(self.n_rows, row + 1)
+        if entry is None:
+            return
+        if row >= len(self.field_len):
+            grown = np.zeros((max(row + 1, 2 * len(self.field_len)), len(self.fields)), dtype=np.float32)
+            grown[:len(self.field_len)] = self.field_len
+            self.field_len = grown
+
+        texts = entry_fields(entry)
+        tf: dict[str, list[int]] = defaultdict(lambda: [0] * len(self.fields))
+        for f, field in enumerate(self.fields):
+            tokens = tokenize(texts[field])
+            self.field_len[row, f] = len(tokens)
+            for tok in tokens:
+                tf[tok][f] += 1
+        self.total_len += self.field_len[row]
+        for term, counts in tf.items():
+            self._counts[term][row] = tuple(counts)
+            self._compiled.pop(term, None)
+        self._terms[row] = list(tf)
+        self.n_docs += 1
+
+    def remove(self, row: int):
+        terms = self._terms.pop(row, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._counts[term]
+            del postings[row]
+            if not postings:
+                del self._counts[term]
+            self._compiled.pop(term, None)
+        self.total_len -= self.field_len[row]
+        self.field_len[row] = 0
+        self.n_docs -= 1
+
+    def _postings(self, term: str):
+        compiled = self._compiled.get(term)
+        if compiled is None:
+            counts = self._counts.get(term)
+            if not counts:
+                return None
+            ids = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+            tf = np.array(list(counts.values()), dtype=np.float32)
+            compiled = self._compiled[term] = (ids, tf)
+        return compiled
+
+    def scores(self, query: str, n_rows: int = 0) -> np.ndarray:
+        scores = np.zeros(max(self.n_rows, n_rows), dtype=np.float32)
+        if not self.n_docs:
+            return scores
+        avg_len = np.maximum(1.0, self.total_len / self.n_docs).astype(np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings(term)
+            if posting is None:
+                continue
+            ids, tf = posting
+            # BM25F pseudo-tf: per-field length-normalized, weighted, summed
+            norm = 1 - self.b + self.b * self.field_len[ids] / avg_len
+            weighted = (tf * self.weights / norm).sum(axis=1)
+            df = len(ids)
+            idf = np.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            scores[ids] += idf * weighted / (self.k1 + weighted)
+        return scores
+
+    def search(self, query: str, top_k: int = 10, mask: np.ndarray | None = None):
+        """
+        Returns [(doc_index, score), ...] best first, only docs with score > 0.
+        """
+        if not self.n_docs:
+            return []
+        scores = self.scores(query, len(mask) if mask is not None else 0)
+        if mask is not None:
+            scores = np.where(mask, scores, 0)
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            part = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+            candidates = candidates[part]
+        order = candidates[np.argsort(-scores[candidates])]
+        return [(int(i), float(scores[i])) for i in order]
@@ -0,0 +1,124 @@
+# embeddings.py
+import os
+import hashlib
+import threading
+
+import numpy as np
+
+from vector_store import VectorStore, read_meta
+
+# Small CPU-friendly sentence encoder (384-dim)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+# padded characters per batch: short questions go 64 at a time, long note chunks fewer
+EMBEDDING_BATCH_CHARS = int(os.getenv("EMBEDDING_BATCH_CHARS", 16000))
+
+EMBEDDING_CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "index_state", "embeddings")
+)
+# float32 | float16 | int8; on-disk size only, the search index stays float32 in RAM
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def length_batches(texts: list[str], max_size: int = EMBEDDING_BATCH_SIZE,
+                   max_chars: int = EMBEDDING_BATCH_CHARS) -> list[list[int]]:
+    """
+    Groups text indices by length so each batch pads to a similar length,
+    and caps a batch at max_size texts or max_chars of padded input.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    batches, current = [], []
+    for i in order:
+        # sorted ascending, so this text is the longest in the batch so far
+        if current and (len(current) == max_size or (len(current) + 1) * len(texts[i]) > max_chars):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+class Embedder:
+    """
+    Loads the model on first use and returns L2-normalized float32 vectors,
+    so a dot product is the cosine similarity.
+
+    encode() looks every text up by content hash in a persistent VectorStore
+    first and only runs the model on misses, so rebuilding the index or
+    restarting the service re-embeds nothing that was embedded before.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, cache_dir: str | None = EMBEDDING_CACHE_DIR,
+                 cache_dtype: str = EMBEDDING_CACHE_DTYPE):
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.cache_dtype = cache_dtype
+        self._model = None
+        self._store = None
+        self._lock = threading.Lock()
+        self.stats = {"cache_hits": 0, "embedded": 0}
+
+    @property
+    def model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model
+
+    @property
+    def dim(self) -> int:
+        if self._store is not None:
+            return self._store.dim
+        # a warm cache knows the dimension, so startup needn't load the model
+        meta = read_meta(self.cache_dir) if self.cache_dir else None
+        if meta and meta["model"] == self.model_name:
+            return meta["dim"]
+        return self.model.get_sentence_embedding_dimension()
+
+    @property
+    def store(self) -> VectorStore | None:
+        if self._store is None and self.cache_dir:
+            with self._lock:
+                if self._store is None:
+                    self._store = VectorStore(self.cache_dir, self.model_name, self.dim, self.cache_dtype)
+        return self._store
+
+    def _run_model(self, texts: list[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for batch in length_batches(texts):
+            out[batch] = self.model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+        return out
+
+    def encode(self, texts: list[str], cache: bool = True) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        if not cache or self.store is None:
+            return self._run_model(texts)
+
+        keys = [text_hash(t) for t in texts]
+        found = self.store.get_many(keys)
+        missing = {k: t for k, t in zip(keys, texts) if k not in found}
+        if missing:
+            vectors = self._run_model(list(missing.values()))
+            self.store.put_many(list(missing), vectors)
+            found.update(zip(missing, vectors))
+
+        self.stats["cache_hits"] += len(texts) - len(missing)
+        self.stats["embedded"] += len(missing)
+        return np.stack([found[k] for k in keys])
+
+    def encode_one(self, text: str) -> np.ndarray:
+        # queries are one-off; caching them would only grow the store
+        return self.encode([text], cache=False)[0]
@@ -0,0 +1,74 @@
+# generation.py
+import os
+import json
+
+import httpx
+
+# Any OpenAI-compatible chat-completions endpoint (the fine-tuned model,
+# DeepSeek, or Fine Tuning/.../mock_llm_server.py). Unset = no generation;
+# answers come from the question bank only.
+GENERATION_API_URL = os.getenv("GENERATION_API_URL")
+GENERATION_API_KEY = os.getenv("GENERATION_API_KEY", "")
+GENERATION_MODEL = os.getenv("GENERATION_MODEL", "deepseek-chat")
+GENERATION_MAX_TOKENS = int(os.getenv("GENERATION_MAX_TOKENS", 800))
+GENERATION_TIMEOUT = float(os.getenv("GENERATION_TIMEOUT", 60))
+
+MODE_INSTRUCTIONS = {
+    "exam": (
+        "Write the answer exactly as a KU student would write in exams. "
+        "Correctness over verbosity. If the question asks to compare or "
+        "differentiate, answer in a table."
+    ),
+    "guided": (
+        "Explain the concept at beginner to intermediate level: the idea first, "
+        "then syntax, with the logic broken into clear steps."
+    ),
+}
+
+
+def generation_enabled() -> bool:
+    return bool(GENERATION_API_URL)
+
+
+def build_messages(query: str, mode: str, context: list[dict]) -> list[dict]:
+    sources = []
+    for hit in context:
+        if hit.get("kind") == "qa":
+            answer = hit.get(f"{mode}_mode_answer") or hit.get("exam_mode_answer") or ""
+            sources.append(f"Q: {hit['question']}\nA: {answer}")
+        elif hit.get("text"):
+            sources.append(hit["text"])
+
+    system = f"You are Ask-M, a study assistant for Kathmandu University students. {MODE_INSTRUCTIONS[mode]}"
+    user = query
+    if sources:
+        user = "Reference material:\n\n" + "\n\n---\n\n".join(sources) + f"\n\nQuestion: {query}"
+    return [{"role": "system", "content": system}, {"role": "user", "content": user}]
+
+
+def stream_completion(messages: list[dict]):
+    """
+    Yields content deltas from a streaming chat completion as they arrive.
+    """
+    payload = {
+        "model": GENERATION_MODEL,
+        "messages": messages,
+        "max_tokens": GENERATION_MAX_TOKENS,
+        "stream": True,
+    }
+    headers = {"Authorization": f"Bearer {GENERATION_API_KEY}"} if GENERATION_API_KEY else {}
+
+    with httpx.stream("POST", GENERATION_API_URL, json=payload, headers=headers, timeout=GENERATION_TIMEOUT) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+            except (json.JSONDecodeError, KeyError, IndexError):
+                continue
+            if delta:
+                yield delta
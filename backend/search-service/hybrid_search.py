@@ -0,0 +1,59 @@
+# hybrid_search.py
+import re
+
+RRF_K = 60              # standard reciprocal rank fusion constant
+CANDIDATES = 50         # per-retriever depth fed into fusion
+SUBJECT_BOOST = 0.5     # relative bonus for rows of a course code named in the query
+
+_COURSE_CODE = re.compile(r"\b([A-Za-z]{4})\s*-?\s*(\d{3})\b")
+
+
+def course_codes(query: str, known_subjects: set[str]) -> set[str]:
+    """
+    "comp102", "COMP 102", "Comp-102" -> {"COMP 102"} if that subject exists.
+    """
+    codes = {f"{a.upper()} {n}" for a, n in _COURSE_CODE.findall(query)}
+    return codes & known_subjects
+
+
+def reciprocal_rank_fusion(rankings: list[list[int]], k: int = RRF_K) -> dict[int, float]:
+    fused: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            fused[doc] = fused.get(doc, 0.0) + 1.0 / (k + rank + 1)
+    return fused
+
+
+def hybrid_search(query, query_vec, vindex, bm25, top_k=5, subject=None, semester=None,
+                  marks=None, kind=None, mode="hybrid", candidates=CANDIDATES):
+    """
+    Returns [(row, fused_score, {"vector": rank|None, "bm25": rank|None}), ...].
+
+    Both retrievers see the same filter mask. A course code in the query that
+    isn't already an explicit filter boosts that subject's rows rather than
+    excluding the rest, so "COMP 102 arrays" still finds arrays elsewhere.
+    """
+    mask = vindex.mask(subject, semester, marks, kind)
+    depth = max(candidates, top_k)
+
+    rankings = {}
+    if mode in ("hybrid", "vector") and query_vec is not None:
+        rankings["vector"] = [i for i, _ in vindex.rank(query_vec, depth, mask)]
+    if mode in ("hybrid", "bm25"):
+        rankings["bm25"] = [i for i, _ in bm25.search(query, depth, mask)]
+
+    fused = reciprocal_rank_fusion(list(rankings.values()))
+
+    if not subject:
+        boosted = course_codes(query, vindex.subjects)
+        if boosted:
+            for doc in fused:
+                if vindex.payloads[doc]["subject"] in boosted:
+                    fused[doc] *= 1 + SUBJECT_BOOST
+
+    positions = {name: {doc: r for r, doc in enumerate(ranking)} for name, ranking in rankings.items()}
+    ordered = sorted(fused.items(), key=lambda kv: -kv[1])[:top_k]
+    return [
+        (doc, score, {name: positions[name].get(doc) for name in ("vector", "bm25") if name in positions})
+        for doc, score in ordered
+    ]
@@ -0,0 +1,330 @@
+# indexer.py
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+
+import numpy as np
+
+from question_bank import load_question_bank, embedding_text, BANK_DIR
+from vector_index import VectorIndex
+from bm25 import BM25Index
+
+STATE_DIR = os.getenv(
+    "INDEX_STATE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "index_state")
+)
+DOCUMENTS_FILE = "documents.json"
+
+QUESTION_BANK_DOC = "question-bank"
+MAX_CHUNK_CHARS = 1200      # ~300 tokens, well inside the encoder's 256-512 token window
+CHUNK_OVERLAP = 150         # carried over between chunks of the same section
+
+_PAGE_MARKER = re.compile(r"^--- Page (\d+) ---$", re.MULTILINE)
+# "UNIT 3", "Chapter 2", "3.1 Arrays", "Q4.", "Arrays:" - a new section starts here
+_HEADING = re.compile(r"^(?:(?:unit|chapter|section|module)\s+\d+|\d+(?:\.\d+)*\.?\s+\S|q\d+\b|[^.]{3,60}:$)", re.IGNORECASE)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _split_sections(lines: list[str]) -> list[list[str]]:
+    sections, current = [], []
+    for line in lines:
+        if current and _HEADING.match(line):
+            sections.append(current)
+            current = []
+        current.append(line)
+    if current:
+        sections.append(current)
+    return sections
+
+
+def _pack(lines: list[str], max_chars: int, overlap: int) -> list[str]:
+    chunks, current, size = [], [], 0
+    for line in lines:
+        if current and size + len(line) > max_chars:
+            chunks.append("\n".join(current))
+            # keep the tail lines so a sentence cut at the boundary appears in both chunks
+            tail, tail_size = [], 0
+            for prev in reversed(current):
+                if tail_size + len(prev) > overlap:
+                    break
+                tail.insert(0, prev)
+                tail_size += len(prev)
+            current, size = tail, tail_size
+        current.append(line)
+        size += len(line)
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def chunk_ocr_text(raw_text: str, max_chars: int = MAX_CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> list[dict]:
+    """
+    run_ocr output -> [{"page", "text"}, ...].
+
+    PDFs come back as "--- Page N ---" blocks; each page is split into
+    sections at heading-like lines and sections are packed into chunks of
+    at most max_chars. Single images have no marker and count as page 1.
+    """
+    parts = _PAGE_MARKER.split(raw_text or "")
+    pages = [(1, parts[0])] if parts[0].strip() else []
+    pages += [(int(parts[i]), parts[i + 1]) for i in range(1, len(parts) - 1, 2)]
+
+    chunks = []
+    for page, text in pages:
+        lines = [l.strip() for l in text.splitlines() if l.strip()]
+        for section in _split_sections(lines):
+            for chunk in _pack(section, max_chars, overlap):
+                chunks.append({"page": page, "text": chunk})
+    return chunks
+
+
+def _doc_filename(doc_id: str) -> str:
+    return hashlib.sha1(doc_id.encode("utf-8")).hexdigest()[:16] + ".json"
+
+
+class Indexer:
+    """
+    Owns the vector and BM25 indexes and keeps them in step with the
+    documents fed to it (OCR'd notes/syllabi and the expanded question bank).
+
+    Every chunk carries a content hash. Re-indexing a document embeds only
+    chunks whose text isn't already embedded, upserts chunks whose hash
+    changed and deletes chunks that disappeared; an unchanged document is a
+    no-op.
+    Per-document status and version are persisted under STATE_DIR together
+    with the chunk payloads, so notes survive a restart without re-running OCR.
+
+    Embedding happens outside the lock; only the index mutation and the
+    per-chunk BM25 update hold it, and searches take the same lock to see a
+    consistent pair.
+    """
+
+    def __init__(self, embedder, state_dir: str = STATE_DIR):
+        self.embedder = embedder
+        self.state_dir = state_dir
+        self.lock = threading.RLock()
+        self.vindex: VectorIndex | None = None
+        self.bm25 = BM25Index()
+        self.documents: dict[str, dict] = {}
+        self.version = 0
+        self._hashes: dict[str, str] = {}   # chunk id -> content hash of what's indexed
+
+    # ---------- persistence ----------
+
+    def _documents_path(self):
+        return os.path.join(self.state_dir, DOCUMENTS_FILE)
+
+    def _chunks_path(self, doc_id):
+        return os.path.join(self.state_dir, "chunks", _doc_filename(doc_id))
+
+    def _save_documents(self):
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp = self._documents_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "documents": self.documents}, f, indent=2)
+        os.replace(tmp, self._documents_path())
+
+    def _save_chunks(self, doc_id, payloads):
+        path = self._chunks_path(doc_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payloads, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def load(self):
+        """
+        Restores documents indexed by earlier runs. The question bank is not
+        persisted here; it is re-read from its own files by index_question_bank().
+        """
+        path = self._documents_path()
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+
+        self.version = state.get("version", 0)
+        for doc_id, doc in state.get("documents", {}).items():
+            chunks_path = self._chunks_path(doc_id)
+            if doc_id == QUESTION_BANK_DOC:
+                continue
+            self.documents[doc_id] = doc
+            if not os.path.exists(chunks_path):
+                doc["chunk_ids"] = []   # never got as far as indexing; keep it for its status
+                continue
+            with open(chunks_path, "r", encoding="utf-8") as f:
+                payloads = json.load(f)
+            self._apply(doc_id, payloads, persist=False)
+        # one BM25 build over everything restored, rather than per document
+        with self.lock:
+            if self.vindex is not None:
+                self._rebuild_bm25()
+
+    # ---------- indexing ----------
+
+    def _embed_new(self, payloads: list[dict]) -> tuple[dict[str, np.ndarray], int]:
+        # reuse vectors already in the index when the embedded text is unchanged
+        vectors, todo = {}, []
+        with self.lock:
+            for p in payloads:
+                indexed = self.vindex.get(p["id"]) if self.vindex is not None else None
+                if indexed is not None and indexed["embedding_text"] == p["embedding_text"]:
+                    vectors[p["id"]] = self.vindex.vector(p["id"])
+                else:
+                    todo.append(p)
+        if todo:
+            encoded = self.embedder.encode([p["embedding_text"] for p in todo])
+            vectors.update(zip((p["id"] for p in todo), encoded))
+        return vectors, len(todo)
+
+    def _rebuild_bm25(self):
+        # built from the vector index's rows so both keep the same row numbers;
+        # after that, _apply and delete_document update it per chunk
+        bm25 = BM25Index()
+        bm25.build(self.vindex.payloads)
+        self.bm25 = bm25
+
+    def _drop_chunks(self, chunk_ids, bm25=True):
+        for chunk_id in chunk_ids:
+            row = self.vindex.row(chunk_id)
+            if row is not None and bm25:
+                self.bm25.remove(row)
+            self._hashes.pop(chunk_id, None)
+        self.vindex.delete(chunk_ids)
+
+    def _apply(self, doc_id, payloads, persist=True):
+        vectors, embedded = self._embed_new(payloads)
+
+        with self.lock:
+            if self.vindex is None:
+                self.vindex = VectorIndex(self.embedder.dim)
+
+            previous = set(self.documents.get(doc_id, {}).get("chunk_ids", []))
+            current = [p["id"] for p in payloads]
+            stale = previous - set(current)
+            changed = [p for p in payloads if self._hashes.get(p["id"]) != p["content_hash"]]
+
+            if changed:
+                self.vindex.upsert(
+                    [p["id"] for p in changed],
+                    np.stack([vectors[p["id"]] for p in changed]),
+                    changed
+                )
+                for p in changed:
+                    self._hashes[p["id"]] = p["content_hash"]
+                    # load() builds BM25 once at the end instead
+                    if persist:
+                        self.bm25.set(self.vindex.row(p["id"]), p)
+            if stale:
+                self._drop_chunks(stale, bm25=persist)
+
+            doc = self.documents.setdefault(doc_id, {"version": 0})
+            if persist and (changed or stale):
+                self.version += 1
+                doc["version"] += 1
+            doc.update({
+                "status": "indexed",
+                "chunk_ids": current,
+                "chunks": len(current),
+                "embedded": embedded,
+                "updated_at": time.time(),
+                "error": None,
+            })
+            if persist:
+                if doc_id != QUESTION_BANK_DOC:
+                    self._save_chunks(doc_id, payloads)
+                self._save_documents()
+            return doc
+
+    def _index(self, doc_id, kind, build_payloads, meta=None):
+        with self.lock:
+            doc = self.documents.setdefault(doc_id, {"version": 0})
+            doc.update({"kind": kind, "status": "pending", **(meta or {})})
+        try:
+            return self._apply(doc_id, build_payloads())
+        except Exception as e:
+            with self.lock:
+                doc.update({"status": "failed", "error": str(e), "updated_at": time.time()})
+                self._save_documents()
+            raise
+
+    def index_ocr(self, file_key: str, raw_text: str, kind: str = "note", subject: str | None = None) -> dict:
+        """
+        Indexes one OCR'd file (approved note or syllabus). Re-sending the same
+        file_key replaces its previous chunks.
+        """
+        def payloads():
+            out, seen = [], set()
+            for n, chunk in enumerate(chunk_ocr_text(raw_text)):
+                digest = content_hash(chunk["text"])
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                out.append({
+                    # id follows the content, so an edited page only replaces its own chunks
+                    "id": f"{file_key}#{digest[:12]}",
+                    "doc_id": file_key,
+                    "kind": kind,
+                    "subject": subject,
+                    "page": chunk["page"],
+                    "chunk": n,
+                    "text": chunk["text"],
+                    "embedding_text": chunk["text"],
+                    "content_hash": digest,
+                })
+            return out
+
+        return self._index(file_key, kind, payloads, {"subject": subject})
+
+    def index_question_bank(self, bank_dir: str = BANK_DIR) -> dict:
+        """
+        (Re)indexes the expanded question bank. New JSONL rows from
+        data_expand.py are embedded; rows already indexed are left alone.
+        """
+        def payloads():
+            out = []
+            for entry in load_question_bank(bank_dir):
+                text = embedding_text(entry)
+                out.append({
+                    **entry,
+                    "doc_id": QUESTION_BANK_DOC,
+                    "kind": "qa",
+                    "embedding_text": text,
+                    "content_hash": content_hash(json.dumps(entry, sort_keys=True)),
+                })
+            return out
+
+        return self._index(QUESTION_BANK_DOC, "qa", payloads)
+
+    def delete_document(self, doc_id: str) -> bool:
+        with self.lock:
+            doc = self.documents.pop(doc_id, None)
+            if doc is None:
+                return False
+            stale = doc.get("chunk_ids", [])
+            if stale and self.vindex is not None:
+                self._drop_chunks(stale)
+            self.version += 1
+
+            path = self._chunks_path(doc_id)
+            if os.path.exists(path):
+                os.remove(path)
+            self._save_documents()
+            return True
+
+    def status(self) -> dict:
+        with self.lock:
+            return {
+                "version": self.version,
+                "indexed": len(self.vindex) if self.vindex else 0,
+                "documents": {
+                    doc_id: {k: v for k, v in doc.items() if k != "chunk_ids"}
+                    for doc_id, doc in self.documents.items()
+                },
+            }
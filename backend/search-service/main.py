@@ -0,0 +1,326 @@
+import time
+from typing import Literal
+
+import numpy as np
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from embeddings import Embedder
+from indexer import Indexer
+from hybrid_search import hybrid_search
+from answer_cache import SemanticCache
+from answer_stream import stream_answer, stored_answer
+from generation import generation_enabled
+from answer_store import AnswerStore, ANSWER_MATCH_THRESHOLD
+
+app = FastAPI(title="Ask-M Search Backend")
+
+embedder = Embedder()
+indexer = Indexer(embedder)
+answer_cache = SemanticCache()
+answer_store = AnswerStore()
+ready = False
+
+
+class SearchRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    subject: str | None = None      # e.g. "COMP 102"
+    semester: int | None = None
+    marks: float | None = None
+    kind: Literal["qa", "note", "syllabus"] | None = None
+    top_k: int = Field(5, ge=1, le=50)
+    mode: Literal["hybrid", "vector", "bm25"] = "hybrid"
+
+
+class AnswerRequest(SearchRequest):
+    # which of the dataset's two answers to give: exam_mode_answer or guided_mode_answer
+    answer_mode: Literal["exam", "guided"] = "exam"
+
+
+class OCRIndexRequest(BaseModel):
+    file_key: str = Field(..., min_length=1)
+    raw_text: str
+    kind: Literal["note", "syllabus"] = "note"
+    subject: str | None = None
+
+
+def format_hit(entry: dict, score: float, ranks: dict, similarity: float | None = None) -> dict:
+    return {
+        "id": entry["id"],
+        "score": round(score, 5),
+        "ranks": ranks,
+        "similarity": round(similarity, 5) if similarity is not None else None,
+        "kind": entry.get("kind"),
+        "doc_id": entry.get("doc_id"),
+        "subject": entry.get("subject"),
+        "semester": entry.get("semester"),
+        "marks": entry.get("marks"),
+        "question": entry.get("question"),
+        "exam_mode_answer": entry.get("exam_mode_answer"),
+        "guided_mode_answer": entry.get("guided_mode_answer"),
+        "keywords": entry.get("keywords"),
+        "page": entry.get("page"),
+        "text": entry.get("text"),
+    }
+
+
+@app.on_event("startup")
+async def load_index():
+    global ready
+    start = time.perf_counter()
+    indexer.load()
+    indexer.index_question_bank()
+    refresh_answer_store()
+    ready = True
+    print(f"Indexed {indexer.status()['indexed']} chunks in {time.perf_counter() - start:.1f}s")
+
+
+def refresh_answer_store():
+    with indexer.lock:
+        payloads = indexer.vindex.payloads if indexer.vindex else []
+        entries = [p for p in payloads if p and p.get("kind") == "qa"]
+    if answer_store.build(entries):
+        print(f"Answer store rebuilt with {len(entries)} questions")
+
+
+@app.get("/")
+async def root():
+    return {"message": "Search Backend is Running", "indexed": indexer.status()["indexed"]}
+
+
+def supported_filters(req: SearchRequest) -> tuple[SearchRequest, list[str]]:
+    """
+    Semester and marks are only known where the bank row or its seed paper
+    had them. A filter no indexed row can satisfy is dropped rather than
+    returning nothing; either way the caller gets a note saying so.
+    """
+    with indexer.lock:
+        index = indexer.vindex
+        live = len(index) if index else 0
+        known = {f: index.known(f) if index else 0 for f in ("semester", "marks")}
+
+    dropped, notes = {}, []
+    for field, n in known.items():
+        if getattr(req, field) is None:
+            continue
+        if n == 0:
+            dropped[field] = None
+            notes.append(f"{field} filter ignored: no indexed row has a {field}")
+        elif n < live:
+            notes.append(f"{field} known for {n} of {live} rows; rows without it are excluded")
+    return (req.model_copy(update=dropped) if dropped else req), notes
+
+
+def search_scope(req: SearchRequest) -> tuple:
+    return (req.subject, req.semester, req.marks, req.kind, req.top_k, req.mode)
+
+
+def retrieve(req: SearchRequest) -> tuple[list[dict], str | None, np.ndarray | None]:
+    """
+    (results, how they were cached, query vector). The vector is None for
+    bm25-only queries and for exact cache hits.
+    """
+    scope = search_scope(req)
+    version = indexer.version
+    embed = (lambda: embedder.encode_one(req.query)) if req.mode != "bm25" else None
+    cached, how, query_vec = answer_cache.lookup(req.query, scope, version, embed)
+    if cached is not None:
+        return cached["results"], how, query_vec
+
+    with indexer.lock:
+        index = indexer.vindex
+        if index is None:
+            return [], None, query_vec
+        hits = hybrid_search(
+            req.query,
+            query_vec,
+            index,
+            indexer.bm25,
+            top_k=req.top_k,
+            subject=req.subject,
+            semester=req.semester,
+            marks=req.marks,
+            kind=req.kind,
+            mode=req.mode
+        )
+        # cosine of the query to each hit, which fused scores don't carry
+        results = [
+            format_hit(
+                index.payloads[row], score, ranks,
+                float(index.vectors[row] @ query_vec) if query_vec is not None else None
+            )
+            for row, score, ranks in hits
+        ]
+    answer_cache.put(req.query, scope, version, {"results": results}, query_vec)
+    return results, None, query_vec
+
+
+@app.post("/search")
+def search(req: SearchRequest):
+    # sync handler: embedding + matvec are CPU work, so FastAPI runs this
+    # in its threadpool instead of on the event loop
+    if not ready:
+        raise HTTPException(status_code=503, detail="Index is still loading")
+
+    start = time.perf_counter()
+    req, notes = supported_filters(req)
+    results, how, _ = retrieve(req)
+    return {
+        "query": req.query,
+        "took_ms": round((time.perf_counter() - start) * 1000, 2),
+        "cached": how,
+        "filter_notes": notes,
+        "results": results
+    }
+
+
+def precomputed_answer(req: AnswerRequest, results: list[dict] | None = None) -> dict | None:
+    """
+    A stored bank answer to serve as-is: an exact match on the normalized
+    question before retrieval (results=None), or afterwards a question-bank
+    hit whose cosine similarity clears ANSWER_MATCH_THRESHOLD. A match
+    without an answer for the requested mode (most rows have no guided
+    answer) doesn't count.
+    """
+    if results is None:
+        record = answer_store.find_question(req.query, req.subject)
+    else:
+        top = results[0] if results else None
+        record = None
+        if top and top["kind"] == "qa" and (top["similarity"] or 0) >= ANSWER_MATCH_THRESHOLD:
+            record = answer_store.get(top["id"])
+    if record is None or not stored_answer(record, req.answer_mode)[0]:
+        return None
+    return record
+
+
+@app.post("/answer")
+def answer(req: AnswerRequest):
+    """
+    Non-streaming lookup of a precomputed answer; 404 when the question has
+    no confident match in the bank (use /answer/stream to generate one).
+    """
+    if not ready:
+        raise HTTPException(status_code=503, detail="Index is still loading")
+
+    start = time.perf_counter()
+    req, notes = supported_filters(req)
+    record, how = precomputed_answer(req), "exact"
+    if record is None:
+        record, how = precomputed_answer(req, retrieve(req)[0]), "similar"
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"No precomputed {req.answer_mode}-mode answer for this question")
+
+    text, follow_up = stored_answer(record, req.answer_mode)
+    return {
+        "query": req.query,
+        "took_ms": round((time.perf_counter() - start) * 1000, 2),
+        "match": how,
+        "id": record["id"],
+        "subject": record["subject"],
+        "question": record["question"],
+        "answer": text,
+        "follow_up": follow_up,
+        "keywords": record["keywords"],
+        "filter_notes": notes,
+    }
+
+
+@app.post("/answer/stream")
+def answer_stream(req: AnswerRequest):
+    """
+    Server-sent events: retrieval results first, then the exam- or
+    guided-mode answer as it is produced. See answer_stream.stream_answer.
+    """
+    if not ready:
+        raise HTTPException(status_code=503, detail="Index is still loading")
+
+    start = time.perf_counter()
+    req, _ = supported_filters(req)
+
+    def events():
+        # an exact bank question skips retrieval altogether
+        record = precomputed_answer(req)
+        if record is not None:
+            yield from stream_answer(req.query, req.answer_mode, [{**record, "kind": "qa"}], start, record)
+            return
+        # retrieval runs inside the stream so the response starts immediately
+        version = indexer.version
+        results, _, query_vec = retrieve(req)
+        record = precomputed_answer(req, results)
+        if record is not None or not generation_enabled():
+            yield from stream_answer(req.query, req.answer_mode, results, start, record)
+            return
+
+        # generated answers share the search cache's keys and invalidation,
+        # under their own scope per answer mode
+        scope = ("generated", req.answer_mode, *search_scope(req))
+        embed = (lambda: query_vec) if query_vec is not None else None
+        cached, _, _ = answer_cache.lookup(req.query, scope, version, embed)
+        text = yield from stream_answer(
+            req.query, req.answer_mode, results, start, cached=cached and cached["text"]
+        )
+        if text:
+            answer_cache.put(req.query, scope, version, {"text": text}, query_vec)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/search/cache")
+def search_cache_stats():
+    return answer_cache.summary()
+
+
+# ---------- indexing ----------
+
+@app.post("/index/ocr")
+def index_ocr(req: OCRIndexRequest):
+    """
+    Called with the OCR service's output once a note or syllabus is approved.
+    Only new or changed chunks are embedded.
+    """
+    try:
+        doc = indexer.index_ocr(req.file_key, req.raw_text, kind=req.kind, subject=req.subject)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Indexing failed: {str(e)}")
+    return {"file_key": req.file_key, **{k: v for k, v in doc.items() if k != "chunk_ids"}}
+
+
+@app.post("/index/expansion")
+def index_expansion():
+    """
+    Picks up rows data_expand.py appended since the last run.
+    """
+    try:
+        doc = indexer.index_question_bank()
+        refresh_answer_store()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Indexing failed: {str(e)}")
+    return {k: v for k, v in doc.items() if k != "chunk_ids"}
+
+
+@app.delete("/index/documents/{doc_id:path}")
+def delete_document(doc_id: str):
+    if not indexer.delete_document(doc_id):
+        raise HTTPException(status_code=404, detail="Document not indexed")
+    return {"status": "deleted", "doc_id": doc_id}
+
+
+@app.get("/index/status")
+def index_status():
+    # per-document indexed/pending/failed + version, for the admin tables
+    store = embedder.store
+    return {
+        **indexer.status(),
+        "embeddings": {
+            **embedder.stats,
+            "stored": len(store) if store else 0,
+            "dtype": store.dtype if store else None,
+        },
+    }
@@ -0,0 +1,154 @@
+# question_bank.py
+import os
+import ast
+import json
+import hashlib
+from collections import Counter, defaultdict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Output of Fine Tuning/dataset_expansion (data_expand.py + earlier structured set)
+BANK_DIR = os.getenv(
+    "QUESTION_BANK_DIR",
+    os.path.join(REPO_ROOT, "Fine Tuning", "dataset_expansion")
+)
+BANK_FILES = ["expanded_dataset_v1.jsonl", "structured_dataset_v1.json"]
+# the seed papers the bank was expanded from (ingest_seeds.py shards, or the
+# older merged_dataset.json); they carry the semester and mark that most
+# bank rows lack
+SEED_DIR = os.path.join(BANK_DIR, "Seed Dataset")
+
+
+def row_id(subject: str, question: str) -> str:
+    # same id as Fine Tuning/dataset_expansion/export_training_set.py
+    return hashlib.sha1(f"{subject}\n{question}".encode("utf-8")).hexdigest()[:16]
+
+
+def parse_keywords(raw) -> list[str]:
+    if isinstance(raw, list):
+        return [str(k).strip() for k in raw if str(k).strip()]
+    if not raw:
+        return []
+    raw = str(raw).strip()
+    if raw.startswith("["):
+        try:
+            return parse_keywords(ast.literal_eval(raw))
+        except (ValueError, SyntaxError):
+            raw = raw.strip("[]")
+    return [k.strip().strip("'\"") for k in raw.split(",") if k.strip()]
+
+
+def _number(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def subject_key(subject: str) -> str:
+    # "PHYS101" in the papers, "PHYS 101" in the bank
+    return "".join((subject or "").split()).upper()
+
+
+def iter_seed_rows(seed_dir: str = SEED_DIR):
+    manifest = os.path.join(seed_dir, "ingested", "manifest.json")
+    if os.path.exists(manifest):
+        with open(manifest, "r", encoding="utf-8") as f:
+            shards = [entry["shard"] for entry in json.load(f)["files"].values()]
+        for shard in shards:
+            path = os.path.join(seed_dir, "ingested", shard)
+            if os.path.exists(path):
+                yield from (raw for raw, _ in iter_file(path))
+        return
+    merged = os.path.join(seed_dir, "merged_dataset.json")
+    if os.path.exists(merged):
+        yield from (raw for raw, _ in iter_file(merged))
+
+
+def load_seed_meta(seed_dir: str = SEED_DIR) -> tuple[dict, dict]:
+    """
+    From the seed papers: {question key: (semester, mark)} and each
+    subject's semester. Expanded rows keep their seed's question text, so
+    the question key finds the mark; the subject gives the semester of rows
+    whose seed isn't there.
+    """
+    questions = {}
+    semesters = defaultdict(Counter)
+    for raw in iter_seed_rows(seed_dir):
+        subject = subject_key(raw.get("subject"))
+        question = (raw.get("question") or "").strip()
+        semester = _number(raw.get("semester"))
+        mark = _number(raw.get("marks", raw.get("mark")))
+        if question:
+            questions.setdefault(row_id(subject, question), (semester, mark))
+        if subject and semester is not None:
+            semesters[subject][int(semester)] += 1
+    return questions, {s: c.most_common(1)[0][0] for s, c in semesters.items()}
+
+
+def to_entry(raw: dict, source: str, seed_meta: tuple[dict, dict] = ({}, {})) -> dict | None:
+    subject = (raw.get("subject") or "").strip()
+    question = (raw.get("question") or "").strip()
+    if not question:
+        return None
+
+    questions, semesters = seed_meta
+    seed_semester, seed_mark = questions.get(row_id(subject_key(subject), question), (None, None))
+    semester = _number(raw.get("semester"))
+    if semester is None:
+        semester = seed_semester if seed_semester is not None else semesters.get(subject_key(subject))
+    marks = _number(raw.get("marks", raw.get("mark")))
+    return {
+        "id": row_id(subject, question),
+        "source": source,
+        "subject": subject,
+        "semester": int(semester) if semester is not None else None,
+        "marks": marks if marks is not None else seed_mark,
+        "question": question,
+        "exam_mode_answer": raw.get("exam_mode_answer") or None,
+        "exam_f_question": raw.get("exam_f_question") or None,
+        "guided_mode_answer": raw.get("guided_mode_answer") or None,
+        "guided_f_question": raw.get("guided_f_question") or None,
+        "keywords": parse_keywords(raw.get("keywords")),
+    }
+
+
+def iter_file(path: str):
+    source = os.path.basename(path)
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                try:
+                    raw = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                yield raw, source
+        else:
+            for raw in json.load(f):
+                yield raw, source
+
+
+def load_question_bank(bank_dir: str = BANK_DIR, seed_dir: str | None = None) -> list[dict]:
+    """
+    All answered questions, one entry per (subject, question); the first
+    file in BANK_FILES wins on repeats. Semester and marks missing from a
+    row are filled in from the seed papers when those are present.
+    """
+    seed_meta = load_seed_meta(seed_dir or os.path.join(bank_dir, "Seed Dataset"))
+    entries = {}
+    for name in BANK_FILES:
+        path = os.path.join(bank_dir, name)
+        if not os.path.exists(path):
+            continue
+        for raw, source in iter_file(path):
+            entry = to_entry(raw, source, seed_meta)
+            if entry and entry["id"] not in entries:
+                entries[entry["id"]] = entry
+    return list(entries.values())
+
+
+def embedding_text(entry: dict) -> str:
+    # what a student would type: the question, plus the syllabus terms it covers
+    if entry["keywords"]:
+        return f"{entry['question']}\n{', '.join(entry['keywords'])}"
+    return entry["question"]
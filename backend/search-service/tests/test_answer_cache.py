@@ -0,0 +1,57 @@
+import numpy as np
+
+from answer_cache import SemanticCache, normalize_query
+
+SCOPE = ("COMP 102", None, None, None, 5, "hybrid")
+
+
+def unit(*values):
+    v = np.array(values, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def cache_at(version=1, **kwargs):
+    # entries are only accepted for the index version the cache last saw
+    cache = SemanticCache(**kwargs)
+    cache.lookup("", SCOPE, version)
+    return cache
+
+
+def test_normalize_keeps_question_words():
+    assert normalize_query("What is a Mole?") == normalize_query("what is a   mole")
+    assert normalize_query("why is TCP reliable") != normalize_query("how is TCP reliable")
+
+
+def test_exact_hit_needs_no_embedding():
+    cache = cache_at()
+    cache.put("What is a mole?", SCOPE, 1, {"results": ["mole"]})
+
+    def embed():
+        raise AssertionError("exact hits must not embed the query")
+    value, how, _ = cache.lookup("what is a mole", SCOPE, 1, embed)
+    assert (value, how) == ({"results": ["mole"]}, "exact")
+
+
+def test_different_question_word_is_not_an_exact_hit():
+    cache = cache_at(threshold=0.95)
+    cache.put("why is TCP reliable", SCOPE, 1, {"results": ["why"]}, unit(1, 0))
+    value, how, _ = cache.lookup("how is TCP reliable", SCOPE, 1, lambda: unit(0, 1))
+    assert value is None and how is None
+
+
+def test_semantic_hit_above_threshold_only():
+    cache = cache_at(threshold=0.9)
+    cache.put("define mole", SCOPE, 1, {"results": ["mole"]}, unit(1, 0.1))
+    assert cache.lookup("mole meaning", SCOPE, 1, lambda: unit(1, 0.12))[1] == "semantic"
+    assert cache.lookup("molarity", SCOPE, 1, lambda: unit(0.3, 1))[0] is None
+
+
+def test_scope_and_version_separate_entries():
+    cache = cache_at()
+    cache.put("what is a mole", SCOPE, 1, {"results": ["mole"]})
+    assert cache.lookup("what is a mole", ("CHEM 101",) + SCOPE[1:], 1)[0] is None
+    # a new index version drops everything, and late puts for the old one are ignored
+    assert cache.lookup("what is a mole", SCOPE, 2)[0] is None
+    cache.put("what is a mole", SCOPE, 1, {"results": ["stale"]})
+    assert cache.lookup("what is a mole", SCOPE, 2)[0] is None
+    assert cache.summary()["invalidations"] == 1
@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from bm25 import BM25Index, tokenize
+from hybrid_search import course_codes, hybrid_search, reciprocal_rank_fusion
+from vector_index import VectorIndex
+
+DIM = 4
+
+
+def entry(question, subject="COMP 102", keywords=(), answer="", marks=5):
+    return {"question": question, "subject": subject, "keywords": list(keywords),
+            "exam_mode_answer": answer, "marks": marks, "semester": 1, "kind": "question"}
+
+
+def unit(*values):
+    v = np.array(values, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def build(entries, vectors):
+    vindex = VectorIndex(DIM)
+    vindex.build([str(i) for i in range(len(entries))], np.stack(vectors), entries)
+    bm25 = BM25Index()
+    bm25.build(vindex.payloads)
+    return vindex, bm25
+
+
+def test_tokenize_drops_question_words():
+    assert tokenize("Explain what a Stack is, in C++?") == ["stack", "c"]
+    assert tokenize(None) == []
+
+
+def test_keyword_hit_outranks_answer_hit():
+    bm25 = BM25Index()
+    bm25.build([
+        entry("Write a program", answer="uses recursion to sum a list"),
+        entry("Write a program", keywords=["recursion"]),
+        entry("Sort an array"),
+    ])
+    hits = bm25.search("recursion")
+    assert [row for row, _ in hits] == [1, 0]
+    assert all(score > 0 for _, score in hits)
+
+
+def test_rare_terms_weigh_more():
+    bm25 = BM25Index()
+    bm25.build([entry("array pointer"), entry("array loop"), entry("array loop")])
+    assert bm25.search("array pointer", 1)[0][0] == 0
+    assert bm25.search("nothing matches") == []
+
+
+def test_bm25_respects_the_mask():
+    bm25 = BM25Index()
+    bm25.build([entry("stack"), entry("stack"), None])
+    assert bm25.search("stack", mask=np.array([False, True, True])) == [(1, pytest.approx(bm25.scores("stack")[1]))]
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([[1, 2], [2, 3]], k=60)
+    assert fused[2] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[1] == pytest.approx(1 / 61)
+    assert fused[3] == pytest.approx(1 / 62)
+
+
+def test_course_codes_are_normalized_to_known_subjects():
+    known = {"COMP 102", "CHEM 101"}
+    assert course_codes("comp102 and Chem-101 and MATH 101", known) == {"COMP 102", "CHEM 101"}
+
+
+def test_hybrid_puts_docs_both_retrievers_agree_on_first():
+    entries = [
+        entry("stack overflow in recursion"),                           # second on keywords, last on vectors
+        entry("linked list traversal"),                                 # first on vectors, no keyword match
+        entry("recursion and the call stack", keywords=["recursion"]),  # first on keywords, second on vectors
+    ]
+    vindex, bm25 = build(entries, [unit(0, 1, 0, 0), unit(1, 0, 0, 0), unit(1, 0.2, 0, 0)])
+    results = hybrid_search("recursion", unit(1, 0, 0, 0), vindex, bm25, top_k=3)
+
+    assert [row for row, _, _ in results] == [2, 0, 1]
+    ranks = {row: r for row, _, r in results}
+    assert ranks[2] == {"vector": 1, "bm25": 0}
+    assert ranks[1] == {"vector": 0, "bm25": None}
+    assert results[0][1] == pytest.approx(1 / 61 + 1 / 62)
+
+
+def test_modes_use_one_retriever():
+    entries = [entry("recursion"), entry("arrays")]
+    vindex, bm25 = build(entries, [unit(0, 1, 0, 0), unit(1, 0, 0, 0)])
+    query_vec = unit(1, 0, 0, 0)
+
+    assert [row for row, _, _ in hybrid_search("recursion", query_vec, vindex, bm25, mode="bm25")] == [0]
+    assert [row for row, _, _ in hybrid_search("recursion", query_vec, vindex, bm25, mode="vector")][0] == 1
+    # no embedding available: hybrid degrades to keywords
+    assert [row for row, _, _ in hybrid_search("recursion", None, vindex, bm25)] == [0]
+
+
+def test_filters_apply_to_both_retrievers():
+    entries = [entry("stack", subject="COMP 102"), entry("stack", subject="CHEM 101")]
+    vindex, bm25 = build(entries, [unit(1, 0, 0, 0), unit(1, 0, 0, 0)])
+    results = hybrid_search("stack", unit(1, 0, 0, 0), vindex, bm25, subject="CHEM 101")
+    assert [row for row, _, _ in results] == [1]
+
+
+def test_course_code_in_query_boosts_without_excluding():
+    entries = [entry("stack", subject="CHEM 101"), entry("stack", subject="COMP 102"), entry("queue")]
+    vindex, bm25 = build(entries, [unit(1, 0, 0, 0), unit(0.9, 0.1, 0, 0), unit(0, 0, 1, 0)])
+
+    plain = hybrid_search("stack", unit(1, 0, 0, 0), vindex, bm25)
+    boosted = hybrid_search("COMP 102 stack", unit(1, 0, 0, 0), vindex, bm25)
+    assert plain[0][0] == 0
+    assert boosted[0][0] == 1
+    assert 0 in [row for row, _, _ in boosted]
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from bm25 import BM25Index
+from indexer import Indexer, chunk_ocr_text
+
+QUERIES = ["stack recursion", "entropy gases", "heap", "queues fifo"]
+
+
+class FakeEmbedder:
+    dim = 8
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts):
+        self.encoded += len(texts)
+        rows = []
+        for text in texts:
+            v = np.random.default_rng(sum(map(ord, text))).standard_normal(self.dim).astype(np.float32)
+            rows.append(v / np.linalg.norm(v))
+        return np.stack(rows)
+
+
+def notes(word, pages=5):
+    # run_ocr's PDF output: page markers, and a few headed sections per page
+    return "\n".join(
+        f"--- Page {p} ---\n" + "\n".join(
+            f"Q{s}. The {word} is used for recursion, page {p} part {s}. Queues are FIFO." for s in range(3))
+        for p in range(1, pages + 1))
+
+
+def assert_bm25_matches_rebuild(ix):
+    rebuilt = BM25Index()
+    rebuilt.build(ix.vindex.payloads)
+    n = len(ix.vindex.payloads)
+    assert ix.bm25.n_docs == rebuilt.n_docs == len(ix.vindex)
+    for query in QUERIES:
+        np.testing.assert_allclose(ix.bm25.scores(query, n), rebuilt.scores(query, n), atol=1e-5)
+
+
+@pytest.fixture
+def ix(tmp_path):
+    return Indexer(FakeEmbedder(), state_dir=str(tmp_path))
+
+
+def test_chunks_keep_their_page():
+    chunks = chunk_ocr_text(notes("stack", pages=2))
+    assert [c["page"] for c in chunks] == [1, 1, 1, 2, 2, 2]
+    assert chunks[0]["text"].startswith("Q0. The stack")
+    assert chunk_ocr_text("a single image") == [{"page": 1, "text": "a single image"}]
+
+
+def test_incremental_bm25_matches_a_rebuild(ix):
+    text = notes("stack")
+    ix.index_ocr("notes/a.pdf", text)
+    ix.index_ocr("notes/b.pdf", text.replace("stack", "heap"))
+    assert_bm25_matches_rebuild(ix)
+
+    # edit one document: some chunks replaced, some dropped, freed rows reused
+    ix.index_ocr("notes/a.pdf", text[:200] + "\n--- Page 99 ---\nentropy of gases")
+    assert_bm25_matches_rebuild(ix)
+
+    ix.delete_document("notes/b.pdf")
+    assert_bm25_matches_rebuild(ix)
+    assert ix.bm25.search("heap") == []
+
+
+def test_unchanged_document_is_a_no_op(ix):
+    text = notes("stack")
+    first = ix.index_ocr("notes/a.pdf", text)
+    version, encoded = ix.version, ix.embedder.encoded
+
+    again = ix.index_ocr("notes/a.pdf", text)
+    assert again["embedded"] == 0
+    assert ix.version == version and ix.embedder.encoded == encoded
+    assert again["chunk_ids"] == first["chunk_ids"]
+
+
+def test_edit_embeds_only_new_chunks(ix):
+    text = notes("stack")
+    ix.index_ocr("notes/a.pdf", text)
+    doc = ix.index_ocr("notes/a.pdf", text + "\n--- Page 6 ---\nentropy of gases")
+    assert doc["embedded"] == 1
+
+
+def test_documents_survive_a_restart(ix):
+    ix.index_ocr("notes/a.pdf", notes("stack"))
+    ix.index_ocr("notes/b.pdf", notes("heap"))
+    ix.delete_document("notes/b.pdf")
+
+    restored = Indexer(FakeEmbedder(), state_dir=ix.state_dir)
+    restored.load()
+    assert set(restored.documents) == {"notes/a.pdf"}
+    assert len(restored.vindex) == len(ix.vindex)
+    assert restored.version == ix.version
+    assert_bm25_matches_rebuild(restored)
+    # nothing indexed so far is embedded again
+    assert restored.index_ocr("notes/a.pdf", notes("stack"))["embedded"] == 0
@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+import pytest
+
+from vector_store import VectorStore, read_meta
+
+DIM = 16
+
+
+def vectors(n, seed=0):
+    v = np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def keys(n, prefix="k"):
+    return [f"{prefix}{i}" for i in range(n)]
+
+
+@pytest.mark.parametrize("dtype,tolerance", [("float32", 1e-6), ("float16", 1e-3), ("int8", 1e-2)])
+def test_roundtrip_within_dtype_precision(tmp_path, dtype, tolerance):
+    store = VectorStore(str(tmp_path), "model", DIM, dtype)
+    v = vectors(5)
+    store.put_many(keys(5), v)
+
+    got = store.get_many(keys(5) + ["missing"])
+    assert list(got) == keys(5)
+    for i, k in enumerate(keys(5)):
+        assert got[k].dtype == np.float32
+        # cosine against the original, which is what search sees
+        assert float(got[k] @ v[i]) / np.linalg.norm(got[k]) == pytest.approx(1, abs=tolerance)
+
+    reopened = VectorStore(str(tmp_path), "model", DIM, dtype)
+    assert len(reopened) == 5
+    np.testing.assert_array_equal(reopened.get_many(["k3"])["k3"], got["k3"])
+
+
+def test_put_skips_known_and_repeated_keys(tmp_path):
+    store = VectorStore(str(tmp_path), "model", DIM, "float32")
+    v = vectors(3)
+    store.put_many(["a", "b"], v[:2])
+    store.put_many(["b", "c", "c"], v)
+    assert len(store) == 3
+    np.testing.assert_array_equal(store.get_many(["b"])["b"], v[1])
+    np.testing.assert_array_equal(store.get_many(["c"])["c"], v[1])
+    assert os.path.getsize(tmp_path / "vectors.bin") == 3 * DIM * 4
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_rows_written_without_keys_are_truncated_on_open(tmp_path, dtype):
+    store = VectorStore(str(tmp_path), "model", DIM, dtype)
+    v = vectors(4)
+    store.put_many(keys(2), v[:2])
+    row_bytes = DIM * np.dtype(dtype).itemsize
+
+    # a crash after the vectors were appended but before their keys were
+    with open(tmp_path / "vectors.bin", "ab") as f:
+        f.write(b"\x01" * row_bytes * 3)
+    if dtype == "int8":
+        with open(tmp_path / "scales.bin", "ab") as f:
+            f.write(b"\x01" * 4 * 3)
+
+    reopened = VectorStore(str(tmp_path), "model", DIM, dtype)
+    assert len(reopened) == 2
+    assert os.path.getsize(tmp_path / "vectors.bin") == 2 * row_bytes
+
+    # the next append lines up with its keys
+    reopened.put_many(["k2", "k3"], v[2:])
+    again = VectorStore(str(tmp_path), "model", DIM, dtype)
+    got = again.get_many(keys(4))
+    for i, k in enumerate(keys(4)):
+        assert float(got[k] @ v[i]) / np.linalg.norm(got[k]) == pytest.approx(1, abs=1e-2)
+
+
+def test_keys_beyond_the_vectors_are_ignored(tmp_path):
+    store = VectorStore(str(tmp_path), "model", DIM, "float32")
+    store.put_many(keys(2), vectors(2))
+    with open(tmp_path / "keys.txt", "a", encoding="utf-8") as f:
+        f.write("orphan\n")
+    assert "orphan" not in VectorStore(str(tmp_path), "model", DIM, "float32")
+
+
+@pytest.mark.parametrize("change", [{"model": "other"}, {"dim": 8}, {"dtype": "int8"}])
+def test_meta_mismatch_discards_the_store(tmp_path, change):
+    VectorStore(str(tmp_path), "model", DIM, "float16").put_many(keys(3), vectors(3))
+
+    args = {"model": "model", "dim": DIM, "dtype": "float16", **change}
+    store = VectorStore(str(tmp_path), **args)
+    assert len(store) == 0
+    assert read_meta(str(tmp_path)) == args
+    assert not os.path.exists(tmp_path / "vectors.bin")
+
+
+def test_unknown_dtype_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        VectorStore(str(tmp_path), "model", DIM, "bfloat16")
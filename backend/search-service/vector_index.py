@@ -0,0 +1,160 @@
+# vector_index.py
+import numpy as np
+
+
+class VectorIndex:
+    """
+    Exact (flat) inner-product index over normalized vectors, held as one
+    contiguous float32 matrix. For a question bank in the thousands to low
+    hundreds of thousands this is a single BLAS matvec per query, i.e. well
+    under the time it takes to embed the query itself.
+
+    Rows are addressed by string id and can be upserted or deleted in place:
+    deleted rows are masked out and their slots reused, and storage grows by
+    doubling, so incremental updates never rebuild the matrix.
+
+    Filters are evaluated as boolean masks over per-row metadata columns
+    before ranking, so top-k always comes from the matching rows.
+    """
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        self.dim = dim
+        self.ids: list[str | None] = []
+        self.payloads: list[dict | None] = []
+        self.subjects: set[str] = set()
+        self._row: dict[str, int] = {}
+        self._free: list[int] = []
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        self.vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._subject = np.empty(capacity, dtype=object)
+        self._kind = np.empty(capacity, dtype=object)
+        self._semester = np.full(capacity, np.nan, dtype=np.float32)
+        self._marks = np.full(capacity, np.nan, dtype=np.float32)
+
+    def _columns(self):
+        return (self.vectors, self._alive, self._subject, self._kind, self._semester, self._marks)
+
+    def _grow(self, needed):
+        capacity = len(self._alive)
+        if needed <= capacity:
+            return
+        old = self._columns()
+        self._alloc(max(needed, capacity * 2))
+        for dst, src in zip(self._columns(), old):
+            dst[:capacity] = src
+
+    def __len__(self):
+        return len(self._row)
+
+    def __contains__(self, id_):
+        return id_ in self._row
+
+    def build(self, ids: list[str], vectors: np.ndarray, payloads: list[dict]):
+        self.ids, self.payloads, self._row, self._free = [], [], {}, []
+        self.subjects = set()
+        self._alloc(max(len(ids), 1024))
+        self.upsert(ids, vectors, payloads)
+
+    def upsert(self, ids: list[str], vectors: np.ndarray, payloads: list[dict]):
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(f"expected {(len(ids), self.dim)} vectors, got {vectors.shape}")
+
+        for id_, vector, payload in zip(ids, vectors, payloads):
+            row = self._row.get(id_)
+            if row is None:
+                if self._free:
+                    row = self._free.pop()
+                else:
+                    row = len(self.ids)
+                    self._grow(row + 1)
+                    self.ids.append(None)
+                    self.payloads.append(None)
+                self._row[id_] = row
+
+            self.ids[row] = id_
+            self.payloads[row] = payload
+            self.vectors[row] = vector
+            self._alive[row] = True
+            self._subject[row] = payload.get("subject")
+            self._kind[row] = payload.get("kind")
+            self._semester[row] = _float(payload.get("semester"))
+            self._marks[row] = _float(payload.get("marks"))
+            if payload.get("subject"):
+                self.subjects.add(payload["subject"])
+
+    def delete(self, ids):
+        for id_ in ids:
+            row = self._row.pop(id_, None)
+            if row is None:
+                continue
+            self.ids[row] = None
+            self.payloads[row] = None
+            self._alive[row] = False
+            self._subject[row] = None
+            self._kind[row] = None
+            self._free.append(row)
+
+    def row(self, id_) -> int | None:
+        return self._row.get(id_)
+
+    def get(self, id_) -> dict | None:
+        row = self._row.get(id_)
+        return self.payloads[row] if row is not None else None
+
+    def vector(self, id_) -> np.ndarray | None:
+        row = self._row.get(id_)
+        return self.vectors[row].copy() if row is not None else None
+
+    def known(self, field: str) -> int:
+        """
+        Live rows with a known `semester` or `marks`.
+        """
+        n = len(self.ids)
+        values = {"semester": self._semester, "marks": self._marks}[field]
+        return int((self._alive[:n] & ~np.isnan(values[:n])).sum())
+
+    def mask(self, subject=None, semester=None, marks=None, kind=None) -> np.ndarray:
+        """
+        Boolean mask over the used rows: live rows matching every given filter.
+        """
+        n = len(self.ids)
+        mask = self._alive[:n].copy()
+        if subject:
+            mask &= self._subject[:n] == subject
+        if semester is not None:
+            mask &= self._semester[:n] == semester
+        if marks is not None:
+            mask &= self._marks[:n] == marks
+        if kind:
+            mask &= self._kind[:n] == kind
+        return mask
+
+    def rank(self, query: np.ndarray, top_k: int = 5, mask: np.ndarray | None = None):
+        """
+        Returns [(row, score), ...] best first.
+        """
+        if not self._row:
+            return []
+
+        n = len(self.ids)
+        scores = self.vectors[:n] @ query.astype(np.float32, copy=False)
+        scores = np.where(self._alive[:n] if mask is None else mask, scores, -np.inf)
+
+        k = min(top_k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def search(self, query: np.ndarray, top_k: int = 5, subject=None, semester=None, marks=None):
+        """
+        Returns [(score, payload), ...] best first.
+        """
+        hits = self.rank(query, top_k, self.mask(subject, semester, marks))
+        return [(score, self.payloads[i]) for i, score in hits]
+
+
+def _float(value):
+    return value if value is not None else np.nan
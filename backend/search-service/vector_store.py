@@ -0,0 +1,140 @@
+# vector_store.py
+import os
+import json
+import threading
+
+import numpy as np
+
+DTYPES = ("float32", "float16", "int8")
+
+
+class VectorStore:
+    """
+    Content hash -> vector, persisted as an append-only matrix that is
+    memory-mapped on open, so a restart maps existing vectors in without
+    reading or re-embedding them.
+
+    Layout under `path`:
+      meta.json    model, dim, dtype - a mismatch discards the store
+      keys.txt     one content hash per line; line n is matrix row n
+      vectors.bin  rows of `dim` values in `dtype`
+      scales.bin   float32 per row, int8 only (row = int8 * scale)
+
+    float16 halves the file (and the page cache it occupies) compared to
+    float32, and int8 quarters it; for normalized sentence embeddings either
+    changes cosine scores by well under 1e-2. Vectors are always handed
+    back as float32, and the VectorIndex searched at query time keeps its
+    own float32 copy, so the dtype does not shrink the process's resident
+    memory for search - only the store on disk.
+    """
+
+    def __init__(self, path: str, model: str, dim: int, dtype: str = "float16"):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}, got {dtype!r}")
+        self.path = path
+        self.model = model
+        self.dim = dim
+        self.dtype = dtype
+        self._lock = threading.Lock()
+        self._rows: dict[str, int] = {}
+        self._vectors = None
+        self._scales = None
+
+        os.makedirs(path, exist_ok=True)
+        meta = {"model": model, "dim": dim, "dtype": dtype}
+        if read_meta(path) != meta:
+            for name in ("keys.txt", "vectors.bin", "scales.bin"):
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+            with open(self._file("meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+        self._load()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _row_bytes(self):
+        return self.dim * np.dtype(self.dtype).itemsize
+
+    def _load(self):
+        keys = []
+        if os.path.exists(self._file("keys.txt")):
+            with open(self._file("keys.txt"), "r", encoding="utf-8") as f:
+                keys = f.read().split()
+
+        # vectors are written before their keys, so a crash mid-append leaves
+        # unreferenced rows at the end; cut them off so the next append lines up
+        vectors_path = self._file("vectors.bin")
+        stored = os.path.getsize(vectors_path) // self._row_bytes() if os.path.exists(vectors_path) else 0
+        keys = keys[:stored]
+        if stored > len(keys):
+            os.truncate(vectors_path, len(keys) * self._row_bytes())
+        if self.dtype == "int8" and os.path.exists(self._file("scales.bin")):
+            os.truncate(self._file("scales.bin"), len(keys) * 4)
+        self._rows = {k: i for i, k in enumerate(keys)}
+        self._map(len(keys))
+
+    def _map(self, n):
+        if not n:
+            self._vectors = self._scales = None
+            return
+        self._vectors = np.memmap(self._file("vectors.bin"), dtype=self.dtype, mode="r", shape=(n, self.dim))
+        if self.dtype == "int8":
+            self._scales = np.memmap(self._file("scales.bin"), dtype=np.float32, mode="r", shape=(n,))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        """
+        Returns {key: float32 vector} for the keys present.
+        """
+        with self._lock:
+            found = [(k, self._rows[k]) for k in keys if k in self._rows]
+            if not found:
+                return {}
+            rows = np.fromiter((r for _, r in found), dtype=np.int64, count=len(found))
+            vectors = np.asarray(self._vectors[rows], dtype=np.float32)
+            if self.dtype == "int8":
+                vectors *= self._scales[rows][:, None]
+        return {k: v for (k, _), v in zip(found, vectors)}
+
+    def put_many(self, keys: list[str], vectors: np.ndarray):
+        with self._lock:
+            new, seen = [], set()
+            for i, k in enumerate(keys):
+                if k not in self._rows and k not in seen:
+                    new.append(i)
+                    seen.add(k)
+            if not new:
+                return
+            vectors = np.asarray(vectors[new], dtype=np.float32)
+
+            if self.dtype == "int8":
+                scales = np.abs(vectors).max(axis=1) / 127
+                scales[scales == 0] = 1
+                stored = np.round(vectors / scales[:, None]).astype(np.int8)
+                with open(self._file("scales.bin"), "ab") as f:
+                    f.write(scales.astype(np.float32).tobytes())
+            else:
+                stored = vectors.astype(self.dtype)
+
+            with open(self._file("vectors.bin"), "ab") as f:
+                f.write(stored.tobytes())
+            with open(self._file("keys.txt"), "a", encoding="utf-8") as f:
+                f.write("".join(f"{keys[i]}\n" for i in new))
+
+            for i in new:
+                self._rows[keys[i]] = len(self._rows)
+            self._map(len(self._rows))
+
+
+def read_meta(path: str) -> dict | None:
+    try:
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
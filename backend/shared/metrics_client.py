@@ -0,0 +1,75 @@
+# metrics_client.py
+# Shared by the OCR and auth services, which put backend/shared on sys.path.
+import os
+import json
+import time
+import threading
+import urllib.request
+from collections import deque
+
+# metrics-service base URL; unset means every call below is a no-op
+METRICS_SERVICE_URL = os.getenv("METRICS_SERVICE_URL")
+METRICS_INGEST_TOKEN = os.getenv("METRICS_INGEST_TOKEN")
+FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 1.0))
+MAX_PENDING = 10000
+MAX_BATCH = 1000
+
+
+class MetricsClient:
+    """
+    Fire-and-forget events for the metrics service. Recording only appends
+    to a bounded deque, so the request path never waits on I/O; a daemon
+    thread posts what has accumulated every FLUSH_INTERVAL seconds. Events
+    are dropped, not retried, if the service is down or the deque is full.
+    """
+
+    def __init__(self, source: str, url: str | None = METRICS_SERVICE_URL):
+        self.source = source
+        self.url = f"{url.rstrip('/')}/events" if url else None
+        self._pending = deque(maxlen=MAX_PENDING)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def _emit(self, event: dict):
+        if not self.url:
+            return
+        event["ts"] = time.time()
+        self._pending.append(event)
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="metrics-flush", daemon=True)
+                    self._thread.start()
+
+    def timing(self, name: str, ms: float, status: str = "ok"):
+        self._emit({"type": "timing", "name": name, "value": round(ms, 3), "status": status})
+
+    def count(self, name: str, n: int = 1, status: str = "ok"):
+        self._emit({"type": "counter", "name": name, "value": n, "status": status})
+
+    def gauge(self, name: str, value: float):
+        self._emit({"type": "gauge", "name": name, "value": value})
+
+    def log(self, level: str, message: str):
+        self._emit({"type": "log", "level": level, "message": message})
+
+    def _run(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        while self._pending:
+            batch = []
+            while self._pending and len(batch) < MAX_BATCH:
+                batch.append(self._pending.popleft())
+            body = json.dumps({"source": self.source, "events": batch}).encode("utf-8")
+            headers = {"Content-Type": "application/json"}
+            if METRICS_INGEST_TOKEN:
+                headers["X-Metrics-Token"] = METRICS_INGEST_TOKEN
+            try:
+                urllib.request.urlopen(urllib.request.Request(self.url, body, headers), timeout=5).close()
+            except OSError:
+                self.dropped += len(batch)
+                return
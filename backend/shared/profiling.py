@@ -0,0 +1,315 @@
+# profiling.py
+"""
+On-demand profiling for a FastAPI app, admin-only.
+
+Nothing is installed unless PROFILING_TOKEN is set, so an unprofiled
+deployment pays nothing. With it set:
+
+- Per request: send `X-Profile: 1` (or `?profile=1`) together with
+  `X-Admin-Token`. The request runs under cProfile. That covers the
+  event-loop thread and every worker-thread call wrapped with profiled()
+  (run_ocr, the Supabase calls, ...). The response carries `X-Profile-Id`.
+  Then:
+      GET /admin/profiles/{id}          text report, this service's functions first
+      GET /admin/profiles/{id}/pstats   raw stats for snakeviz / pstats
+- Whole process: `POST /admin/profile/sample?seconds=10` samples every
+  thread's stack for that long. It returns collapsed stacks
+  ("thread;module:func;module:func count"), the input format of
+  flamegraph.pl, speedscope and inferno; `format=top` gives the hottest
+  functions as JSON. The sampler thread only exists during a capture.
+
+On Python 3.12+ cProfile is built on sys.monitoring and only one profiler
+can be active in the process. A profiler that can't be enabled is skipped
+and the call runs unprofiled; the report says when the loop wasn't covered.
+
+Shared by the OCR and auth services from backend/shared; each passes its
+own directory to install_profiling() so reports list its functions first.
+"""
+import io
+import os
+import re
+import sys
+import time
+import uuid
+import hmac
+import marshal
+import pstats
+import asyncio
+import cProfile
+import functools
+import threading
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from typing import Literal
+from urllib.parse import parse_qs
+
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+MAX_STORED_PROFILES = 20
+MAX_SAMPLE_SECONDS = 60
+# the installing service's directory; reports list its functions first
+SERVICE_DIR = os.getcwd()
+
+# leaf frames of threads that are parked, not working
+IDLE_LEAVES = {"threading:wait", "threading:_wait_for_tstate_lock", "selectors:select",
+               "queue:get", "socket:accept", "thread:_worker"}
+
+# worker-thread profiles collected for the request being profiled
+_request_profiles: ContextVar[list | None] = ContextVar("request_profiles", default=None)
+_stored: OrderedDict[str, dict] = OrderedDict()
+_loop_profiling = False
+_sampling = asyncio.Lock()
+
+
+def profiled(fn):
+    """
+    Wraps a function that is handed to a worker thread. Inside a profiled
+    request it runs under its own cProfile.Profile, collected into the
+    request's report; otherwise the only cost is one ContextVar lookup.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profiles = _request_profiles.get()
+        if profiles is None:
+            return fn(*args, **kwargs)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # 3.12+: another profiler is already active in the process
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+            profiles.append(profiler)
+    return wrapper
+
+
+def _is_admin(token: str | None) -> bool:
+    # bytes, so a non-ASCII header is a mismatch rather than a TypeError
+    return bool(PROFILING_TOKEN and token
+                and hmac.compare_digest(token.encode("utf-8"), PROFILING_TOKEN.encode("utf-8")))
+
+
+def require_admin(x_admin_token: str | None = Header(None)):
+    if not _is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+# ---------------- PER-REQUEST ----------------
+
+def _wants_profile(scope) -> tuple[bool, str | None]:
+    wants, token = False, None
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile":
+            wants = value not in (b"", b"0", b"false")
+        elif name == b"x-admin-token":
+            token = value.decode("latin-1")
+    if not wants:
+        flags = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile")
+        wants = bool(flags) and flags[-1] not in ("0", "false")
+    return wants, token
+
+
+class ProfileMiddleware:
+    """
+    Pure ASGI, so an unflagged request costs a scan of its header list.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        wants, token = _wants_profile(scope)
+        if not wants:
+            return await self.app(scope, receive, send)
+        if not _is_admin(token):
+            return await JSONResponse({"detail": "Admin token required"}, status_code=403)(scope, receive, send)
+
+        global _loop_profiling
+        profile_id = uuid.uuid4().hex[:12]
+        profiles = []
+        # one profiler per thread at a time: a second concurrent profiled
+        # request gets its worker threads profiled but not the loop
+        loop_profiler = None
+        if not _loop_profiling:
+            _loop_profiling = True
+            loop_profiler = cProfile.Profile()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        if loop_profiler:
+            try:
+                loop_profiler.enable()
+            except ValueError:
+                # 3.12+: a worker's profiler holds the process-wide slot;
+                # fall back to profiling worker calls only
+                loop_profiler = None
+                _loop_profiling = False
+
+        ctx = _request_profiles.set(profiles)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            if loop_profiler:
+                loop_profiler.disable()
+                _loop_profiling = False
+            _request_profiles.reset(ctx)
+            _store(profile_id, {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "wall_ms": round((time.perf_counter() - start) * 1000, 1),
+                "created": time.time(),
+                "loop": loop_profiler,
+                "workers": profiles,
+            })
+
+
+def _store(profile_id, record):
+    _stored[profile_id] = record
+    while len(_stored) > MAX_STORED_PROFILES:
+        _stored.popitem(last=False)
+
+
+def _stats(profilers, stream):
+    profilers = [p for p in profilers if p is not None]
+    if not profilers:
+        return None
+    stats = pstats.Stats(profilers[0], stream=stream)
+    for p in profilers[1:]:
+        stats.add(p)
+    return stats
+
+
+def render_report(record, sort: str = "cumulative", limit: int = 40) -> str:
+    out = io.StringIO()
+    out.write(f"{record['method']} {record['path']}  wall {record['wall_ms']} ms  "
+              f"worker calls profiled: {len(record['workers'])}\n")
+    sections = [("worker threads", record["workers"])]
+    if record["loop"] is not None:
+        sections.append(("event loop thread (shared with concurrent requests)", [record["loop"]]))
+    else:
+        out.write("event loop thread: not profiled (another profiler held it)\n")
+
+    for title, profilers in sections:
+        stats = _stats(profilers, out)
+        if stats is None:
+            continue
+        stats.sort_stats(sort)
+        out.write(f"\n===== {title}: this service's functions, by {sort} =====\n")
+        stats.print_stats(f"^{re.escape(SERVICE_DIR)}", limit)
+        out.write(f"\n===== {title}: all functions, by {sort} =====\n")
+        stats.print_stats(limit)
+    return out.getvalue()
+
+# ---------------- SAMPLING ----------------
+
+def _frame_label(code) -> str:
+    return f"{os.path.splitext(os.path.basename(code.co_filename))[0]}:{code.co_name}"
+
+
+def sample_stacks(seconds: float, interval: float, include_idle: bool = False) -> Counter:
+    """
+    Every `interval` seconds, records the stack of every thread but this
+    one. Returns collapsed stack -> sample count.
+    """
+    me = threading.get_ident()
+    names = {}
+    counts = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if not stack or (not include_idle and stack[0] in IDLE_LEAVES):
+                continue
+            if ident not in names:
+                names = {t.ident: t.name for t in threading.enumerate()}
+            thread = names.get(ident, str(ident)).replace(";", "_").replace(" ", "_")
+            counts[";".join([thread, *reversed(stack)])] += 1
+        time.sleep(interval)
+    return counts
+
+
+def top_functions(counts: Counter, limit: int = 30) -> dict:
+    own, inclusive = Counter(), Counter()
+    for stack, n in counts.items():
+        frames = stack.split(";")[1:]
+        own[frames[-1]] += n
+        for f in set(frames):
+            inclusive[f] += n
+    total = sum(counts.values())
+    share = lambda c: [{"function": f, "samples": n, "share": round(n / total, 4)} for f, n in c.most_common(limit)]
+    return {"samples": total, "self": share(own), "inclusive": share(inclusive)}
+
+# ---------------- ROUTES ----------------
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.get("/profiles")
+async def list_profiles():
+    return [{k: r[k] for k in ("id", "method", "path", "wall_ms", "created")} for r in reversed(_stored.values())]
+
+
+def _record(profile_id):
+    record = _stored.get(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profile not found (only the latest are kept)")
+    return record
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str,
+                      sort: Literal["cumulative", "tottime", "calls"] = "cumulative",
+                      limit: int = Query(40, ge=1, le=500)):
+    return PlainTextResponse(render_report(_record(profile_id), sort, limit))
+
+
+@router.get("/profiles/{profile_id}/pstats")
+async def get_profile_pstats(profile_id: str):
+    record = _record(profile_id)
+    stats = _stats([*record["workers"], record["loop"]], io.StringIO())
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Nothing was profiled")
+    return Response(marshal.dumps(stats.stats), media_type="application/octet-stream",
+                    headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'})
+
+
+@router.post("/profile/sample")
+async def sample_process(seconds: float = Query(10, gt=0, le=MAX_SAMPLE_SECONDS),
+                         interval_ms: float = Query(5, ge=1, le=1000),
+                         format: Literal["collapsed", "top"] = "collapsed",
+                         include_idle: bool = False):
+    if _sampling.locked():
+        raise HTTPException(status_code=409, detail="A sampling capture is already running")
+    async with _sampling:
+        counts = await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000, include_idle)
+    if format == "top":
+        return top_functions(counts)
+    body = "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
+    return PlainTextResponse(body, headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'})
+
+
+def install_profiling(app: FastAPI, service_dir: str | None = None):
+    global SERVICE_DIR
+    # no token, no middleware and no routes
+    if not PROFILING_TOKEN:
+        return
+    if service_dir:
+        SERVICE_DIR = os.path.abspath(service_dir)
+    app.add_middleware(ProfileMiddleware)
+    app.include_router(router)
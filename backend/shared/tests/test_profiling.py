@@ -0,0 +1,60 @@
+import cProfile
+
+import pytest
+
+import profiling
+
+
+def scope(query=b"", headers=()):
+    return {"type": "http", "query_string": query, "headers": list(headers)}
+
+
+@pytest.mark.parametrize("query, wanted", [
+    (b"profile=1", True),
+    (b"a=2&profile=true", True),
+    (b"profile=0", False),
+    (b"noprofile=1", False),
+    (b"xprofile=1", False),
+    (b"", False),
+])
+def test_query_flag_is_matched_exactly(query, wanted):
+    assert profiling._wants_profile(scope(query))[0] is wanted
+
+
+def test_header_flag_and_token():
+    wants, token = profiling._wants_profile(scope(headers=[(b"x-profile", b"1"), (b"x-admin-token", b"t")]))
+    assert wants and token == "t"
+    assert not profiling._wants_profile(scope(headers=[(b"x-profile", b"0")]))[0]
+
+
+def test_admin_token_compare(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", "s3cret")
+    assert profiling._is_admin("s3cret")
+    assert not profiling._is_admin("s3cre")
+    assert not profiling._is_admin("\xe9\xe9")   # non-ASCII header: a mismatch, not a TypeError
+    assert not profiling._is_admin(None)
+
+
+def test_profiled_runs_unprofiled_when_enable_fails(monkeypatch):
+    def busy(self):
+        raise ValueError("Another profiling tool is already active")
+    monkeypatch.setattr(cProfile.Profile, "enable", busy)
+    profiles = []
+    token = profiling._request_profiles.set(profiles)
+    try:
+        assert profiling.profiled(lambda x: x * 2)(21) == 42
+    finally:
+        profiling._request_profiles.reset(token)
+    assert profiles == []
+
+
+def test_profiled_collects_inside_a_profiled_request():
+    profiles = []
+    token = profiling._request_profiles.set(profiles)
+    try:
+        assert profiling.profiled(sum)([1, 2, 3]) == 6
+    finally:
+        profiling._request_profiles.reset(token)
+    assert len(profiles) == 1
+    assert profiling.profiled(sum)([1]) == 1   # outside a request: nothing collected
+    assert len(profiles) == 1